@@ -0,0 +1,16 @@
+-- 001: per-user, per-day completion rollup for /api/stats/daily_completion
+--
+-- Rows are sparse: one row exists for a day once something changed on it
+-- (a habit_log write or a slot count change). Readers carry `total` forward
+-- from the most recent earlier row for days that have no row of their own.
+-- Maintained by the API in the same transaction as the write; rebuild with
+--   python -m app.cli.backfill_rollup
+
+CREATE TABLE IF NOT EXISTS public.habit_daily_rollup (
+	user_id uuid NOT NULL,
+	"day" date NOT NULL,
+	completed int4 DEFAULT 0 NOT NULL,
+	total int4 DEFAULT 0 NOT NULL,
+	CONSTRAINT habit_daily_rollup_pkey PRIMARY KEY (user_id, day),
+	CONSTRAINT habit_daily_rollup_user_id_fkey FOREIGN KEY (user_id) REFERENCES public.app_user(id) ON DELETE CASCADE
+);
@@ -0,0 +1,7 @@
+-- 002: per-user data version for ETag / conditional GET
+--
+-- Bumped by the API in the same transaction as every write to the user's
+-- habits, slots or habit_log. Read endpoints derive their ETag from it.
+
+ALTER TABLE public.app_user
+	ADD COLUMN IF NOT EXISTS data_version int8 DEFAULT 0 NOT NULL;
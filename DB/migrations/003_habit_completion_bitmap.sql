@@ -0,0 +1,43 @@
+-- 003: packed per-(habit, period, year) completion bitmaps for /api/stats/heatmap
+--
+-- `bits` is 46 bytes (368 bits, one per day of the year): bit i is day-of-year
+-- i + 1, numbered the way set_bit()/get_bit() number bytea bits (bit 0 is the
+-- least significant bit of the first byte; NumPy: unpackbits(bitorder="little")).
+-- Maintained by the API in the same transaction as every habit_log write;
+-- rebuild with
+--   python -m app.cli.backfill_rollup
+
+CREATE TABLE IF NOT EXISTS public.habit_completion_bitmap (
+	habit_id uuid NOT NULL,
+	"period" public."time_period" NOT NULL,
+	"year" int2 NOT NULL,
+	bits bytea NOT NULL,
+	CONSTRAINT habit_completion_bitmap_pkey PRIMARY KEY (habit_id, period, year),
+	CONSTRAINT habit_completion_bitmap_habit_id_fkey FOREIGN KEY (habit_id) REFERENCES public.habit(id) ON DELETE CASCADE
+);
+
+-- Backfill from habit_log: OR the day bits into bytes, then hex-join the 46 bytes
+WITH done AS (
+  SELECT habit_id, period,
+         extract(year FROM day)::int AS year,
+         extract(doy FROM day)::int - 1 AS i
+  FROM public.habit_log
+  WHERE completed
+),
+bytes AS (
+  SELECT habit_id, period, year, i / 8 AS b, bit_or(1 << (i % 8)) AS v
+  FROM done
+  GROUP BY habit_id, period, year, i / 8
+),
+keys AS (
+  SELECT DISTINCT habit_id, period, year FROM bytes
+)
+INSERT INTO public.habit_completion_bitmap (habit_id, period, year, bits)
+SELECT k.habit_id, k.period, k.year,
+       decode(string_agg(lpad(to_hex(COALESCE(bt.v, 0)), 2, '0'), '' ORDER BY g.b), 'hex')
+FROM keys k
+CROSS JOIN generate_series(0, 45) AS g(b)
+LEFT JOIN bytes bt
+  ON bt.habit_id = k.habit_id AND bt.period = k.period AND bt.year = k.year AND bt.b = g.b
+GROUP BY k.habit_id, k.period, k.year
+ON CONFLICT (habit_id, period, year) DO UPDATE SET bits = EXCLUDED.bits;
@@ -0,0 +1,126 @@
+-- 004: range-partition public.habit_log by year on `day`
+--
+-- habit_log becomes a partitioned table with one partition per calendar year
+-- (habit_log_y2025, ...) plus habit_log_default, which catches rows for years
+-- that have no partition yet so a write never fails. Queries filtering on
+-- `day` (the stats `completions` CTE, checklist, range grid) are pruned to the
+-- partitions they touch.
+--
+-- The primary key of a partitioned table must include the partition key, so
+-- it becomes (id, day); nothing references habit_log.id. The unique
+-- (habit_id, day, period) constraint that the upserts' ON CONFLICT targets
+-- already includes `day` and is kept as is. A BRIN index on `day` is added
+-- next to the (habit_id, day) btree: logs are written close to "today", so
+-- heap order follows `day` and the BRIN costs a few pages per partition.
+--
+-- Partitions are created by public.habit_log_ensure_partitions(ahead), which
+-- the API runs at startup and
+--   python -m app.cli.habit_log_partitions ensure
+-- runs from cron; it also moves rows out of habit_log_default into a proper
+-- partition. Cold years are compacted or detached with
+--   python -m app.cli.habit_log_partitions archive --keep-years N [--detach]
+--
+-- Rewrites habit_log in one transaction (ACCESS EXCLUSIVE for the duration).
+
+BEGIN;
+
+LOCK TABLE public.habit_log IN ACCESS EXCLUSIVE MODE;
+
+ALTER TABLE public.habit_log RENAME TO habit_log_unpartitioned;
+ALTER TABLE public.habit_log_unpartitioned RENAME CONSTRAINT habit_log_pkey TO habit_log_unpartitioned_pkey;
+ALTER TABLE public.habit_log_unpartitioned RENAME CONSTRAINT habit_log_habit_id_day_period_key TO habit_log_unpartitioned_habit_id_day_period_key;
+ALTER INDEX public.habit_log_lookup_idx RENAME TO habit_log_unpartitioned_lookup_idx;
+
+CREATE TABLE public.habit_log (
+	id uuid DEFAULT gen_random_uuid() NOT NULL,
+	habit_id uuid NOT NULL,
+	"period" public."time_period" NOT NULL,
+	"day" date NOT NULL,
+	completed bool DEFAULT true NOT NULL,
+	note text NULL,
+	created_at timestamptz DEFAULT now() NOT NULL,
+	CONSTRAINT habit_log_habit_id_day_period_key UNIQUE (habit_id, day, period),
+	CONSTRAINT habit_log_pkey PRIMARY KEY (id, day),
+	CONSTRAINT habit_log_habit_id_fkey FOREIGN KEY (habit_id) REFERENCES public.habit(id) ON DELETE CASCADE
+) PARTITION BY RANGE ("day");
+
+CREATE TABLE public.habit_log_default PARTITION OF public.habit_log DEFAULT;
+
+CREATE INDEX habit_log_lookup_idx ON public.habit_log USING btree (habit_id, day);
+CREATE INDEX habit_log_day_brin ON public.habit_log USING brin (day);
+
+-- Create (and attach) the partition for one year; false if it already exists.
+-- Rows for that year sitting in habit_log_default are moved into it first,
+-- and a CHECK matching the bounds lets ATTACH skip scanning the new table.
+CREATE OR REPLACE FUNCTION public.habit_log_create_partition(p_year int)
+RETURNS boolean
+LANGUAGE plpgsql AS $$
+DECLARE
+	part text := format('habit_log_y%s', p_year);
+	lo date := make_date(p_year, 1, 1);
+	hi date := make_date(p_year + 1, 1, 1);
+BEGIN
+	-- Serialise concurrent callers (several API workers start at once)
+	PERFORM pg_advisory_xact_lock(hashtext('public.habit_log partitions'));
+	IF to_regclass(format('public.%I', part)) IS NOT NULL THEN
+		RETURN false;
+	END IF;
+
+	EXECUTE format('CREATE TABLE public.%I (LIKE public.habit_log INCLUDING DEFAULTS)', part);
+	EXECUTE format('ALTER TABLE public.%I ADD CONSTRAINT %I CHECK ("day" >= %L AND "day" < %L)',
+	               part, part || '_bounds', lo, hi);
+	EXECUTE format(
+		'WITH moved AS (DELETE FROM public.habit_log_default WHERE "day" >= %L AND "day" < %L RETURNING *)
+		 INSERT INTO public.%I (id, habit_id, "period", "day", completed, note, created_at)
+		 SELECT id, habit_id, "period", "day", completed, note, created_at FROM moved',
+		lo, hi, part);
+	EXECUTE format('ALTER TABLE public.habit_log ATTACH PARTITION public.%I FOR VALUES FROM (%L) TO (%L)',
+	               part, lo, hi);
+	EXECUTE format('ALTER TABLE public.%I DROP CONSTRAINT %I', part, part || '_bounds');
+	RETURN true;
+END $$;
+
+-- Partitions for the current year + `p_ahead` years, and for every year that
+-- has rows in habit_log_default. Returns how many partitions were created.
+CREATE OR REPLACE FUNCTION public.habit_log_ensure_partitions(p_ahead int DEFAULT 1)
+RETURNS int
+LANGUAGE plpgsql AS $$
+DECLARE
+	y int;
+	n int := 0;
+	this_year int := extract(year FROM current_date)::int;
+BEGIN
+	FOR y IN
+		SELECT g FROM generate_series(this_year, this_year + p_ahead) AS g
+		UNION
+		SELECT DISTINCT extract(year FROM "day")::int FROM public.habit_log_default
+		ORDER BY 1
+	LOOP
+		IF public.habit_log_create_partition(y) THEN
+			n := n + 1;
+		END IF;
+	END LOOP;
+	RETURN n;
+END $$;
+
+-- One partition per year present in the old table (plus this year and next),
+-- then copy the rows across
+SELECT public.habit_log_create_partition(y)
+FROM (
+	SELECT DISTINCT extract(year FROM "day")::int AS y FROM public.habit_log_unpartitioned
+	UNION
+	SELECT generate_series(extract(year FROM current_date)::int, extract(year FROM current_date)::int + 1)
+) years
+ORDER BY y;
+
+INSERT INTO public.habit_log (id, habit_id, "period", "day", completed, note, created_at)
+SELECT id, habit_id, "period", "day", completed, note, created_at
+FROM public.habit_log_unpartitioned;
+
+DROP TABLE public.habit_log_unpartitioned;
+
+CREATE SCHEMA IF NOT EXISTS habit_archive;
+
+COMMIT;
+
+ANALYZE public.habit_log;
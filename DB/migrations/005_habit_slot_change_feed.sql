@@ -0,0 +1,47 @@
+-- 005: change feed for the reminder scheduler (app/core/reminders.py)
+--
+-- Any change that can move or cancel a slot's reminder sends a NOTIFY on
+-- channel `habit_slot_changes` naming what to reload:
+--   {"slot": "<uuid>"}    habit_slot inserted / deleted / local_time or notify changed
+--   {"habit": "<uuid>"}   habit renamed or (un)archived
+--   {"user": "<uuid>"}    app_user.timezone changed
+-- Notifications are delivered on commit, so the scheduler never sees a
+-- rolled-back change, and identical payloads within a transaction collapse.
+
+CREATE OR REPLACE FUNCTION public.habit_slot_notify_change()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+	payload json;
+BEGIN
+	IF TG_TABLE_NAME = 'habit_slot' THEN
+		IF TG_OP = 'DELETE' THEN
+			payload := json_build_object('slot', OLD.id);
+		ELSE
+			payload := json_build_object('slot', NEW.id);
+		END IF;
+	ELSIF TG_TABLE_NAME = 'habit' THEN
+		payload := json_build_object('habit', NEW.id);
+	ELSE
+		payload := json_build_object('user', NEW.id);
+	END IF;
+	PERFORM pg_notify('habit_slot_changes', payload::text);
+	RETURN NULL;
+END $$;
+
+DROP TRIGGER IF EXISTS habit_slot_change_feed ON public.habit_slot;
+CREATE TRIGGER habit_slot_change_feed
+	AFTER INSERT OR DELETE OR UPDATE OF local_time, "notify" ON public.habit_slot
+	FOR EACH ROW EXECUTE FUNCTION public.habit_slot_notify_change();
+
+DROP TRIGGER IF EXISTS habit_change_feed ON public.habit;
+CREATE TRIGGER habit_change_feed
+	AFTER UPDATE OF "name", archived ON public.habit
+	FOR EACH ROW EXECUTE FUNCTION public.habit_slot_notify_change();
+
+DROP TRIGGER IF EXISTS app_user_change_feed ON public.app_user;
+CREATE TRIGGER app_user_change_feed
+	AFTER UPDATE OF timezone ON public.app_user
+	FOR EACH ROW
+	WHEN (OLD.timezone IS DISTINCT FROM NEW.timezone)
+	EXECUTE FUNCTION public.habit_slot_notify_change();
@@ -0,0 +1,44 @@
+-- 006: keep habit_log_ensure_partitions away from detached (archived) years
+--
+-- A year detached into the habit_archive schema no longer has a partition in
+-- public, so writes for it land in habit_log_default. 004's
+-- habit_log_create_partition then saw no public.habit_log_yYYYY and created
+-- a fresh one, splitting the year across two tables; app.core.partitions
+-- restore() failed on the name clash after that.
+--
+-- Archived years are now skipped: their new rows stay in habit_log_default
+-- until
+--   python -m app.cli.habit_log_partitions restore YYYY
+-- merges them into the archived partition and re-attaches it.
+
+CREATE OR REPLACE FUNCTION public.habit_log_create_partition(p_year int)
+RETURNS boolean
+LANGUAGE plpgsql AS $$
+DECLARE
+	part text := format('habit_log_y%s', p_year);
+	lo date := make_date(p_year, 1, 1);
+	hi date := make_date(p_year + 1, 1, 1);
+BEGIN
+	-- Serialise concurrent callers (several API workers start at once)
+	PERFORM pg_advisory_xact_lock(hashtext('public.habit_log partitions'));
+	IF to_regclass(format('public.%I', part)) IS NOT NULL THEN
+		RETURN false;
+	END IF;
+	-- Detached: restore() brings it (and the year's rows in the default partition) back
+	IF to_regclass(format('habit_archive.%I', part)) IS NOT NULL THEN
+		RETURN false;
+	END IF;
+
+	EXECUTE format('CREATE TABLE public.%I (LIKE public.habit_log INCLUDING DEFAULTS)', part);
+	EXECUTE format('ALTER TABLE public.%I ADD CONSTRAINT %I CHECK ("day" >= %L AND "day" < %L)',
+	               part, part || '_bounds', lo, hi);
+	EXECUTE format(
+		'WITH moved AS (DELETE FROM public.habit_log_default WHERE "day" >= %L AND "day" < %L RETURNING *)
+		 INSERT INTO public.%I (id, habit_id, "period", "day", completed, note, created_at)
+		 SELECT id, habit_id, "period", "day", completed, note, created_at FROM moved',
+		lo, hi, part);
+	EXECUTE format('ALTER TABLE public.habit_log ATTACH PARTITION public.%I FOR VALUES FROM (%L) TO (%L)',
+	               part, lo, hi);
+	EXECUTE format('ALTER TABLE public.%I DROP CONSTRAINT %I', part, part || '_bounds');
+	RETURN true;
+END $$;
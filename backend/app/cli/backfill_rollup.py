@@ -0,0 +1,54 @@
+# app/cli/backfill_rollup.py
+"""
+Rebuild public.habit_daily_rollup and public.habit_completion_bitmap from
+habit / habit_slot / habit_log.
+
+    python -m app.cli.backfill_rollup                 # every user
+    python -m app.cli.backfill_rollup --user <uuid>   # one user
+
+Each user is rebuilt in its own transaction, so the command can be re-run
+safely and does not hold locks on the whole table.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from typing import Optional
+
+import asyncpg
+
+from app.core import repo
+from app.core.config import settings
+
+
+async def backfill(dsn: str, user_id: Optional[str] = None) -> int:
+    conn = await asyncpg.connect(dsn)
+    try:
+        if user_id:
+            user_ids = [user_id]
+        else:
+            user_ids = [r["id"] for r in await conn.fetch("SELECT id::text FROM public.app_user ORDER BY id")]
+
+        for i, uid in enumerate(user_ids, 1):
+            async with conn.transaction():
+                await repo.rebuild_daily_rollup(conn, uid)
+                await repo.rebuild_completion_bitmaps(conn, uid)
+            if i % 100 == 0:
+                print(f"[backfill] {i}/{len(user_ids)} users")
+        return len(user_ids)
+    finally:
+        await conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rebuild the daily completion rollup and completion bitmaps")
+    parser.add_argument("--user", help="Only rebuild this user (UUID)")
+    parser.add_argument("--dsn", default=None, help="Defaults to settings.DATABASE_URL")
+    args = parser.parse_args()
+
+    n = asyncio.run(backfill(args.dsn or settings.DATABASE_URL, args.user))
+    print(f"[backfill] rebuilt rollup for {n} user(s)")
+
+
+if __name__ == "__main__":
+    main()
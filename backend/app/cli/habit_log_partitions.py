@@ -0,0 +1,86 @@
+# app/cli/habit_log_partitions.py
+"""
+Maintain the yearly habit_log partitions (see app.core.partitions).
+
+    python -m app.cli.habit_log_partitions list
+    python -m app.cli.habit_log_partitions ensure --ahead 1
+    python -m app.cli.habit_log_partitions archive --keep-years 3            # compact cold years
+    python -m app.cli.habit_log_partitions archive --keep-years 3 --detach   # move them to habit_archive
+    python -m app.cli.habit_log_partitions restore 2021
+
+Run `ensure` from cron (the API also runs it at startup); rows written for a
+year without a partition land in habit_log_default until then.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+
+import asyncpg
+
+from app.core import partitions
+from app.core.config import settings
+
+
+async def run(args: argparse.Namespace) -> None:
+    conn = await asyncpg.connect(args.dsn or settings.DATABASE_URL)
+    try:
+        if args.command == "list":
+            for p in await partitions.list_partitions(conn):
+                state = "attached" if p["attached"] else "detached"
+                print(f"{p['schema']}.{p['name']:<18}{state:<10}{p['approx_rows']:>12,} rows{p['bytes'] / 1e6:>10.1f} MB")
+
+        elif args.command == "ensure":
+            n = await partitions.ensure(conn, args.ahead)
+            print(f"[partitions] created {n} partition(s)")
+
+        elif args.command == "archive":
+            years = partitions.cold_years(await partitions.list_partitions(conn), args.keep_years)
+            if not years:
+                print("[partitions] nothing to archive")
+            for year in years:
+                if args.dry_run:
+                    print(f"[partitions] would {'detach' if args.detach else 'compact'} {year}")
+                    continue
+                if args.detach:
+                    await partitions.detach(conn, year)
+                    print(f"[partitions] detached {year} -> {partitions.ARCHIVE_SCHEMA}")
+                else:
+                    await partitions.compact(conn, year)
+                    print(f"[partitions] compacted {year}")
+
+        elif args.command == "restore":
+            await partitions.restore(conn, args.year)
+            print(f"[partitions] re-attached {args.year}")
+    finally:
+        await conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Maintain the yearly habit_log partitions")
+    parser.add_argument("--dsn", default=None, help="Defaults to settings.DATABASE_URL")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("list", help="Show yearly partitions and their sizes")
+
+    p = sub.add_parser("ensure", help="Create upcoming partitions and drain habit_log_default")
+    p.add_argument("--ahead", type=int, default=settings.HABIT_LOG_PARTITIONS_AHEAD)
+
+    p = sub.add_parser("archive", help="Compact (or detach) partitions older than --keep-years")
+    p.add_argument("--keep-years", type=int, required=True,
+                   help="Calendar years to leave untouched, counting the current one")
+    p.add_argument("--detach", action="store_true",
+                   help="Detach into the habit_archive schema (drops them from streaks and export)")
+    p.add_argument("--dry-run", action="store_true")
+
+    p = sub.add_parser("restore", help="Re-attach a detached year")
+    p.add_argument("year", type=int)
+
+    args = parser.parse_args()
+    if args.command == "archive" and args.keep_years < 1:
+        parser.error("--keep-years must be at least 1")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# app/cli/import_history.py
+"""
+Import a habit history file for one user (same format as POST /api/import).
+
+    python -m app.cli.import_history --user <uuid> history.ndjson
+    python -m app.cli.import_history --email me@example.com history.csv.gz --format csv
+
+Reads the file in chunks and stages rows with COPY, so memory stays flat for
+multi-million-row files. The import is a single transaction.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gzip
+import time
+from typing import AsyncIterator, Optional
+
+import asyncpg
+
+from app.core.config import settings
+from app.core.importer import HistoryImporter, iter_lines, iter_records
+
+CHUNK = 1 << 20
+
+
+async def _file_chunks(path: str) -> AsyncIterator[bytes]:
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        while True:
+            chunk = await asyncio.to_thread(f.read, CHUNK)
+            if not chunk:
+                return
+            yield chunk
+
+
+async def run(path: str, fmt: str, user_id: Optional[str], email: Optional[str], dsn: str) -> dict:
+    conn = await asyncpg.connect(dsn)
+    started = time.perf_counter()
+
+    def report(p: dict) -> None:
+        rate = p["records"] / max(time.perf_counter() - started, 1e-9)
+        print(f"[import] {p} ({rate:,.0f} rec/s)")
+
+    try:
+        if email:
+            user_id = await conn.fetchval("SELECT id::text FROM public.app_user WHERE email = $1", email)
+            if not user_id:
+                raise SystemExit(f"No user with email {email}")
+        async with conn.transaction():
+            imp = HistoryImporter(conn, user_id, on_progress=report)
+            await imp.start()
+            async for rec in iter_records(iter_lines(_file_chunks(path)), fmt):
+                await imp.add(rec)
+            return await imp.finish()
+    finally:
+        await conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bulk import habit history")
+    parser.add_argument("path", help=".ndjson / .csv, optionally .gz")
+    who = parser.add_mutually_exclusive_group(required=True)
+    who.add_argument("--user", help="Target user id (UUID)")
+    who.add_argument("--email", help="Target user email")
+    parser.add_argument("--format", choices=("ndjson", "csv"), default=None, help="Defaults from the file name")
+    parser.add_argument("--dsn", default=None, help="Defaults to settings.DATABASE_URL")
+    args = parser.parse_args()
+
+    fmt = args.format or ("csv" if ".csv" in args.path else "ndjson")
+    summary = asyncio.run(run(args.path, fmt, args.user, args.email, args.dsn or settings.DATABASE_URL))
+    print(f"[import] done: {summary}")
+
+
+if __name__ == "__main__":
+    main()
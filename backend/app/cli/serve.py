@@ -0,0 +1,238 @@
+# app/cli/serve.py
+"""
+Preforking launcher: one listening socket shared by N uvicorn workers.
+
+    python -m app.cli.serve --workers 4 --port 8000
+    python -m app.cli.serve --workers 4 --no-preload     # each worker imports the app itself
+
+The master binds the socket and, with --preload (the default), imports
+app.main once before forking. FastAPI, NumPy and the route table are then
+shared copy-on-write instead of being loaded N times. The master never
+starts an event loop or opens a DB connection. Each worker builds its pool,
+LISTEN connections and background tasks in the app's lifespan, after the
+fork.
+
+A worker reports on a pipe once its lifespan startup has finished. When all
+of them have, the master checks GET /health and prints one line per worker
+plus a summary:
+
+    [serve] worker pid=123 import_ms=0.0 boot_ms=212.4
+    [serve] ready workers=4 preload_ms=301.7 total_ms=538.0
+
+Dead workers are replaced. SIGINT / SIGTERM stop every worker (graceful,
+then SIGKILL after --graceful-timeout).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import select
+import signal
+import socket
+import sys
+import time
+import urllib.request
+from typing import Any, Dict, Optional
+
+
+def _bind(host: str, port: int, backlog: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _health(host: str, port: int, timeout: float = 2.0) -> Optional[Dict[str, Any]]:
+    host = "127.0.0.1" if host in ("0.0.0.0", "") else ("[::1]" if host == "::" else host)
+    try:
+        with urllib.request.urlopen(f"http://{host}:{port}/health", timeout=timeout) as resp:
+            return json.loads(resp.read())
+    except Exception:
+        return None
+
+
+# ──────────────────────────
+# Worker (child process)
+# ──────────────────────────
+def _worker(sock: socket.socket, ready_fd: int, app: Any, forked_at: float, args: argparse.Namespace) -> None:
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    t0 = time.monotonic()
+    if app is None:
+        from app.main import app
+    import_ms = (time.monotonic() - t0) * 1000
+
+    import asyncio
+
+    import uvicorn
+
+    config = uvicorn.Config(app, lifespan="on", log_level=args.log_level, access_log=args.access_log)
+    config.setup_event_loop()
+    server = uvicorn.Server(config)
+
+    async def run() -> None:
+        task = asyncio.create_task(server.serve(sockets=[sock]))
+        while not server.started and not task.done():
+            await asyncio.sleep(0.005)
+        if server.started:
+            line = {"pid": os.getpid(), "import_ms": import_ms, "boot_ms": (time.monotonic() - forked_at) * 1000}
+            # One short write per worker: atomic on a pipe (< PIPE_BUF)
+            os.write(ready_fd, (json.dumps(line) + "\n").encode())
+        await task
+
+    asyncio.run(run())
+
+
+# ──────────────────────────
+# Master
+# ──────────────────────────
+class Launcher:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.started_at = time.monotonic()
+        self.sock = _bind(args.host, args.port, args.backlog)
+        self.app: Any = None
+        self.preload_ms = 0.0
+        self.workers: Dict[int, float] = {}   # pid -> fork time
+        self.ready: Dict[int, Dict[str, Any]] = {}
+        self.stopping = False
+        self.announced = False
+        self._ready_r, self._ready_w = os.pipe()
+        self._buf = b""
+
+    def preload(self) -> None:
+        t0 = time.monotonic()
+        from app.main import app
+        import uvicorn  # noqa: F401  (shared with the workers too)
+        self.app = app
+        self.preload_ms = (time.monotonic() - t0) * 1000
+
+    def spawn(self) -> None:
+        forked_at = time.monotonic()
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                os.close(self._ready_r)
+                _worker(self.sock, self._ready_w, self.app, forked_at, self.args)
+            except BaseException as e:
+                print(f"[serve] worker {os.getpid()} failed: {e!r}", file=sys.stderr)
+                code = 1
+            finally:
+                os._exit(code)
+        self.workers[pid] = forked_at
+
+    def _stop(self, signum: int, frame: Any) -> None:
+        self.stopping = True
+
+    def _read_ready(self, timeout: float) -> None:
+        r, _, _ = select.select([self._ready_r], [], [], timeout)
+        if not r:
+            return
+        self._buf += os.read(self._ready_r, 65536)
+        *lines, self._buf = self._buf.split(b"\n")
+        for line in lines:
+            info = json.loads(line)
+            if info["pid"] in self.workers:
+                self.ready[info["pid"]] = info
+                print(f"[serve] worker pid={info['pid']} import_ms={info['import_ms']:.1f} boot_ms={info['boot_ms']:.1f}", flush=True)
+
+    def _reap(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            self.workers.pop(pid, None)
+            self.ready.pop(pid, None)
+            if not self.stopping:
+                print(f"[serve] worker pid={pid} exited ({status}), restarting", file=sys.stderr, flush=True)
+                time.sleep(1.0)
+                self.spawn()
+
+    def _announce(self) -> None:
+        health = None
+        for _ in range(20):
+            health = _health(self.args.host, self.args.port)
+            if health and health.get("ready"):
+                break
+            time.sleep(0.1)
+        total_ms = (time.monotonic() - self.started_at) * 1000
+        state = "ready" if health and health.get("ready") else "started (health check failing)"
+        print(f"[serve] {state} workers={len(self.ready)} preload_ms={self.preload_ms:.1f} total_ms={total_ms:.1f}", flush=True)
+        self.announced = True
+
+    def shutdown(self) -> None:
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + self.args.graceful_timeout
+        while self.workers and time.monotonic() < deadline:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid:
+                self.workers.pop(pid, None)
+            else:
+                time.sleep(0.05)
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+        self.sock.close()
+
+    def run(self) -> None:
+        signal.signal(signal.SIGINT, self._stop)
+        signal.signal(signal.SIGTERM, self._stop)
+        if self.args.preload:
+            self.preload()
+        for _ in range(self.args.workers):
+            self.spawn()
+        ready_deadline = time.monotonic() + self.args.ready_timeout
+        try:
+            while not self.stopping:
+                self._read_ready(0.2)
+                self._reap()
+                if not self.announced:
+                    if len(self.ready) >= self.args.workers:
+                        self._announce()
+                    elif time.monotonic() > ready_deadline:
+                        print(f"[serve] only {len(self.ready)}/{self.args.workers} workers ready "
+                              f"after {self.args.ready_timeout:.0f}s", file=sys.stderr, flush=True)
+                        ready_deadline = float("inf")
+        finally:
+            self.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the API with preforked uvicorn workers")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--preload", action=argparse.BooleanOptionalAction, default=True,
+                        help="Import the app in the master before forking (default: on)")
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--ready-timeout", type=float, default=60.0)
+    parser.add_argument("--graceful-timeout", type=float, default=30.0)
+    parser.add_argument("--log-level", default="warning")
+    parser.add_argument("--access-log", action="store_true")
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    Launcher(args).run()
+
+
+if __name__ == "__main__":
+    main()
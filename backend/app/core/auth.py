@@ -1,11 +1,14 @@
 # app/core/auth.py
 from __future__ import annotations
 
+import hashlib
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 
 import jwt
-from fastapi import Request, Response
+from fastapi import HTTPException, Request, Response
 from app.core.config import settings
 
 
@@ -92,6 +95,16 @@ def set_session_cookie(response: Response, token: str, *, domain: Optional[str]
     )
 
 
+def cookie_header(key: str, value: str, max_age: int) -> Tuple[bytes, bytes]:
+    """
+    Raw Set-Cookie header with the session cookie's attributes, for pure ASGI
+    middleware that has no Response object to call set_cookie() on.
+    """
+    r = Response()
+    r.set_cookie(key=key, value=value, max_age=max_age, domain=_cookie_domain_for_env(), **_cookie_common_kwargs())
+    return next((k, v) for k, v in r.raw_headers if k == b"set-cookie")
+
+
 def clear_session_cookie(response: Response, *, domain: Optional[str] = None) -> None:
     """
     Clear the session cookie. Pass the same domain attributes used when setting the cookie.
@@ -106,6 +119,76 @@ def clear_session_cookie(response: Response, *, domain: Optional[str] = None) ->
     )
 
 
+# ──────────────────────────
+# Verified-session cache
+# ──────────────────────────
+class SessionCache:
+    """
+    Bounded LRU of verified session payloads keyed by sha256(token).
+    An entry lives until the token's own `exp`, so a cached token is never
+    accepted past the point where decode_jwt would reject it.
+    Only touched from the event loop (require_user is async), so no lock.
+    """
+
+    def __init__(self, max_entries: int = 10_000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[bytes, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.time():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, token: str, payload: Dict[str, Any]) -> None:
+        exp = payload.get("exp")
+        if not isinstance(exp, (int, float)):
+            return
+        key = self._key(token)
+        self._entries[key] = (float(exp), payload)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+session_cache = SessionCache(settings.SESSION_CACHE_SIZE)
+
+
+def decode_session(token: str) -> Dict[str, Any]:
+    """
+    decode_jwt with the verified-session cache in front. Raises on failure.
+    """
+    payload = session_cache.get(token)
+    if payload is None:
+        payload = decode_jwt(token)
+        session_cache.put(token, payload)
+    return payload
+
+
 # ──────────────────────────
 # Current user helper
 # ──────────────────────────
@@ -117,16 +200,29 @@ def current_user_from_cookie(request: Request) -> Optional[Dict[str, Any]]:
     if not token:
         return None
     try:
-        payload = decode_jwt(token)
+        payload = decode_session(token)
         return {"id": payload["sub"], "email": payload.get("email")}
     except Exception:
         return None
 
 
+async def require_user(request: Request) -> Dict[str, Any]:
+    """
+    FastAPI dependency: the signed-in user {id, email}, or 401.
+    Async so FastAPI calls it on the event loop instead of the threadpool.
+    """
+    cj = current_user_from_cookie(request)
+    if not cj:
+        raise HTTPException(status_code=401, detail="Not signed in")
+    return cj
+
+
 __all__ = [
     "create_jwt",
     "decode_jwt",
     "set_session_cookie",
     "clear_session_cookie",
     "current_user_from_cookie",
+    "require_user",
+    "session_cache",
 ]
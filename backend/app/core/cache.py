@@ -0,0 +1,260 @@
+# app/core/cache.py
+"""
+Per-user response cache for read endpoints.
+
+Entries are keyed by (user, scope, params) and hold the encoded response body.
+A scope is the unit of invalidation: write paths name the scopes they touch
+(e.g. "checklist:2024-05-01", "daily_completion") or drop everything for the
+user. Invalidations advance a generation counter; a reader snapshots it before
+querying and its result is only stored if no invalidation happened in between,
+so a slow read can't repopulate the cache with pre-write data.
+
+Backends:
+  - MemoryBackend (default): in-process LRU bounded by entry count and bytes.
+    Coherent only within one worker.
+  - RedisBackend: shared store, keeps several uvicorn workers coherent.
+    Generation counters live in Redis; eviction is Redis' own maxmemory policy.
+"""
+from __future__ import annotations
+
+import hashlib
+import itertools
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from app.core.config import settings
+
+Params = Tuple[Any, ...]
+
+
+class CacheBackend(ABC):
+    """
+    Interface every backend implements. `token` is an opaque generation
+    snapshot returned by get() and handed back to set().
+    """
+
+    @abstractmethod
+    async def get(self, user_id: str, scope: str, params: Params) -> Tuple[Optional[bytes], Any]:
+        ...
+
+    @abstractmethod
+    async def set(self, user_id: str, scope: str, params: Params, value: bytes, token: Any) -> None:
+        ...
+
+    @abstractmethod
+    async def invalidate(self, user_id: str, scopes: Optional[Iterable[str]] = None) -> None:
+        """
+        Drop the given scopes for a user, or all of the user's entries when scopes is None.
+        """
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        ...
+
+
+class _Counters:
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+# ──────────────────────────
+# In-process backend
+# ──────────────────────────
+class MemoryBackend(CacheBackend):
+    # Per-user scope stamps kept before they are folded into the user-wide one
+    MAX_SCOPE_GENS = 256
+
+    def __init__(self, max_entries: int = 10_000, max_bytes: int = 64 * 1024 * 1024, max_users: int = 10_000):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_users = max_users
+        self.bytes = 0
+        self.counters = _Counters()
+        self._entries: "OrderedDict[Tuple[str, str, Params], bytes]" = OrderedDict()
+        # user -> scope -> keys, for precise invalidation without a scan
+        self._index: Dict[str, Dict[str, set]] = {}
+        # Invalidation stamps from one increasing clock. A (user, scope) token is
+        # the newer of the user-wide and the scope's own stamp, so invalidating
+        # one scope leaves readers of the user's other scopes free to store.
+        self._clock = itertools.count(1)
+        # Stamps are kept for the max_users most recently invalidated users (LRU).
+        # An evicted user's stamps fold into _floor, which every token includes:
+        # conservative, as a read racing the eviction is just not stored.
+        self._floor = 0
+        self._user_gens: "OrderedDict[str, int]" = OrderedDict()
+        self._scope_gens: Dict[str, Dict[str, int]] = {}
+
+    def _token(self, user_id: str, scope: str) -> int:
+        return max(
+            self._floor,
+            self._user_gens.get(user_id, 0),
+            self._scope_gens.get(user_id, {}).get(scope, 0),
+        )
+
+    def _drop(self, key: Tuple[str, str, Params]) -> None:
+        value = self._entries.pop(key, None)
+        if value is None:
+            return
+        self.bytes -= len(value)
+        user_id, scope, _ = key
+        scopes = self._index.get(user_id)
+        if scopes is not None:
+            keys = scopes.get(scope)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del scopes[scope]
+            if not scopes:
+                del self._index[user_id]
+
+    async def get(self, user_id: str, scope: str, params: Params) -> Tuple[Optional[bytes], Any]:
+        key = (user_id, scope, params)
+        value = self._entries.get(key)
+        if value is None:
+            self.counters.misses += 1
+        else:
+            self.counters.hits += 1
+            self._entries.move_to_end(key)
+        return value, self._token(user_id, scope)
+
+    async def set(self, user_id: str, scope: str, params: Params, value: bytes, token: Any) -> None:
+        if token != self._token(user_id, scope) or len(value) > self.max_bytes:
+            return
+        key = (user_id, scope, params)
+        self._drop(key)
+        self._entries[key] = value
+        self.bytes += len(value)
+        self._index.setdefault(user_id, {}).setdefault(scope, set()).add(key)
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.counters.evictions += 1
+
+    async def invalidate(self, user_id: str, scopes: Optional[Iterable[str]] = None) -> None:
+        self.counters.invalidations += 1
+        stamp = next(self._clock)
+        user_scopes = self._index.get(user_id, {})
+        self._user_gens.setdefault(user_id, 0)
+        self._user_gens.move_to_end(user_id)
+        if scopes is None:
+            targets = list(user_scopes)
+            self._user_gens[user_id] = stamp
+            self._scope_gens.pop(user_id, None)
+        else:
+            targets = list(scopes)
+            gens = self._scope_gens.setdefault(user_id, {})
+            for scope in targets:
+                gens[scope] = stamp
+            if len(gens) > self.MAX_SCOPE_GENS:
+                # Dated scopes (checklist:<day>) accumulate: fold them into one user-wide stamp
+                self._user_gens[user_id] = stamp
+                del self._scope_gens[user_id]
+        while len(self._user_gens) > self.max_users:
+            old, gen = self._user_gens.popitem(last=False)
+            self._floor = max(self._floor, gen, *self._scope_gens.pop(old, {}).values())
+        for scope in targets:
+            for key in list(user_scopes.get(scope, ())):
+                self._drop(key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "stamped_users": len(self._user_gens),
+            **self.counters.as_dict(),
+        }
+
+
+# ──────────────────────────
+# Shared (Redis) backend
+# ──────────────────────────
+class RedisBackend(CacheBackend):
+    """
+    Values live under rc:{user}:{user_gen}:{scope}:{scope_gen}:{params_hash};
+    invalidation just bumps a generation, so stale keys are never read again
+    and age out through the TTL / maxmemory policy.
+    """
+
+    def __init__(self, url: str, ttl: int = 3600):
+        import redis.asyncio as redis  # optional dependency
+
+        self._redis = redis.from_url(url)
+        self.ttl = ttl
+        self.counters = _Counters()
+
+    @staticmethod
+    def _params_hash(params: Params) -> str:
+        return hashlib.sha1(repr(params).encode()).hexdigest()[:16]
+
+    async def _token(self, user_id: str, scope: str) -> Tuple[int, int]:
+        ug, sg = await self._redis.mget(f"rc:{user_id}:gen", f"rc:{user_id}:{scope}:gen")
+        return int(ug or 0), int(sg or 0)
+
+    def _key(self, user_id: str, scope: str, params: Params, token: Tuple[int, int]) -> str:
+        return f"rc:{user_id}:{token[0]}:{scope}:{token[1]}:{self._params_hash(params)}"
+
+    async def get(self, user_id: str, scope: str, params: Params) -> Tuple[Optional[bytes], Any]:
+        token = await self._token(user_id, scope)
+        value = await self._redis.get(self._key(user_id, scope, params, token))
+        if value is None:
+            self.counters.misses += 1
+        else:
+            self.counters.hits += 1
+        return value, token
+
+    async def set(self, user_id: str, scope: str, params: Params, value: bytes, token: Any) -> None:
+        # A concurrent invalidation moved the generation on; this key is simply never read
+        await self._redis.set(self._key(user_id, scope, params, token), value, ex=self.ttl)
+
+    async def invalidate(self, user_id: str, scopes: Optional[Iterable[str]] = None) -> None:
+        self.counters.invalidations += 1
+        if scopes is None:
+            await self._redis.incr(f"rc:{user_id}:gen")
+            return
+        pipe = self._redis.pipeline()
+        for scope in scopes:
+            pipe.incr(f"rc:{user_id}:{scope}:gen")
+        await pipe.execute()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "redis", **self.counters.as_dict()}
+
+
+def _make_backend() -> CacheBackend:
+    if settings.RESPONSE_CACHE_BACKEND == "redis":
+        return RedisBackend(settings.RESPONSE_CACHE_URL)
+    return MemoryBackend(
+        settings.RESPONSE_CACHE_MAX_ENTRIES,
+        settings.RESPONSE_CACHE_MAX_BYTES,
+        settings.RESPONSE_CACHE_MAX_USERS,
+    )
+
+
+response_cache: CacheBackend = _make_backend()
+
+
+# ──────────────────────────
+# Scopes
+# ──────────────────────────
+def checklist_scope(day: Any) -> str:
+    return f"checklist:{day}"
+
+
+DAILY_COMPLETION_SCOPE = "daily_completion"
+CHECKLIST_RANGE_SCOPE = "checklist_range"
+HEATMAP_SCOPE = "heatmap"
@@ -6,6 +6,9 @@ class Settings(BaseSettings):
     JWT_SECRET: str
     DATABASE_URL: str
 
+    # Google JWKS; point at a local stand-in server in tests
+    GOOGLE_CERTS_URL: str = "https://www.googleapis.com/oauth2/v3/certs"
+
     # defaults
     JWT_ISS: str = "habit-tracker"
     JWT_AUD: str = "habit-tracker"
@@ -18,6 +21,65 @@ class Settings(BaseSettings):
     COOKIE_SECURE: bool = False
     COOKIE_SAMESITE: str = "lax"
 
+    SESSION_CACHE_SIZE: int = 10_000
+
+    # User profiles (/me payload + timezone for "today"); TTL bounds cross-worker staleness
+    PROFILE_CACHE_SIZE: int = 10_000
+    PROFILE_CACHE_TTL_S: float = 300.0
+
+    # Per-user response cache: "memory" (per worker) or "redis" (shared)
+    RESPONSE_CACHE_BACKEND: str = "memory"
+    RESPONSE_CACHE_URL: str = "redis://localhost:6379/0"
+    RESPONSE_CACHE_MAX_ENTRIES: int = 10_000
+    RESPONSE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    RESPONSE_CACHE_MAX_USERS: int = 10_000   # users whose invalidation stamps are kept (memory)
+
+    # Storage behind the handlers: "postgres" (DATABASE_URL with the pools and
+    # replicas below), or embedded "sqlite" (STORAGE_URL is the file) or "memory"
+    # (nothing persisted). Embedded backends run a single worker, without
+    # import / export, reminders or cross-worker events
+    STORAGE_BACKEND: str = "postgres"
+    STORAGE_URL: str = "habits.db"
+
+    # DB pool / admission control (per worker)
+    DB_POOL_MIN_SIZE: int = 2
+    DB_POOL_MAX_SIZE: int = 5
+    DB_WARMUP: bool = True               # prepare hot statements on each new connection
+    DB_STATEMENT_TIMEOUT_MS: int = 5000  # server-side statement_timeout; 0 = none
+    DB_MAX_WAITERS: int = 64             # requests queued for a connection before shedding
+    DB_ACQUIRE_TIMEOUT_S: float = 2.0    # max time a request waits for a connection
+    DB_WRITE_RESERVE: int = 1            # connections reads may never take
+    DB_RETRY_AFTER_S: int = 1
+
+    # /api/import and /api/export hold a connection for the whole upload / download:
+    # they get a small pool of their own (no statement_timeout) with its own queue
+    TRANSFER_POOL_SIZE: int = 2
+    TRANSFER_MAX_WAITERS: int = 4
+    TRANSFER_ACQUIRE_TIMEOUT_S: float = 5.0
+
+    # Streaming read replicas (comma-separated DSNs; empty = primary only). Reads
+    # from a client whose write (LSN cookie) a replica has not replayed go to the primary
+    DATABASE_REPLICA_URLS: str = ""
+    REPLICA_POLL_S: float = 0.2          # how often each worker reads replica replay LSNs
+    REPLICA_LSN_COOKIE: str = "wal_lsn"
+    REPLICA_STICKY_S: int = 60           # lifetime of the LSN cookie after a write
+
+    # /api/events (SSE): per-subscriber backlog before a "resync", keepalive interval
+    EVENTS_QUEUE_SIZE: int = 100
+    EVENTS_KEEPALIVE_S: float = 15.0
+
+    # Log named queries slower than this (ms); 0 disables the slow-query log
+    SLOW_QUERY_MS: int = 0
+
+    # habit_log yearly partitions created ahead of the current year at startup
+    HABIT_LOG_PARTITIONS_AHEAD: int = 1
+
+    # Reminder scheduler (one leader across workers): on/off, delivery sink
+    # ("events", "log", "memory" or "module:factory"), leader lock retry interval
+    REMINDERS_ENABLED: bool = True
+    REMINDERS_SINK: str = "events"
+    REMINDERS_LEADER_RETRY_S: float = 30.0
+
     class Config:
         env_file = ".env"   # ✅ auto-load from .env
 
@@ -1,11 +1,353 @@
-from psycopg2.pool import SimpleConnectionPool
+# app/core/db.py
+"""
+Per-worker asyncpg pool with admission control.
+
+Optional streaming replicas (DATABASE_REPLICA_URLS) get pools of their own;
+read-only handlers use get_read_pool(), which routes through
+app.core.replicas (read-your-writes via the client's last write LSN).
+Handlers take a Storage bound to these pools from get_storage() /
+get_read_storage(), or the embedded backend when STORAGE_BACKEND is not
+"postgres".
+
+Connections are handed out through AdmissionPool:
+  - at most DB_POOL_MAX_SIZE requests hold a connection; the rest wait in a
+    bounded queue (DB_MAX_WAITERS) for at most DB_ACQUIRE_TIMEOUT_S
+  - writes (non-GET requests) are admitted before queued reads, and reads may
+    never take the last DB_WRITE_RESERVE connections, so checkbox toggles
+    still go through while stats reads pile up
+  - a full queue or an expired wait is answered with 503 + Retry-After
+    instead of an unbounded queue or a pool-exhaustion 500
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+from collections import deque
+from typing import Any, Deque, Dict, List
+from urllib.parse import urlparse
+
+import asyncpg
+from fastapi import HTTPException, Request
+
+from app.core import queries as q
 from app.core.config import settings
+from app.core.metrics import InstrumentedPool, db_rejected
+from app.core.replicas import note_write, parse_lsn, replica_set
+from app.core.storage.base import Storage
+
+READ = "read"
+WRITE = "write"
+
+# Set per request by get_pool(); the pool reads it on acquire()
+request_priority: contextvars.ContextVar[str] = contextvars.ContextVar("request_priority", default=WRITE)
+
+
+class AppConnection(asyncpg.Connection):
+    """
+    Pool connection carrying its own prepared-statement cache (see app.core.queries).
+    The cache lives as long as the physical connection; the pool's release
+    reset does not DEALLOCATE, so statements survive across checkouts.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.prepared: Dict[str, asyncpg.prepared_stmt.PreparedStatement] = {}
+        # Set by mark_write(); read (and cleared) when the connection goes back to the pool
+        self.wrote = False
+
+
+def mark_write(conn: asyncpg.Connection) -> None:
+    """
+    Flag a pool connection as having written user data, so the commit LSN is
+    handed to the client for read-your-writes. No-op on plain connections.
+    """
+    if isinstance(conn, AppConnection):
+        conn.wrote = True
+
+
+# ──────────────────────────
+# Admission control
+# ──────────────────────────
+def overloaded(reason: str) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail=f"Server busy ({reason}), retry shortly",
+        headers={"Retry-After": str(settings.DB_RETRY_AFTER_S)},
+    )
+
+
+class _Admitted:
+    def __init__(self, gate: "AdmissionPool", timeout: Any):
+        self._gate = gate
+        self._timeout = timeout
+        self._conn = None
+
+    async def __aenter__(self) -> asyncpg.Connection:
+        await self._gate._admit(request_priority.get())
+        try:
+            self._conn = await self._gate.pool.acquire(timeout=self._timeout)
+        except BaseException:
+            self._gate._leave()
+            raise
+        return self._conn
+
+    async def __aexit__(self, *exc: Any) -> None:
+        try:
+            if getattr(self._conn, "wrote", False):
+                self._conn.wrote = False
+                if self._gate.track_writes:
+                    await self._note_write_lsn()
+            await self._gate.pool.release(self._conn)
+        finally:
+            self._gate._leave()
+
+    async def _note_write_lsn(self) -> None:
+        # After the handler's transaction: the commit record is at or before this LSN
+        try:
+            note_write(await self._conn.fetchval("SELECT pg_current_wal_lsn()::text"))
+        except Exception as e:
+            print(f"[db] could not read the write LSN: {e}")
+
+
+class AdmissionPool:
+    """
+    Wraps asyncpg.Pool; acquire() is an async context manager that first takes
+    an admission slot, then a connection. Other attributes are delegated.
+    """
+
+    def __init__(
+        self,
+        pool: asyncpg.Pool,
+        max_waiters: int,
+        acquire_timeout: float,
+        write_reserve: int,
+        track_writes: bool = False,
+    ):
+        self.pool = pool
+        self.track_writes = track_writes
+        self.size = pool.get_max_size()
+        self.read_limit = max(self.size - write_reserve, 1)
+        self.max_waiters = max_waiters
+        self.acquire_timeout = acquire_timeout
+        self.in_use = 0
+        self._waiters: Dict[str, Deque[asyncio.Future]] = {WRITE: deque(), READ: deque()}
+
+    def _limit(self, priority: str) -> int:
+        return self.size if priority == WRITE else self.read_limit
+
+    def _can_enter(self, priority: str) -> bool:
+        if self.in_use >= self._limit(priority):
+            return False
+        # Queued writes go first; queued reads only block other reads
+        return not self._waiters[WRITE] and (priority == WRITE or not self._waiters[READ])
+
+    def waiting(self) -> Dict[str, int]:
+        return {p: len(w) for p, w in self._waiters.items()}
+
+    async def _admit(self, priority: str) -> None:
+        if self._can_enter(priority):
+            self.in_use += 1
+            return
+        if sum(len(w) for w in self._waiters.values()) >= self.max_waiters:
+            db_rejected.inc((("priority", priority), ("reason", "queue_full")))
+            raise overloaded("queue full")
+
+        fut: asyncio.Future = asyncio.get_running_loop().create_future()
+        queue = self._waiters[priority]
+        queue.append(fut)
+        try:
+            # _wake() counts us in before resolving the future
+            await asyncio.wait_for(asyncio.shield(fut), self.acquire_timeout)
+        except asyncio.TimeoutError:
+            if fut.done() and not fut.cancelled():
+                return
+            fut.cancel()
+            db_rejected.inc((("priority", priority), ("reason", "timeout")))
+            raise overloaded("timed out waiting for a connection")
+        except BaseException:
+            if fut.done() and not fut.cancelled():
+                self._leave()
+            else:
+                fut.cancel()
+            raise
+        finally:
+            if fut in queue:
+                queue.remove(fut)
+
+    def _leave(self) -> None:
+        self.in_use -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        for priority in (WRITE, READ):
+            queue = self._waiters[priority]
+            while queue and self.in_use < self._limit(priority):
+                fut = queue.popleft()
+                if fut.done():
+                    continue
+                self.in_use += 1
+                fut.set_result(None)
+            if queue:
+                # Don't let reads overtake a write that is still waiting
+                return
+
+    def acquire(self, *, timeout: Any = None) -> _Admitted:
+        return _Admitted(self, timeout)
+
+    async def close(self) -> None:
+        await self.pool.close()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.pool, name)
+
+
+# ──────────────────────────
+# Pool lifecycle
+# ──────────────────────────
+async def _init_connection(conn: asyncpg.Connection) -> None:
+    # Prepare the hot statements up front so the first requests skip the parse step
+    for query in q.REGISTRY.values():
+        if query.prepare:
+            await q.prepared(conn, query)
+
+
+def replica_urls() -> List[str]:
+    return [u.strip() for u in settings.DATABASE_REPLICA_URLS.split(",") if u.strip()]
+
+
+async def _create(
+    dsn: str,
+    track_writes: bool = False,
+    min_size: int = settings.DB_POOL_MIN_SIZE,
+    max_size: int = settings.DB_POOL_MAX_SIZE,
+    statement_timeout_ms: int = settings.DB_STATEMENT_TIMEOUT_MS,
+    max_waiters: int = settings.DB_MAX_WAITERS,
+    acquire_timeout: float = settings.DB_ACQUIRE_TIMEOUT_S,
+    write_reserve: int = settings.DB_WRITE_RESERVE,
+) -> InstrumentedPool:
+    server_settings = {}
+    if statement_timeout_ms:
+        server_settings["statement_timeout"] = str(statement_timeout_ms)
+    pool = await asyncpg.create_pool(
+        dsn=dsn,
+        min_size=min_size,
+        max_size=max_size,
+        connection_class=AppConnection,
+        server_settings=server_settings,
+        init=_init_connection if settings.DB_WARMUP else None,
+    )
+    gated = AdmissionPool(
+        pool,
+        max_waiters=max_waiters,
+        acquire_timeout=acquire_timeout,
+        write_reserve=write_reserve,
+        track_writes=track_writes,
+    )
+    return InstrumentedPool(gated)
+
+
+async def create_pool() -> InstrumentedPool:
+    """
+    Create the per-worker asyncpg pool. Called once from the app startup hook.
+    Wrapped so acquire waits and pool occupancy show up in /metrics.
+    """
+    return await _create(settings.DATABASE_URL, track_writes=bool(replica_urls()))
+
+
+async def create_transfer_pool() -> InstrumentedPool:
+    """
+    Pool for /api/import and /api/export, which hold a connection for as long
+    as the upload or download lasts. TRANSFER_POOL_SIZE connections without a
+    statement_timeout; extra transfers queue (TRANSFER_MAX_WAITERS) or get 503,
+    and never take a request-pool connection.
+    """
+    size = settings.TRANSFER_POOL_SIZE
+    return await _create(
+        settings.DATABASE_URL,
+        track_writes=bool(replica_urls()),
+        min_size=1,
+        max_size=size,
+        statement_timeout_ms=0,
+        max_waiters=settings.TRANSFER_MAX_WAITERS,
+        acquire_timeout=settings.TRANSFER_ACQUIRE_TIMEOUT_S,
+        write_reserve=0,
+    )
+
+
+async def create_replica_pools() -> Dict[str, InstrumentedPool]:
+    """
+    One pool per DATABASE_REPLICA_URLS entry, keyed by host:port (for /health).
+    """
+    pools = {}
+    for dsn in replica_urls():
+        url = urlparse(dsn)
+        pools[f"{url.hostname}:{url.port or 5432}"] = await _create(dsn)
+    return pools
+
+
+async def get_pool(request: Request) -> asyncpg.Pool:
+    """
+    FastAPI dependency: the asyncpg pool stored on app.state by startup.
+    Also tags the request as a read (GET/HEAD) or write for admission control.
+    """
+    pool = getattr(request.app.state, "pool", None)
+    if pool is None:
+        raise HTTPException(status_code=500, detail="DB pool not initialized")
+    request_priority.set(READ if request.method in ("GET", "HEAD") else WRITE)
+    return pool
+
+
+async def get_transfer_pool(request: Request) -> asyncpg.Pool:
+    """
+    FastAPI dependency for bulk import / export: the transfer pool on app.state.
+    """
+    if settings.STORAGE_BACKEND != "postgres":
+        raise HTTPException(status_code=501, detail="Import / export needs the postgres storage backend")
+    pool = getattr(request.app.state, "transfer_pool", None)
+    if pool is None:
+        raise HTTPException(status_code=500, detail="DB pool not initialized")
+    request_priority.set(READ if request.method in ("GET", "HEAD") else WRITE)
+    return pool
+
+
+async def get_read_pool(request: Request) -> asyncpg.Pool:
+    """
+    FastAPI dependency for read-only handlers: a replica pool when one has
+    replayed the client's last write (LSN cookie), else the primary pool.
+    """
+    primary = await get_pool(request)
+    if not replica_set.replicas:
+        return primary
+    min_lsn = parse_lsn(request.cookies.get(settings.REPLICA_LSN_COOKIE))
+    return replica_set.choose(min_lsn) or primary
+
+
+# ──────────────────────────
+# Storage
+# ──────────────────────────
+def _storage(request: Request) -> Storage:
+    storage = getattr(request.app.state, "storage", None)
+    if storage is None:
+        raise HTTPException(status_code=500, detail="Storage not initialized")
+    return storage
+
 
-pool = SimpleConnectionPool(minconn=1, maxconn=5, dsn=settings.DATABASE_URL)
+async def get_storage(request: Request) -> Storage:
+    """
+    FastAPI dependency: the configured Storage (settings.STORAGE_BACKEND).
+    On Postgres it runs on get_pool(); embedded backends have no pool.
+    """
+    storage = _storage(request)
+    if getattr(request.app.state, "pool", None) is None:
+        return storage
+    return storage.with_pool(await get_pool(request))
 
-def dbconn():
-    return pool.getconn()
 
-def dbput(conn):
-    if conn:
-        pool.putconn(conn)
+async def get_read_storage(request: Request) -> Storage:
+    """
+    get_storage() for read-only handlers: on Postgres it runs on get_read_pool().
+    """
+    storage = _storage(request)
+    if getattr(request.app.state, "pool", None) is None:
+        return storage
+    return storage.with_pool(await get_read_pool(request))
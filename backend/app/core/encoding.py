@@ -0,0 +1,123 @@
+# app/core/encoding.py
+"""
+Response encodings for the checklist and stats endpoints, picked from Accept:
+
+    application/json                      rows as objects (default)
+    application/vnd.habit.columnar+json   lists of row objects become
+                                          {"field": [values...]} columns
+    application/msgpack                   the columnar payload as MessagePack
+
+Columnar output names each key once instead of once per row, which is what
+makes the 365-day daily_completion payload small. Every body is encoded with
+orjson (or msgpack); bench.encoding measures the difference.
+"""
+from __future__ import annotations
+
+from typing import Any, Iterator, List, Tuple
+
+import orjson
+from fastapi import Request, Response
+
+try:
+    import msgpack  # optional dependency
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+JSON = "application/json"
+COLUMNAR = "application/vnd.habit.columnar+json"
+MSGPACK = "application/msgpack"
+
+_ALIASES = {
+    "application/x-msgpack": MSGPACK,
+    "application/vnd.msgpack": MSGPACK,
+}
+
+
+def supported() -> List[str]:
+    return [JSON, COLUMNAR] + ([MSGPACK] if msgpack is not None else [])
+
+
+def _weighted(header: str) -> Iterator[Tuple[str, float]]:
+    """
+    (value, q) per entry of an Accept-style header, values lower-cased.
+    """
+    for part in header.split(","):
+        value, *params = (p.strip() for p in part.split(";"))
+        q = 1.0
+        for p in params:
+            if p.startswith("q="):
+                try:
+                    q = float(p[2:])
+                except ValueError:
+                    q = 0.0
+        yield value.lower(), q
+
+
+def negotiate(request: Request) -> str:
+    """
+    Best supported media type from the Accept header (q-values honoured), else JSON.
+    """
+    header = request.headers.get("accept")
+    if not header:
+        return JSON
+    offered = supported()
+    best, best_q = JSON, -1.0
+    for media, q in _weighted(header):
+        media = _ALIASES.get(media, media)
+        if q <= 0 or media not in offered:
+            continue
+        # Ties keep the earlier entry; a bare */* or application/json just yields JSON
+        if q > best_q:
+            best, best_q = media, q
+    return best
+
+
+def accepts_gzip(request: Request) -> bool:
+    """
+    Whether Accept-Encoding allows gzip: listed with q > 0, or covered by "*"
+    when gzip itself is not listed ("gzip;q=0" refuses it).
+    """
+    header = request.headers.get("accept-encoding")
+    if not header:
+        return False
+    star = 0.0
+    for coding, q in _weighted(header):
+        if coding in ("gzip", "x-gzip"):
+            return q > 0
+        if coding == "*":
+            star = q
+    return star > 0
+
+
+# ──────────────────────────
+# Encoding
+# ──────────────────────────
+def _is_rows(value: Any) -> bool:
+    return isinstance(value, list) and bool(value) and all(isinstance(v, dict) for v in value)
+
+
+def columnar(payload: Any) -> Any:
+    """
+    Turn lists of row dicts into dicts of columns, at the top level and one
+    level down (e.g. the "habits" list inside the streaks payload).
+    """
+    if _is_rows(payload):
+        keys = list(payload[0])
+        return {k: [row.get(k) for row in payload] for k in keys}
+    if isinstance(payload, dict):
+        return {k: columnar(v) if _is_rows(v) else v for k, v in payload.items()}
+    return payload
+
+
+def encode(payload: Any, media_type: str = JSON) -> bytes:
+    if media_type == COLUMNAR:
+        return orjson.dumps(columnar(payload))
+    if media_type == MSGPACK:
+        return msgpack.packb(columnar(payload), use_bin_type=True)
+    return orjson.dumps(payload)
+
+
+def encoded_response(body: bytes, media_type: str) -> Response:
+    resp = Response(content=body, media_type=media_type)
+    resp.headers["Vary"] = "Accept"
+    return resp
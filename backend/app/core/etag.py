@@ -0,0 +1,39 @@
+# app/core/etag.py
+"""
+ETag helpers for conditional GET on per-user read endpoints.
+
+The tag is derived from app_user.data_version (bumped on every write) plus the
+endpoint and its resolved parameters, so it can be checked with one primary-key
+lookup before any heavy SQL runs.
+"""
+import hashlib
+
+from fastapi import Request, Response
+
+# Browsers must revalidate, but may keep the body and send If-None-Match
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(version: int, *parts: object) -> str:
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode()).hexdigest()[:16]
+    return f'W/"{version}-{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison: ignore W/ prefixes
+    wanted = etag.removeprefix("W/")
+    return any(t.strip().removeprefix("W/") == wanted for t in header.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def set_etag(response: Response, etag: str) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
@@ -0,0 +1,159 @@
+# app/core/events.py
+"""
+Per-user change events pushed to open clients (GET /api/events, SSE).
+
+Write paths hand their event to the Storage write method (which queues it
+with the write), call Storage.publish(), or repo.notify_event() inside their
+transaction; Postgres delivers the NOTIFY on commit (never for a rolled-back
+write) to every worker. Each worker keeps
+ONE dedicated LISTEN connection and fans events out to its subscribers
+through bounded in-memory queues, so an idle client costs a queue and a
+coroutine, never a pool connection. The embedded storage backends have no
+NOTIFY and call publish() on the hub directly.
+
+Event payloads are deltas the client can apply without refetching:
+
+    {"type": "habit_log", "logs": [{habit_id, period, day, completed}, ...]}
+    {"type": "habit_created", "habit": {id, name, period, local_time}}
+    {"type": "reminder", habit_id, name, period, local_time, day}   # app.core.reminders
+    {"type": "resync"}          # state may have been missed; refetch
+
+"resync" is sent when a subscriber's queue overflowed or the listener had to
+reconnect (NOTIFYs sent while it was down are lost).
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import Any, Dict, Optional, Set
+
+import asyncpg
+
+from app.core.config import settings
+
+CHANNEL = "habit_events"
+# Postgres caps NOTIFY payloads at 8000 bytes; larger deltas degrade to "resync"
+MAX_PAYLOAD = 7900
+
+RESYNC = {"type": "resync"}
+
+
+def encode_event(user_id: str, event: Dict[str, Any]) -> str:
+    payload = json.dumps({"user": user_id, **event}, separators=(",", ":"), default=str)
+    if len(payload.encode()) > MAX_PAYLOAD:
+        payload = json.dumps({"user": user_id, **RESYNC}, separators=(",", ":"))
+    return payload
+
+
+class Subscription:
+    def __init__(self, hub: "EventHub", user_id: str, max_queue: int):
+        self.hub = hub
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+
+    def push(self, event: Dict[str, Any]) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Slow consumer: drop the backlog and tell it to refetch
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+    async def get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self) -> None:
+        self.hub.unsubscribe(self)
+
+
+class EventHub:
+    def __init__(self, dsn: str, max_queue: int = 100):
+        self.dsn = dsn
+        self.max_queue = max_queue
+        self._subs: Dict[str, Set[Subscription]] = {}
+        self._conn: Optional[asyncpg.Connection] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lost = asyncio.Event()
+
+    # ---- subscribers ----
+    def subscribe(self, user_id: str) -> Subscription:
+        sub = Subscription(self, user_id, self.max_queue)
+        self._subs.setdefault(user_id, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        subs = self._subs.get(sub.user_id)
+        if subs is not None:
+            subs.discard(sub)
+            if not subs:
+                del self._subs[sub.user_id]
+
+    def publish(self, user_id: str, event: Dict[str, Any]) -> None:
+        for sub in list(self._subs.get(user_id, ())):
+            sub.push(event)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "listening": self._conn is not None and not self._conn.is_closed(),
+            "users": len(self._subs),
+            "subscribers": sum(len(s) for s in self._subs.values()),
+        }
+
+    # ---- LISTEN connection ----
+    def _on_notify(self, conn: Any, pid: int, channel: str, payload: str) -> None:
+        try:
+            event = json.loads(payload)
+            user_id = event.pop("user")
+        except (ValueError, KeyError):
+            return
+        self.publish(user_id, event)
+
+    def _on_lost(self, conn: Any) -> None:
+        self._lost.set()
+
+    async def _listen_loop(self) -> None:
+        delay = 1.0
+        first = True
+        while True:
+            try:
+                self._lost.clear()
+                self._conn = await asyncpg.connect(self.dsn)
+                self._conn.add_termination_listener(self._on_lost)
+                await self._conn.add_listener(CHANNEL, self._on_notify)
+                if not first:
+                    for subs in list(self._subs.values()):
+                        for sub in list(subs):
+                            sub.push(RESYNC)
+                first, delay = False, 1.0
+                await self._lost.wait()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[events] listener error: {e}")
+            finally:
+                if self._conn is not None and not self._conn.is_closed():
+                    await self._conn.close()
+                self._conn = None
+            first = False
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen_loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+event_hub = EventHub(settings.DATABASE_URL, settings.EVENTS_QUEUE_SIZE)
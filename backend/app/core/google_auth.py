@@ -0,0 +1,167 @@
+# app/core/google_auth.py
+"""
+Local verification of Google ID tokens.
+
+Google's signing keys (JWKS) are held in memory and refreshed in the background
+before their Cache-Control max-age runs out, so a login never waits on an
+outbound HTTP call in the common case. A token signed with an unknown `kid`
+(key rotation) triggers a refetch; concurrent callers share one in-flight
+fetch. Signature checks run in a worker
+thread so RSA verification does not block the event loop.
+"""
+from __future__ import annotations
+
+import asyncio
+import re
+import time
+from typing import Any, Dict, Optional
+
+import jwt
+
+from app.core.config import settings
+
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+
+class JWKSUnavailable(Exception):
+    """
+    Google's keys could not be fetched: the token was not checked, so this is
+    not a verdict on the credential.
+    """
+
+
+class GoogleKeyStore:
+    """
+    In-memory JWKS cache with background refresh.
+    """
+
+    # Fallback lifetime when the response has no max-age
+    DEFAULT_MAX_AGE = 3600
+    # Refresh this long before expiry; never hammer the endpoint faster than MIN_REFETCH
+    REFRESH_MARGIN = 300
+    MIN_REFETCH = 30
+
+    def __init__(self, url: str):
+        self.url = url
+        self._keys: Dict[str, Any] = {}
+        self._expires_at = 0.0
+        self._fetched_at = 0.0
+        # The one fetch in flight; every caller that needs keys awaits it
+        self._inflight: Optional[asyncio.Future] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # ---- fetching ----
+    def _fetch_sync(self) -> tuple[Dict[str, Any], int]:
+        import requests  # deferred: only needed once the first refresh runs
+
+        try:
+            resp = requests.get(self.url, timeout=5)
+            resp.raise_for_status()
+            body = resp.json()
+        except (requests.RequestException, ValueError) as e:
+            raise JWKSUnavailable(f"JWKS fetch from {self.url} failed: {e}") from e
+        m = _MAX_AGE_RE.search(resp.headers.get("Cache-Control", ""))
+        max_age = int(m.group(1)) if m else self.DEFAULT_MAX_AGE
+        keys = {}
+        for jwk in body.get("keys", []):
+            if jwk.get("kid"):
+                keys[jwk["kid"]] = jwt.PyJWK(jwk).key
+        return keys, max_age
+
+    async def _fetch(self) -> None:
+        keys, max_age = await asyncio.to_thread(self._fetch_sync)
+        self._keys = keys
+        self._fetched_at = time.monotonic()
+        self._expires_at = self._fetched_at + max_age
+
+    def _clear_inflight(self, fut: asyncio.Future) -> None:
+        self._inflight = None
+        if not fut.cancelled():
+            fut.exception()  # retrieved by the awaiters; keeps asyncio from logging it again
+
+    async def refresh(self) -> None:
+        """
+        Fetch the keys, joining the fetch already in flight if there is one.
+        """
+        if self._inflight is None:
+            self._inflight = asyncio.ensure_future(self._fetch())
+            self._inflight.add_done_callback(self._clear_inflight)
+        # shield: a caller giving up (client disconnect) must not cancel the others' fetch
+        await asyncio.shield(self._inflight)
+
+    async def _refetch_for_unknown_kid(self) -> None:
+        # A fetch already running will see the rotated key too; otherwise rate-limit
+        if self._inflight is None and time.monotonic() - self._fetched_at < self.MIN_REFETCH:
+            return
+        await self.refresh()
+
+    async def get_key(self, kid: str) -> Any:
+        """
+        Signing key for `kid`. Raises JWKSUnavailable when the keys cannot be
+        fetched and jwt.InvalidTokenError when Google does not publish `kid`.
+        """
+        if not self._keys or time.monotonic() >= self._expires_at:
+            await self.refresh()
+        key = self._keys.get(kid)
+        if key is None:
+            await self._refetch_for_unknown_kid()
+            key = self._keys.get(kid)
+        if key is None:
+            raise jwt.InvalidTokenError(f"Unknown Google signing key: {kid}")
+        return key
+
+    # ---- background refresh ----
+    async def _refresh_loop(self) -> None:
+        try:
+            await self.refresh()
+        except Exception as e:
+            # Logins will fetch on demand; don't fail on a network blip
+            print(f"[google-auth] initial JWKS fetch failed: {e}")
+        while True:
+            delay = max(self._expires_at - time.monotonic() - self.REFRESH_MARGIN, self.MIN_REFETCH)
+            await asyncio.sleep(delay)
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"[google-auth] JWKS refresh failed: {e}")
+
+    async def start(self) -> None:
+        # The first fetch runs in the background so worker boot never waits on Google
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+google_keys = GoogleKeyStore(settings.GOOGLE_CERTS_URL)
+
+
+async def verify_google_id_token(token: str, audience: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Verify a Google ID token locally and return its claims. Raises
+    JWKSUnavailable if the keys cannot be fetched, a jwt error otherwise.
+    """
+    kid = jwt.get_unverified_header(token).get("kid")
+    if not kid:
+        raise jwt.InvalidTokenError("Google token has no kid")
+    key = await google_keys.get_key(kid)
+    claims = await asyncio.to_thread(
+        jwt.decode,
+        token,
+        key,
+        algorithms=["RS256"],
+        audience=audience or settings.GOOGLE_CLIENT_ID,
+        options={"require": ["exp", "iat", "iss", "aud", "sub"]},
+    )
+    if claims.get("iss") not in GOOGLE_ISSUERS:
+        raise jwt.InvalidIssuerError("Wrong issuer")
+    return claims
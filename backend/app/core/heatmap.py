@@ -0,0 +1,80 @@
+# app/core/heatmap.py
+"""
+Year heatmaps from packed completion bitmaps (public.habit_completion_bitmap).
+
+Every slot's 46-byte bitmap is unpacked into one row of a (slots x days) bool
+matrix with a single np.unpackbits call; per-day counts and per-slot rates
+are column / row sums over that matrix. A slot is due on a day from its
+habit's creation day up to today (days it was completed count as due too,
+e.g. imported history that predates the habit row).
+"""
+from __future__ import annotations
+
+import base64
+import calendar
+from datetime import date
+from typing import Any, Dict, List
+
+import asyncpg
+import numpy as np
+
+BITMAP_BYTES = 46
+_EMPTY = bytes(BITMAP_BYTES)
+
+
+def unpack(bitmaps: List[bytes], n_days: int) -> np.ndarray:
+    """
+    (len(bitmaps), n_days) bool matrix; bit i of a bitmap is day-of-year i + 1.
+    """
+    if not bitmaps:
+        return np.zeros((0, n_days), dtype=bool)
+    packed = np.frombuffer(b"".join(bitmaps), dtype=np.uint8).reshape(len(bitmaps), BITMAP_BYTES)
+    return np.unpackbits(packed, axis=1, bitorder="little")[:, :n_days].astype(bool)
+
+
+def due_matrix(created_on: List[date], year: int, n_days: int, today: date) -> np.ndarray:
+    start = date(year, 1, 1)
+    first = np.array([(d - start).days for d in created_on], dtype=np.int64).reshape(-1, 1)
+    last = min((today - start).days, n_days - 1)
+    idx = np.arange(n_days, dtype=np.int64)
+    return (idx >= first) & (idx <= last)
+
+
+def _rates(done: np.ndarray, due: np.ndarray) -> np.ndarray:
+    return np.divide(done, due, out=np.zeros(done.shape, dtype=np.float64), where=due > 0)
+
+
+def build(rows: List[asyncpg.Record], year: int, today: date) -> Dict[str, Any]:
+    n_days = 366 if calendar.isleap(year) else 365
+    bitmaps = [bytes(r["bits"]) if r["bits"] is not None else _EMPTY for r in rows]
+    done = unpack(bitmaps, n_days)
+    due = due_matrix([r["created_on"] for r in rows], year, n_days, today) | done
+
+    day_done = done.sum(axis=0)
+    day_due = due.sum(axis=0)
+    slot_done = done.sum(axis=1)
+    slot_due = due.sum(axis=1)
+    slot_rate = _rates(slot_done, slot_due)
+
+    return {
+        "year": year,
+        "start": date(year, 1, 1).isoformat(),
+        "days": n_days,
+        "bit_order": "little",
+        "slots": [
+            {
+                "habit_id": str(r["habit_id"]),
+                "name": r["name"],
+                "period": r["period"],
+                "bits": base64.b64encode(b).decode(),
+                "done": int(slot_done[i]),
+                "due": int(slot_due[i]),
+                "rate": round(float(slot_rate[i]), 4),
+            }
+            for i, (r, b) in enumerate(zip(rows, bitmaps))
+        ],
+        "completed": day_done.tolist(),
+        "total": day_due.tolist(),
+        "rate": np.round(_rates(day_done, day_due), 4).tolist(),
+    }
+
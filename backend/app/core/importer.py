@@ -0,0 +1,390 @@
+# app/core/importer.py
+"""
+Bulk import of habits, slots and habit_log history.
+
+Input is a stream of records, either NDJSON (one object per line) or CSV with
+a header row. Every record has a `type`:
+
+    habit  ref, name?, archived?, created_at?
+    slot   habit, period, local_time? (HH:MM), notify?
+    log    habit, period, day (YYYY-MM-DD), completed?, note?
+
+`ref` / `habit` is the source tracker's habit key; it becomes the habit name
+unless `name` is given, and habits are matched to existing ones by name, so
+re-running an import updates instead of duplicating.
+
+Rows are staged in temp tables with COPY (copy_records_to_table) in fixed-size
+batches, then merged with set-based upserts that respect the
+(habit_id, day, period) and (habit_id, period) unique constraints. Only one
+batch is held in memory, so multi-million-row files stream in constant memory.
+Staged and skipped records are counted in habit_import_records_total
+(/metrics) as they go, so a long import's progress is visible while it runs.
+"""
+from __future__ import annotations
+
+import codecs
+import csv
+import json
+from collections import deque
+from datetime import date, datetime, time
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional
+
+import asyncpg
+
+from app.core import repo
+from app.core.metrics import import_records
+
+PERIODS = {"MORNING", "AFTERNOON", "NIGHT"}
+_TRUE = {"1", "true", "t", "yes", "y"}
+MAX_REPORTED_ERRORS = 20
+# A CSV record whose quotes stay open this long is treated as malformed
+MAX_RECORD_LINES = 1_000
+MAX_NOTE_CHARS = 2_000
+
+
+class BadRecord(ValueError):
+    """A single bad record; the importer skips it and reports it."""
+
+
+# ──────────────────────────
+# Parsing
+# ──────────────────────────
+class _LineFeed:
+    """
+    Line iterator for csv.reader that iter_records tops up one record at a time.
+    Running dry between records just ends the current next(reader) call.
+    """
+
+    def __init__(self) -> None:
+        self.lines: Deque[str] = deque()
+
+    def __iter__(self) -> "_LineFeed":
+        return self
+
+    def __next__(self) -> str:
+        if not self.lines:
+            raise StopIteration
+        return self.lines.popleft()
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """
+    Split an async byte stream into text lines without buffering the whole body.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    tail = ""
+    async for chunk in chunks:
+        tail += decoder.decode(chunk)
+        *lines, tail = tail.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    tail += decoder.decode(b"", final=True)
+    if tail:
+        yield tail.rstrip("\r")
+
+
+async def iter_records(lines: AsyncIterator[str], fmt: str) -> AsyncIterator[Dict[str, Any]]:
+    if fmt == "ndjson":
+        async for line in lines:
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield {"__error__": f"invalid JSON: {e}"}
+    elif fmt == "csv":
+        # One reader over the whole body, fed a record's physical lines at a time:
+        # a quoted field may span lines (a note with a newline in it).
+        feed = _LineFeed()
+        reader = csv.reader(feed)
+        header: Optional[List[str]] = None
+        pending: List[str] = []
+        quotes = 0
+        async for line in lines:
+            if not pending and not line.strip():
+                continue
+            pending.append(line + "\n")
+            quotes += line.count('"')
+            if quotes % 2:
+                # Inside a quoted field ("" escapes keep the count even)
+                if len(pending) < MAX_RECORD_LINES:
+                    continue
+                pending, quotes = [], 0
+                yield {"__error__": f"quoted field spans more than {MAX_RECORD_LINES} lines"}
+                continue
+            feed.lines.extend(pending)
+            pending, quotes = [], 0
+            try:
+                row = next(reader)
+            except csv.Error as e:
+                yield {"__error__": f"invalid CSV: {e}"}
+                continue
+            if header is None:
+                header = [h.strip() for h in row]
+                continue
+            yield {k: (v if v != "" else None) for k, v in zip(header, row)}
+        if pending:
+            yield {"__error__": "unterminated quoted field at end of input"}
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+
+def _bool(v: Any, default: bool) -> bool:
+    if v is None:
+        return default
+    if isinstance(v, bool):
+        return v
+    return str(v).strip().lower() in _TRUE
+
+
+def _period(v: Any) -> str:
+    p = str(v or "").strip().upper()
+    if p not in PERIODS:
+        raise BadRecord(f"period must be one of {sorted(PERIODS)}")
+    return p
+
+
+def _note(v: Any) -> Optional[str]:
+    # Checked here: a bad value reaching COPY would fail the whole import
+    if v is None:
+        return None
+    if not isinstance(v, str):
+        raise BadRecord("note must be a string")
+    if len(v) > MAX_NOTE_CHARS:
+        raise BadRecord(f"note is longer than {MAX_NOTE_CHARS} characters")
+    if "\x00" in v:
+        raise BadRecord("note contains a NUL character")
+    return v
+
+
+def _ref(rec: Dict[str, Any], key: str) -> str:
+    ref = rec.get(key)
+    if not ref:
+        raise BadRecord(f"missing '{key}'")
+    return str(ref)
+
+
+# ──────────────────────────
+# Importer
+# ──────────────────────────
+class HistoryImporter:
+    """
+    Usage (inside a transaction on a dedicated connection):
+
+        imp = HistoryImporter(conn, user_id)
+        await imp.start()
+        async for rec in iter_records(...):
+            await imp.add(rec)
+        summary = await imp.finish()
+    """
+
+    def __init__(
+        self,
+        conn: asyncpg.Connection,
+        user_id: str,
+        batch_size: int = 10_000,
+        on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+        progress_every: int = 100_000,
+    ):
+        self.conn = conn
+        self.user_id = user_id
+        self.batch_size = batch_size
+        self.on_progress = on_progress
+        self.progress_every = progress_every
+        self.seen = 0
+        self.staged = {"habit": 0, "slot": 0, "log": 0}
+        self.skipped = 0
+        self.errors: List[str] = []
+        self._buf: Dict[str, List[tuple]] = {"habit": [], "slot": [], "log": []}
+
+    async def start(self) -> None:
+        await self.conn.execute(
+            """
+            CREATE TEMP TABLE import_habit (
+              seq bigint, ref text, name text, archived bool, created_at timestamptz
+            ) ON COMMIT DROP;
+            CREATE TEMP TABLE import_slot (
+              seq bigint, ref text, period text, local_time time, notify bool
+            ) ON COMMIT DROP;
+            CREATE TEMP TABLE import_log (
+              seq bigint, ref text, period text, day date, completed bool, note text
+            ) ON COMMIT DROP;
+            """
+        )
+
+    def _parse(self, rec: Any) -> tuple[str, tuple]:
+        if not isinstance(rec, dict):
+            raise BadRecord("record must be a JSON object")
+        if "__error__" in rec:
+            raise BadRecord(rec["__error__"])
+        kind = str(rec.get("type") or "").strip().lower()
+        seq = self.seen
+        try:
+            if kind == "habit":
+                ref = _ref(rec, "ref")
+                created = rec.get("created_at")
+                return kind, (
+                    seq, ref, str(rec.get("name") or ref),
+                    _bool(rec.get("archived"), False),
+                    datetime.fromisoformat(created) if created else None,
+                )
+            if kind == "slot":
+                lt = rec.get("local_time")
+                return kind, (
+                    seq, _ref(rec, "habit"), _period(rec.get("period")),
+                    time.fromisoformat(lt) if lt else None,
+                    _bool(rec.get("notify"), False),
+                )
+            if kind == "log":
+                return kind, (
+                    seq, _ref(rec, "habit"), _period(rec.get("period")),
+                    date.fromisoformat(str(rec.get("day"))),
+                    _bool(rec.get("completed"), True),
+                    _note(rec.get("note")),
+                )
+        except (TypeError, ValueError) as e:
+            raise BadRecord(str(e))
+        raise BadRecord("type must be habit, slot or log")
+
+    async def add(self, rec: Any) -> None:
+        self.seen += 1
+        try:
+            kind, row = self._parse(rec)
+        except BadRecord as e:
+            self.skipped += 1
+            import_records.inc((("kind", "skipped"),))
+            if len(self.errors) < MAX_REPORTED_ERRORS:
+                self.errors.append(f"record {self.seen}: {e}")
+            return
+        buf = self._buf[kind]
+        buf.append(row)
+        if len(buf) >= self.batch_size:
+            await self._flush(kind)
+        if self.on_progress and self.seen % self.progress_every == 0:
+            self.on_progress(self.progress())
+
+    async def _flush(self, kind: str) -> None:
+        buf = self._buf[kind]
+        if not buf:
+            return
+        await self.conn.copy_records_to_table(f"import_{kind}", records=buf)
+        self.staged[kind] += len(buf)
+        import_records.inc((("kind", kind),), len(buf))
+        buf.clear()
+
+    def progress(self) -> Dict[str, Any]:
+        return {"records": self.seen, "staged": dict(self.staged), "skipped": self.skipped}
+
+    async def finish(self) -> Dict[str, Any]:
+        for kind in self._buf:
+            await self._flush(kind)
+        if self.on_progress:
+            self.on_progress({**self.progress(), "phase": "merging"})
+
+        uid = self.user_id
+        c = self.conn
+        await c.execute("ANALYZE import_habit; ANALYZE import_slot; ANALYZE import_log")
+
+        # Every ref used by a slot/log is a habit, even if it had no habit record.
+        # A habit starts on its declared created_at, else on its first logged day.
+        await c.execute(
+            """
+            INSERT INTO import_habit (seq, ref, name, archived, created_at)
+            SELECT NULL, r.ref, r.ref, FALSE, NULL
+            FROM (SELECT ref FROM import_slot UNION SELECT ref FROM import_log) r
+            WHERE NOT EXISTS (SELECT 1 FROM import_habit h WHERE h.ref = r.ref)
+            """
+        )
+        habits_created = await c.fetchval(
+            """
+            WITH src AS (
+              SELECT DISTINCT ON (h.name) h.name, h.archived,
+                     COALESCE(h.created_at,
+                              (SELECT MIN(l.day) FROM import_log l WHERE l.ref = h.ref)::timestamptz,
+                              now()) AS created_at
+              FROM import_habit h
+              ORDER BY h.name, h.seq DESC NULLS LAST
+            ),
+            ins AS (
+              INSERT INTO public.habit (user_id, name, archived, created_at)
+              SELECT $1::uuid, s.name, s.archived, s.created_at
+              FROM src s
+              WHERE NOT EXISTS (SELECT 1 FROM public.habit e
+                                 WHERE e.user_id = $1::uuid AND e.name = s.name)
+              RETURNING 1
+            )
+            SELECT COUNT(*) FROM ins
+            """,
+            uid,
+        )
+        await c.execute("CREATE TEMP TABLE import_map (ref text PRIMARY KEY, habit_id uuid) ON COMMIT DROP")
+        await c.execute(
+            """
+            INSERT INTO import_map (ref, habit_id)
+            SELECT i.ref, e.id
+            FROM (SELECT DISTINCT ON (ref) ref, name FROM import_habit
+                  ORDER BY ref, seq DESC NULLS LAST) i
+            JOIN LATERAL (SELECT id FROM public.habit
+                           WHERE user_id = $1::uuid AND name = i.name
+                           ORDER BY created_at LIMIT 1) e ON TRUE
+            """,
+            uid,
+        )
+        await c.execute("ANALYZE import_map")
+
+        slots_upserted = await c.fetchval(
+            """
+            WITH src AS (
+              SELECT DISTINCT ON (m.habit_id, s.period)
+                     m.habit_id, s.period::time_period AS period, s.local_time, s.notify
+              FROM import_slot s JOIN import_map m USING (ref)
+              ORDER BY m.habit_id, s.period, s.seq DESC
+            ),
+            implied AS (
+              SELECT DISTINCT m.habit_id, l.period::time_period AS period
+              FROM import_log l JOIN import_map m USING (ref)
+            ),
+            up AS (
+              INSERT INTO public.habit_slot (habit_id, period, local_time, notify)
+              SELECT habit_id, period, local_time, notify FROM src
+              UNION ALL
+              SELECT i.habit_id, i.period, NULL, FALSE FROM implied i
+              WHERE NOT EXISTS (SELECT 1 FROM src WHERE src.habit_id = i.habit_id AND src.period = i.period)
+              ON CONFLICT (habit_id, period) DO UPDATE
+                 SET local_time = COALESCE(EXCLUDED.local_time, public.habit_slot.local_time),
+                     notify     = EXCLUDED.notify OR public.habit_slot.notify
+              RETURNING 1
+            )
+            SELECT COUNT(*) FROM up
+            """
+        )
+        logs_upserted = await c.fetchval(
+            """
+            WITH src AS (
+              SELECT DISTINCT ON (m.habit_id, l.day, l.period)
+                     m.habit_id, l.period::time_period AS period, l.day, l.completed, l.note
+              FROM import_log l JOIN import_map m USING (ref)
+              ORDER BY m.habit_id, l.day, l.period, l.seq DESC
+            ),
+            up AS (
+              INSERT INTO public.habit_log (habit_id, period, day, completed, note)
+              SELECT habit_id, period, day, completed, note FROM src
+              ON CONFLICT (habit_id, day, period) DO UPDATE
+                 SET completed = EXCLUDED.completed,
+                     note      = COALESCE(EXCLUDED.note, public.habit_log.note)
+              RETURNING 1
+            )
+            SELECT COUNT(*) FROM up
+            """
+        )
+
+        await repo.rebuild_daily_rollup(c, uid)
+        await repo.rebuild_completion_bitmaps(c, uid)
+        await repo.bump_data_version(c, uid)
+
+        return {
+            **self.progress(),
+            "habits_created": habits_created,
+            "slots_upserted": slots_upserted,
+            "logs_upserted": logs_upserted,
+            "errors": self.errors,
+        }
@@ -0,0 +1,251 @@
+# app/core/metrics.py
+"""
+In-process request / query metrics rendered in Prometheus text format.
+
+    - MetricsMiddleware: latency histogram and status counts per route template
+    - queries._run calls observe_query() for every named statement
+    - InstrumentedPool wraps the asyncpg pool to time acquire() waits;
+      in-use / idle connections are read from the pool at scrape time
+
+Everything runs on the worker's event loop, so plain dicts need no locking.
+Each uvicorn worker exposes its own numbers; scrape every worker (or sum them
+in Prometheus) for the full picture.
+"""
+from __future__ import annotations
+
+import bisect
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import asyncpg
+
+from app.core.config import settings
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# Seconds; tuned for a small CRUD API (sub-ms cache hits up to multi-second exports)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+# ──────────────────────────
+# Primitives
+# ──────────────────────────
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, labels: Labels = (), amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for labels, v in sorted(self._values.items()):
+            yield f"{self.name}{_fmt_labels(labels)} {_fmt_value(v)}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        # labels -> (per-bucket counts incl. +Inf, sum)
+        self._values: Dict[Labels, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, labels: Labels = ()) -> None:
+        entry = self._values.get(labels)
+        if entry is None:
+            entry = self._values[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+        counts, total = entry
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else _fmt_value(bound)
+                yield f"{self.name}_bucket{_fmt_labels(labels + (('le', le),))} {cumulative}"
+            yield f"{self.name}_sum{_fmt_labels(labels)} {_fmt_value(total[0])}"
+            yield f"{self.name}_count{_fmt_labels(labels)} {cumulative}"
+
+
+class Gauge:
+    """
+    Read at scrape time from a callback returning {labels: value}.
+    """
+
+    def __init__(self, name: str, help: str, collect: Callable[[], Dict[Labels, float]]):
+        self.name = name
+        self.help = help
+        self.collect = collect
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        for labels, v in sorted(self.collect().items()):
+            yield f"{self.name}{_fmt_labels(labels)} {_fmt_value(v)}"
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels) + "}"
+
+
+def _fmt_value(v: float) -> str:
+    return repr(float(v)) if v != int(v) else str(int(v))
+
+
+# ──────────────────────────
+# Registry
+# ──────────────────────────
+http_requests = Counter("habit_http_requests_total", "HTTP responses by route template and status.")
+http_latency = Histogram("habit_http_request_duration_seconds", "HTTP request latency by route template.")
+db_queries = Histogram("habit_db_query_duration_seconds", "Named query latency (app.core.queries).")
+db_query_errors = Counter("habit_db_query_errors_total", "Named queries that raised.")
+db_acquire = Histogram("habit_db_pool_acquire_seconds", "Time spent waiting for a pool connection.")
+db_rejected = Counter("habit_db_admission_rejected_total", "Requests shed with 503 by admission control.")
+import_records = Counter("habit_import_records_total", "Imported records staged by kind (or skipped as bad).")
+
+_pools: List[asyncpg.Pool] = []
+
+
+def _pool_connections() -> Dict[Labels, float]:
+    out: Dict[Labels, float] = {}
+    for pool in _pools:
+        size, idle = pool.get_size(), pool.get_idle_size()
+        out[(("state", "in_use"),)] = out.get((("state", "in_use"),), 0) + size - idle
+        out[(("state", "idle"),)] = out.get((("state", "idle"),), 0) + idle
+        out[(("state", "max"),)] = out.get((("state", "max"),), 0) + pool.get_max_size()
+    return out
+
+
+def _admission_waiting() -> Dict[Labels, float]:
+    out: Dict[Labels, float] = {}
+    for pool in _pools:
+        waiting = getattr(pool, "waiting", None)
+        for priority, n in (waiting() if waiting else {}).items():
+            labels = (("priority", priority),)
+            out[labels] = out.get(labels, 0) + n
+    return out
+
+
+db_connections = Gauge("habit_db_pool_connections", "Pool connections by state.", _pool_connections)
+db_waiting = Gauge("habit_db_admission_waiting", "Requests queued for a connection.", _admission_waiting)
+
+REGISTRY: List[Any] = [
+    http_requests, http_latency,
+    db_queries, db_query_errors,
+    db_acquire, db_rejected, db_connections, db_waiting,
+    import_records,
+]
+
+
+def render() -> str:
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+# ──────────────────────────
+# Query timing
+# ──────────────────────────
+def observe_query(name: str, seconds: float, failed: bool = False) -> None:
+    labels = (("query", name),)
+    db_queries.observe(seconds, labels)
+    if failed:
+        db_query_errors.inc(labels)
+    threshold = settings.SLOW_QUERY_MS
+    if threshold and seconds * 1000 >= threshold:
+        print(f"[slow-query] {name} {seconds * 1000:.1f}ms")
+
+
+# ──────────────────────────
+# Pool wrapper
+# ──────────────────────────
+class _TimedAcquire:
+    def __init__(self, ctx: Any):
+        self._ctx = ctx
+
+    async def __aenter__(self) -> Any:
+        t0 = time.perf_counter()
+        conn = await self._ctx.__aenter__()
+        db_acquire.observe(time.perf_counter() - t0)
+        return conn
+
+    async def __aexit__(self, *exc: Any) -> Any:
+        return await self._ctx.__aexit__(*exc)
+
+    def __await__(self):
+        t0 = time.perf_counter()
+        conn = yield from self._ctx.__await__()
+        db_acquire.observe(time.perf_counter() - t0)
+        return conn
+
+
+class InstrumentedPool:
+    """
+    asyncpg.Pool stand-in that times acquire(); everything else is delegated.
+    """
+
+    def __init__(self, pool: asyncpg.Pool):
+        self.pool = pool
+        _pools.append(pool)
+
+    def acquire(self, *args: Any, **kwargs: Any) -> _TimedAcquire:
+        return _TimedAcquire(self.pool.acquire(*args, **kwargs))
+
+    async def close(self) -> None:
+        if self.pool in _pools:
+            _pools.remove(self.pool)
+        await self.pool.close()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.pool, name)
+
+
+# ──────────────────────────
+# HTTP middleware
+# ──────────────────────────
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware (no BaseHTTPMiddleware task hop). Labels use the
+    matched route template, e.g. /api/stats/daily_completion, never raw paths,
+    so label cardinality stays bounded.
+    """
+
+    def __init__(self, app: Any, skip_paths: Optional[Iterable[str]] = ("/metrics",)):
+        self.app = app
+        self.skip_paths = set(skip_paths or ())
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        t0 = time.perf_counter()
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            elapsed = time.perf_counter() - t0
+            method = scope["method"]
+            http_latency.observe(elapsed, (("method", method), ("route", path)))
+            http_requests.inc((("method", method), ("route", path), ("status", str(status))))
@@ -0,0 +1,132 @@
+# app/core/partitions.py
+"""
+Maintenance of the yearly habit_log partitions (DB/migrations/004).
+
+  - ensure(): create this year's and the next `ahead` years' partitions, and
+    move rows that landed in habit_log_default into a partition of their own
+  - compact(): rewrite a cold partition densely (fillfactor 100, VACUUM FULL,
+    frozen) and turn autovacuum off for it; it stays queryable
+  - detach() / restore(): move a cold partition out of habit_log into the
+    habit_archive schema and back. While a year is detached, ensure() does not
+    recreate it (DB/migrations/006): its new rows wait in habit_log_default and
+    restore() merges them in
+
+Hot reads never need cold partitions: every day-filtered query is pruned to
+the partitions it touches, and the stats / heatmap endpoints read
+habit_daily_rollup and habit_completion_bitmap, which keep their rows for
+detached years. What a detached year does drop out of is streak
+recomputation, the export and a rollup/bitmap rebuild (backfill_rollup).
+"""
+from __future__ import annotations
+
+import re
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+import asyncpg
+
+ARCHIVE_SCHEMA = "habit_archive"
+
+_YEAR = re.compile(r"^habit_log_y(\d{4})$")
+_COLUMNS = 'id, habit_id, "period", "day", completed, note, created_at'
+
+
+async def ensure(conn: asyncpg.Connection, ahead: int = 1) -> int:
+    """
+    Number of partitions created. No-op (0) before migration 004 is applied.
+    """
+    try:
+        return await conn.fetchval("SELECT public.habit_log_ensure_partitions($1)", ahead)
+    except asyncpg.UndefinedFunctionError:
+        return 0
+
+
+async def list_partitions(conn: asyncpg.Connection) -> List[Dict[str, Any]]:
+    """
+    Yearly partitions, attached (public) and detached (habit_archive), oldest first.
+    """
+    rows = await conn.fetch(
+        """
+        SELECT n.nspname AS schema, c.relname AS name,
+               i.inhrelid IS NOT NULL AS attached,
+               pg_total_relation_size(c.oid) AS bytes,
+               c.reltuples::int8 AS approx_rows
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        LEFT JOIN pg_inherits i ON i.inhrelid = c.oid
+        WHERE c.relkind = 'r'
+          AND n.nspname IN ('public', $1)
+          AND c.relname ~ '^habit_log_y[0-9]{4}$'
+        ORDER BY c.relname
+        """,
+        ARCHIVE_SCHEMA,
+    )
+    return [{**dict(r), "year": int(_YEAR.match(r["name"]).group(1))} for r in rows]
+
+
+def cold_years(partitions: List[Dict[str, Any]], keep_years: int, today: Optional[date] = None) -> List[int]:
+    """
+    Attached partition years older than the newest `keep_years` calendar years.
+    """
+    cutoff = (today or date.today()).year - keep_years + 1
+    return [p["year"] for p in partitions if p["attached"] and p["year"] < cutoff]
+
+
+def _name(year: int) -> str:
+    return f"habit_log_y{year:04d}"
+
+
+async def compact(conn: asyncpg.Connection, year: int) -> None:
+    """
+    Must run outside a transaction (VACUUM). Takes an ACCESS EXCLUSIVE lock
+    on the partition while it is rewritten.
+    """
+    name = _name(year)
+    await conn.execute(f"ALTER TABLE public.{name} SET (fillfactor = 100, autovacuum_enabled = false)")
+    await conn.execute(f"VACUUM (FULL, FREEZE, ANALYZE) public.{name}")
+
+
+async def detach(conn: asyncpg.Connection, year: int) -> None:
+    name = _name(year)
+    async with conn.transaction():
+        await conn.execute(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}")
+        await conn.execute(f"ALTER TABLE public.habit_log DETACH PARTITION public.{name}")
+        await conn.execute(f"ALTER TABLE public.{name} SET SCHEMA {ARCHIVE_SCHEMA}")
+
+
+async def restore(conn: asyncpg.Connection, year: int) -> None:
+    """
+    Re-attach a detached year. Rows written for it while it was detached sit in
+    habit_log_default (ensure() leaves archived years alone, migration 006);
+    they are newer than the archived ones and are merged in over them first.
+    """
+    name = _name(year)
+    lo, hi = date(year, 1, 1), date(year + 1, 1, 1)
+    async with conn.transaction():
+        if await conn.fetchval("SELECT to_regclass($1)", f"public.{name}") is not None:
+            # Recreated by an ensure() from before migration 006: the attached
+            # partition has the newer rows, the archived table fills in the rest
+            await conn.execute(
+                f"INSERT INTO public.habit_log ({_COLUMNS}) "
+                f"SELECT {_COLUMNS} FROM {ARCHIVE_SCHEMA}.{name} "
+                f"ON CONFLICT (habit_id, day, period) DO NOTHING"
+            )
+            await conn.execute(f"DROP TABLE {ARCHIVE_SCHEMA}.{name}")
+            return
+        await conn.execute(f"ALTER TABLE {ARCHIVE_SCHEMA}.{name} SET SCHEMA public")
+        await conn.execute(
+            f"""
+            WITH moved AS (DELETE FROM public.habit_log_default
+                            WHERE day >= $1 AND day < $2 RETURNING *)
+            INSERT INTO public.{name} AS l ({_COLUMNS})
+            SELECT {_COLUMNS} FROM moved
+            ON CONFLICT (habit_id, day, period) DO UPDATE
+               SET completed = EXCLUDED.completed,
+                   note      = COALESCE(EXCLUDED.note, l.note)
+            """,
+            lo, hi,
+        )
+        await conn.execute(
+            f"ALTER TABLE public.habit_log ATTACH PARTITION public.{name} "
+            f"FOR VALUES FROM ('{lo.isoformat()}') TO ('{hi.isoformat()}')"
+        )
@@ -0,0 +1,111 @@
+# app/core/profiles.py
+"""
+In-process cache of user profiles (the /me payload, including timezone).
+
+Profiles change only on Google sign-in (Storage.upsert_user), which writes
+the fresh row through with profile_cache.put(). The TTL bounds how long another
+worker can keep serving an older name/picture/timezone.
+
+The timezone feeds user_today(): the user's local calendar day, used wherever
+an endpoint defaults to "today" instead of the server's date.
+"""
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Dict, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from app.core import repo
+from app.core.config import settings
+from app.core.storage.base import Storage
+
+Profile = Dict[str, Any]
+
+DEFAULT_TIMEZONE = "UTC"
+
+
+class ProfileCache:
+    """
+    Bounded LRU of user_to_dict() payloads with a fixed TTL.
+    """
+
+    def __init__(self, max_entries: int = 10_000, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, Profile]]" = OrderedDict()
+
+    def get(self, user_id: str) -> Optional[Profile]:
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._entries[user_id]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, profile: Profile) -> Profile:
+        user_id = profile["id"]
+        self._entries[user_id] = (time.monotonic() + self.ttl, profile)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return profile
+
+    def invalidate(self, user_id: str) -> None:
+        self._entries.pop(user_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+profile_cache = ProfileCache(settings.PROFILE_CACHE_SIZE, settings.PROFILE_CACHE_TTL_S)
+
+
+# ──────────────────────────
+# Lookups
+# ──────────────────────────
+async def load_profile(storage: Storage, user_id: str) -> Optional[Profile]:
+    """
+    Cached profile, reading the user from storage only on a miss.
+    """
+    profile = profile_cache.get(user_id)
+    if profile is None:
+        row = await storage.get_user(user_id)
+        if row is None:
+            return None
+        profile = profile_cache.put(repo.user_to_dict(row))
+    return profile
+
+
+# ──────────────────────────
+# Local "today"
+# ──────────────────────────
+def zone(name: Optional[str]) -> ZoneInfo:
+    try:
+        return ZoneInfo(name or DEFAULT_TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo(DEFAULT_TIMEZONE)
+
+
+def local_today(tz_name: Optional[str]) -> date:
+    return datetime.now(zone(tz_name)).date()
+
+
+async def user_today(storage: Storage, user_id: str) -> date:
+    """
+    The user's current calendar day in their stored timezone (UTC if unknown).
+    """
+    profile = await load_profile(storage, user_id)
+    return local_today(profile["timezone"] if profile else None)
@@ -0,0 +1,587 @@
+# app/core/queries.py
+"""
+Registry of the SQL the request paths run, each statement declared once.
+
+Statements are prepared lazily, once per pooled connection, and the handle
+is kept on the connection (db.AppConnection.prepared). Later calls on that
+connection skip the parse/plan round trip and go straight to Bind/Execute.
+Plain connections such as CLI scripts or the import connection have no
+statement cache. On those the same SQL runs through the regular
+fetch()/execute() path.
+
+    from app.core import queries as q
+    rows = await q.fetch(conn, q.CHECKLIST, day, user_id)
+
+If a schema change invalidates a cached plan, the statement is dropped and
+prepared again. Outside a transaction the call is then retried once. Inside
+a transaction the error propagates, because the transaction is already
+aborted.
+"""
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import asyncpg
+
+from app.core.metrics import observe_query
+
+REGISTRY: Dict[str, "Query"] = {}
+
+
+@dataclass(frozen=True)
+class Query:
+    name: str
+    sql: str
+    # False for cold statements (rebuilds, maintenance) not worth a server-side slot
+    prepare: bool = True
+
+
+def query(name: str, sql: str, prepare: bool = True) -> Query:
+    if name in REGISTRY:
+        raise ValueError(f"Duplicate query name: {name}")
+    q = REGISTRY[name] = Query(name, sql, prepare)
+    return q
+
+
+# ──────────────────────────
+# Execution
+# ──────────────────────────
+_STALE = (asyncpg.exceptions.InvalidCachedStatementError, asyncpg.exceptions.OutdatedSchemaCacheError)
+
+
+async def prepared(conn: asyncpg.Connection, q: Query) -> Optional[asyncpg.prepared_stmt.PreparedStatement]:
+    """
+    The connection's prepared statement for `q`, or None when the connection
+    keeps no statement cache (or `q` is not meant to be prepared).
+    """
+    cache = getattr(conn, "prepared", None)
+    if cache is None or not q.prepare:
+        return None
+    stmt = cache.get(q.name)
+    if stmt is None:
+        stmt = cache[q.name] = await conn.prepare(q.sql)
+    return stmt
+
+
+async def _run(conn: asyncpg.Connection, q: Query, method: str, args: tuple) -> Any:
+    t0 = time.perf_counter()
+    failed = True
+    try:
+        result = await _run_once(conn, q, method, args)
+        failed = False
+        return result
+    finally:
+        observe_query(q.name, time.perf_counter() - t0, failed)
+
+
+async def _run_once(conn: asyncpg.Connection, q: Query, method: str, args: tuple) -> Any:
+    stmt = await prepared(conn, q)
+    if stmt is None:
+        return await getattr(conn, method)(q.sql, *args)
+    try:
+        return await getattr(stmt, method)(*args)
+    except _STALE:
+        conn.prepared.pop(q.name, None)
+        if conn.is_in_transaction():
+            raise
+        stmt = await prepared(conn, q)
+        return await getattr(stmt, method)(*args)
+
+
+async def fetch(conn: asyncpg.Connection, q: Query, *args: Any) -> List[asyncpg.Record]:
+    return await _run(conn, q, "fetch", args)
+
+
+async def fetchrow(conn: asyncpg.Connection, q: Query, *args: Any) -> Optional[asyncpg.Record]:
+    return await _run(conn, q, "fetchrow", args)
+
+
+async def fetchval(conn: asyncpg.Connection, q: Query, *args: Any) -> Any:
+    return await _run(conn, q, "fetchval", args)
+
+
+async def execute(conn: asyncpg.Connection, q: Query, *args: Any) -> None:
+    # PreparedStatement has no execute(); fetch() of a rowless statement is the same round trip
+    await _run(conn, q, "fetch", args)
+
+
+async def executemany(conn: asyncpg.Connection, q: Query, args: Iterable[Sequence[Any]]) -> None:
+    """
+    Run `q` once per argument tuple in a single pipelined round trip
+    (asyncpg prepares it once through its own statement cache).
+    """
+    t0 = time.perf_counter()
+    failed = True
+    try:
+        await conn.executemany(q.sql, args)
+        failed = False
+    finally:
+        observe_query(q.name, time.perf_counter() - t0, failed)
+
+
+def cursor(conn: asyncpg.Connection, q: Query, *args: Any, prefetch: Optional[int] = None):
+    """
+    Server-side cursor over `q` (inside a transaction). Not prepared through the
+    registry: a cursor's own prepare is amortised over the whole result set.
+    """
+    return conn.cursor(q.sql, *args, prefetch=prefetch)
+
+
+# ──────────────────────────
+# Users
+# ──────────────────────────
+USER_UPSERT = query("user_upsert", """
+    INSERT INTO public.app_user (email, "name", image_url)
+    VALUES ($1, $2, $3)
+    ON CONFLICT (email) DO UPDATE
+       SET "name" = COALESCE(EXCLUDED."name", public.app_user."name"),
+           image_url = COALESCE(EXCLUDED.image_url, public.app_user.image_url)
+    RETURNING id::text, email, "name", image_url, timezone, created_at
+""")
+
+USER_FETCH = query("user_fetch", """
+    SELECT id::text, email, "name", image_url, timezone, created_at
+    FROM public.app_user WHERE id = $1::uuid
+""")
+
+DATA_VERSION_FETCH = query("data_version_fetch", """
+    SELECT data_version FROM public.app_user WHERE id = $1::uuid
+""")
+
+DATA_VERSION_BUMP = query("data_version_bump", """
+    UPDATE public.app_user SET data_version = data_version + 1
+    WHERE id = $1::uuid RETURNING data_version
+""")
+
+
+# ──────────────────────────
+# Habits / slots
+# ──────────────────────────
+# CRITICAL: LEFT JOIN to habit_log ON that day so completion is per-day.
+CHECKLIST = query("checklist", """
+    SELECT h.id AS habit_id,
+           h.name,
+           s.period,
+           s.local_time,
+           COALESCE(l.completed, false) AS completed
+    FROM public.habit h
+    JOIN public.habit_slot s
+      ON s.habit_id = h.id
+    LEFT JOIN public.habit_log l
+      ON l.habit_id = h.id
+     AND l.period   = s.period
+     AND l.day      = $1::date        -- <<< per-day join (uses ?day)
+    WHERE h.user_id = $2::uuid
+      AND h.archived = FALSE
+    ORDER BY s.period, COALESCE(s.local_time, '23:59'::time), h.name
+""")
+
+# One row per active slot with its completed days in [start, end]; the
+# habit_log side is a range scan on habit_log_lookup_idx (habit_id, day).
+CHECKLIST_RANGE = query("checklist_range", """
+    SELECT h.id AS habit_id,
+           h.name,
+           s.period,
+           s.local_time,
+           COALESCE(array_agg(l.day ORDER BY l.day) FILTER (WHERE l.completed), '{}') AS done_days
+    FROM public.habit h
+    JOIN public.habit_slot s
+      ON s.habit_id = h.id
+    LEFT JOIN public.habit_log l
+      ON l.habit_id = h.id
+     AND l.period   = s.period
+     AND l.day BETWEEN $2::date AND $3::date
+    WHERE h.user_id = $1::uuid
+      AND h.archived = FALSE
+    GROUP BY h.id, s.id
+    ORDER BY s.period, COALESCE(s.local_time, '23:59'::time), h.name
+""")
+
+# Keyset pages of one habit's history. The (day, period) row comparison
+# against the previous page's last key is an index condition on the unique
+# (habit_id, day, period) btree (whose (habit_id, day) prefix is what
+# habit_log_lookup_idx indexes), so page 500 starts as deep as page 1 does.
+# The first page passes a sentinel key just outside [start, end] rather than
+# NULL: an "$4 IS NULL OR ..." guard would keep the generic plan from using it.
+HABIT_LOGS_PAGE_DESC = query("habit_logs_page_desc", """
+    SELECT l.period::text AS period, l.day, l.completed, l.note, l.created_at
+    FROM public.habit_log l
+    WHERE l.habit_id = $1::uuid
+      AND l.day BETWEEN $2::date AND $3::date
+      AND (l.day, l.period) < ($4::date, $5::time_period)
+    ORDER BY l.day DESC, l.period DESC
+    LIMIT $6
+""")
+
+HABIT_LOGS_PAGE_ASC = query("habit_logs_page_asc", """
+    SELECT l.period::text AS period, l.day, l.completed, l.note, l.created_at
+    FROM public.habit_log l
+    WHERE l.habit_id = $1::uuid
+      AND l.day BETWEEN $2::date AND $3::date
+      AND (l.day, l.period) > ($4::date, $5::time_period)
+    ORDER BY l.day, l.period
+    LIMIT $6
+""")
+
+HABIT_OWNED = query("habit_owned", """
+    SELECT 1 FROM public.habit WHERE id = $1::uuid AND user_id = $2::uuid
+""")
+
+HABITS_OWNED = query("habits_owned", """
+    SELECT id FROM public.habit WHERE id = ANY($1::uuid[]) AND user_id = $2::uuid
+""")
+
+HABIT_INSERT = query("habit_insert", """
+    INSERT INTO public.habit (user_id, name, archived)
+    VALUES ($1::uuid, $2, FALSE)
+    RETURNING id
+""")
+
+SLOT_INSERT = query("slot_insert", """
+    INSERT INTO public.habit_slot (habit_id, period, local_time)
+    VALUES ($1::uuid, $2::time_period, $3)
+""")
+
+
+# ──────────────────────────
+# Habit log
+# ──────────────────────────
+LOG_UPSERT = query("log_upsert", """
+    WITH prev AS (
+      SELECT completed
+      FROM public.habit_log
+      WHERE habit_id = $1::uuid AND day = $3::date AND period = $2::time_period
+    ),
+    up AS (
+      INSERT INTO public.habit_log (habit_id, period, day, completed, note)
+      VALUES ($1::uuid, $2::time_period, $3::date, $4::boolean, $5::text)
+      ON CONFLICT (habit_id, day, period)
+      DO UPDATE SET
+        completed = EXCLUDED.completed,
+        note      = COALESCE(EXCLUDED.note, public.habit_log.note)
+      RETURNING habit_id, period, day, completed, note, created_at
+    ),
+    roll AS (
+      UPDATE public.habit_daily_rollup r
+         SET completed = r.completed
+                       + up.completed::int
+                       - COALESCE((SELECT completed FROM prev), FALSE)::int
+        FROM up
+       WHERE r.user_id = $6::uuid
+         AND r.day     = $3::date
+         AND EXISTS (SELECT 1
+                       FROM public.habit_slot s
+                       JOIN public.habit h    ON h.id = s.habit_id
+                       JOIN public.app_user u ON u.id = h.user_id
+                      WHERE s.habit_id = $1::uuid AND s.period = $2::time_period
+                        AND $3::date >= (h.created_at AT TIME ZONE u.timezone)::date)
+    ),
+    bits AS (
+      INSERT INTO public.habit_completion_bitmap (habit_id, period, year, bits)
+      SELECT up.habit_id, up.period, extract(year FROM up.day)::int,
+             set_bit(decode(repeat('00', 46), 'hex'), extract(doy FROM up.day)::int - 1, up.completed::int)
+      FROM up
+      ON CONFLICT (habit_id, period, year) DO UPDATE
+         SET bits = set_bit(public.habit_completion_bitmap.bits,
+                            extract(doy FROM $3::date)::int - 1, $4::boolean::int)
+    )
+    SELECT * FROM up
+""")
+
+LOG_UPSERT_MANY = query("log_upsert_many", """
+    WITH input AS (
+      SELECT t.habit_id, t.period::time_period AS period, t.day, t.completed, t.note
+      FROM unnest($1::uuid[], $2::text[], $3::date[], $4::boolean[], $5::text[])
+           AS t(habit_id, period, day, completed, note)
+    ),
+    prev AS (
+      SELECT l.habit_id, l.period, l.day, l.completed
+      FROM public.habit_log l
+      JOIN input i
+        ON i.habit_id = l.habit_id AND i.day = l.day AND i.period = l.period
+    ),
+    up AS (
+      INSERT INTO public.habit_log (habit_id, period, day, completed, note)
+      SELECT habit_id, period, day, completed, note FROM input
+      ON CONFLICT (habit_id, day, period)
+      DO UPDATE SET
+        completed = EXCLUDED.completed,
+        note      = COALESCE(EXCLUDED.note, public.habit_log.note)
+      RETURNING habit_id, period, day, completed, note, created_at
+    ),
+    delta AS (
+      SELECT up.day,
+             SUM(up.completed::int - COALESCE(p.completed, FALSE)::int)::int AS d
+      FROM up
+      LEFT JOIN prev p
+        ON p.habit_id = up.habit_id AND p.day = up.day AND p.period = up.period
+      WHERE EXISTS (SELECT 1
+                      FROM public.habit_slot s
+                      JOIN public.habit h    ON h.id = s.habit_id
+                      JOIN public.app_user u ON u.id = h.user_id
+                     WHERE s.habit_id = up.habit_id AND s.period = up.period
+                       AND up.day >= (h.created_at AT TIME ZONE u.timezone)::date)
+      GROUP BY up.day
+    ),
+    roll AS (
+      UPDATE public.habit_daily_rollup r
+         SET completed = r.completed + delta.d
+        FROM delta
+       WHERE r.user_id = $6::uuid
+         AND r.day     = delta.day
+         AND delta.d  <> 0
+    )
+    SELECT * FROM up
+""")
+
+
+# ──────────────────────────
+# Completion bitmaps (46 bytes per habit/period/year; bit i = day-of-year i + 1)
+# ──────────────────────────
+# Single-day bit flip; the batch path runs it through executemany() because
+# one INSERT .. ON CONFLICT can't update the same (habit, period, year) twice.
+BITMAP_SET = query("bitmap_set", """
+    INSERT INTO public.habit_completion_bitmap (habit_id, period, year, bits)
+    VALUES ($1::uuid, $2::time_period, extract(year FROM $3::date)::int,
+            set_bit(decode(repeat('00', 46), 'hex'), extract(doy FROM $3::date)::int - 1, $4::boolean::int))
+    ON CONFLICT (habit_id, period, year) DO UPDATE
+       SET bits = set_bit(public.habit_completion_bitmap.bits,
+                          extract(doy FROM $3::date)::int - 1, $4::boolean::int)
+""", prepare=False)
+
+BITMAP_DELETE_USER = query("bitmap_delete_user", """
+    DELETE FROM public.habit_completion_bitmap b
+    USING public.habit h
+    WHERE b.habit_id = h.id AND h.user_id = $1::uuid
+""", prepare=False)
+
+# Set-based rebuild (same as migration 003): OR day bits into bytes, hex-join 46 bytes
+BITMAP_REBUILD = query("bitmap_rebuild", """
+    WITH done AS (
+      SELECT l.habit_id, l.period,
+             extract(year FROM l.day)::int AS year,
+             extract(doy FROM l.day)::int - 1 AS i
+      FROM public.habit_log l
+      JOIN public.habit h ON h.id = l.habit_id
+      WHERE h.user_id = $1::uuid AND l.completed
+    ),
+    bytes AS (
+      SELECT habit_id, period, year, i / 8 AS b, bit_or(1 << (i % 8)) AS v
+      FROM done
+      GROUP BY habit_id, period, year, i / 8
+    ),
+    keys AS (
+      SELECT DISTINCT habit_id, period, year FROM bytes
+    )
+    INSERT INTO public.habit_completion_bitmap (habit_id, period, year, bits)
+    SELECT k.habit_id, k.period, k.year,
+           decode(string_agg(lpad(to_hex(COALESCE(bt.v, 0)), 2, '0'), '' ORDER BY g.b), 'hex')
+    FROM keys k
+    CROSS JOIN generate_series(0, 45) AS g(b)
+    LEFT JOIN bytes bt
+      ON bt.habit_id = k.habit_id AND bt.period = k.period AND bt.year = k.year AND bt.b = g.b
+    GROUP BY k.habit_id, k.period, k.year
+    ON CONFLICT (habit_id, period, year) DO UPDATE SET bits = EXCLUDED.bits
+""", prepare=False)
+
+# Every active slot with its bitmap for one year (NULL bits = nothing completed)
+HEATMAP = query("heatmap", """
+    SELECT h.id AS habit_id,
+           h.name,
+           s.period,
+           (h.created_at AT TIME ZONE u.timezone)::date AS created_on,
+           b.bits
+    FROM public.habit h
+    JOIN public.app_user u   ON u.id = h.user_id
+    JOIN public.habit_slot s ON s.habit_id = h.id
+    LEFT JOIN public.habit_completion_bitmap b
+      ON b.habit_id = h.id AND b.period = s.period AND b.year = $2::int
+    WHERE h.user_id = $1::uuid
+      AND h.archived = FALSE
+    ORDER BY h.name, s.period
+""")
+
+
+# Delivered to LISTENers on commit (see app.core.events)
+NOTIFY_EVENT = query("notify_event", """
+    SELECT pg_notify($1, $2)
+""")
+
+
+# ──────────────────────────
+# Daily completion rollup
+# ──────────────────────────
+# Insert-or-touch so the row lock is held until commit; a new row carries the
+# total of the closest earlier row (the table is sparse).
+ROLLUP_LOCK_DAYS = query("rollup_lock_days", """
+    INSERT INTO public.habit_daily_rollup (user_id, day, completed, total)
+    SELECT $1::uuid, d, 0,
+           COALESCE((SELECT r.total FROM public.habit_daily_rollup r
+                      WHERE r.user_id = $1::uuid AND r.day < d
+                      ORDER BY r.day DESC LIMIT 1), 0)
+    FROM unnest($2::date[]) AS d
+    ORDER BY d
+    ON CONFLICT (user_id, day) DO UPDATE SET completed = public.habit_daily_rollup.completed
+""")
+
+ROLLUP_ADJUST_TOTAL = query("rollup_adjust_total", """
+    UPDATE public.habit_daily_rollup
+       SET total = GREATEST(total + $3::int, 0)
+     WHERE user_id = $1::uuid AND day >= $2::date
+""")
+
+# Rows in [start, end] plus the last row before start (seeds the carried total)
+ROLLUP_RANGE = query("rollup_range", """
+    (SELECT day, completed, total
+       FROM public.habit_daily_rollup
+      WHERE user_id = $1::uuid AND day < $2::date
+      ORDER BY day DESC LIMIT 1)
+    UNION ALL
+    (SELECT day, completed, total
+       FROM public.habit_daily_rollup
+      WHERE user_id = $1::uuid AND day BETWEEN $2::date AND $3::date
+      ORDER BY day)
+""")
+
+ROLLUP_DELETE_USER = query("rollup_delete_user", """
+    DELETE FROM public.habit_daily_rollup WHERE user_id = $1::uuid
+""", prepare=False)
+
+# Rebuild: a day gets a row when it has logs or when a habit was created on it;
+# total = active slots whose habit existed on that day, and only their logs
+# count as completed. A habit exists from its creation day in the user's
+# timezone, the day create_habit starts its slots on (profiles.user_today).
+ROLLUP_REBUILD = query("rollup_rebuild", """
+    WITH slots AS (
+      SELECT h.user_id, s.habit_id, s.period,
+             (h.created_at AT TIME ZONE u.timezone)::date AS since
+      FROM public.habit h
+      JOIN public.app_user u   ON u.id = h.user_id
+      JOIN public.habit_slot s ON s.habit_id = h.id
+      WHERE h.user_id = $1::uuid
+        AND h.archived = FALSE
+    ),
+    completions AS (
+      SELECT l.day, COUNT(*) FILTER (WHERE l.completed)::int AS completed
+      FROM public.habit_log l
+      JOIN slots s
+        ON s.habit_id = l.habit_id
+       AND s.period   = l.period
+       AND l.day     >= s.since
+      GROUP BY l.day
+    ),
+    days AS (
+      SELECT day FROM completions
+      UNION
+      SELECT since FROM slots
+    )
+    INSERT INTO public.habit_daily_rollup (user_id, day, completed, total)
+    SELECT $1::uuid,
+           d.day,
+           COALESCE(c.completed, 0),
+           (SELECT COUNT(*)::int FROM slots s WHERE s.since <= d.day)
+    FROM days d
+    LEFT JOIN completions c ON c.day = d.day
+    ON CONFLICT (user_id, day) DO UPDATE
+       SET completed = EXCLUDED.completed,
+           total     = EXCLUDED.total
+""", prepare=False)
+
+
+# ──────────────────────────
+# Streak inputs
+# ──────────────────────────
+HABIT_SCHEDULES = query("habit_schedules", """
+    SELECT h.id AS habit_id,
+           (h.created_at AT TIME ZONE u.timezone)::date AS created_on,
+           sc.cadence::text   AS cadence,
+           sc.dow_mask,
+           sc.interval_days,
+           sc.start_date,
+           COUNT(s.id)::int   AS n_slots
+    FROM public.habit h
+    JOIN public.app_user u   ON u.id = h.user_id
+    JOIN public.habit_slot s ON s.habit_id = h.id
+    LEFT JOIN public.habit_schedule sc ON sc.habit_id = h.id
+    WHERE h.user_id = $1::uuid
+      AND h.archived = FALSE
+    GROUP BY h.id, u.timezone, sc.habit_id
+""")
+
+COMPLETED_SLOT_COUNTS = query("completed_slot_counts", """
+    SELECT l.habit_id, l.day, COUNT(*)::int AS n_done
+    FROM public.habit h
+    JOIN public.habit_slot s ON s.habit_id = h.id
+    JOIN public.habit_log l
+      ON l.habit_id = s.habit_id
+     AND l.period   = s.period
+    WHERE h.user_id = $1::uuid
+      AND h.archived = FALSE
+      AND l.completed = TRUE
+      AND ($2::uuid IS NULL OR h.id = $2::uuid)
+      AND ($3::date IS NULL OR l.day >= $3::date)
+    GROUP BY l.habit_id, l.day
+""")
+
+
+# ──────────────────────────
+# Reminders (see app.core.reminders)
+# ──────────────────────────
+# Every slot with a reminder when $1 is true, else only the slots / habits /
+# users named in the change feed
+REMINDER_SLOTS = query("reminder_slots", """
+    SELECT s.id::text AS slot_id, h.id::text AS habit_id, h.user_id::text AS user_id,
+           h.name, s.period::text AS period, s.local_time, u.timezone
+    FROM public.habit_slot s
+    JOIN public.habit h ON h.id = s.habit_id
+    JOIN public.app_user u ON u.id = h.user_id
+    WHERE s.notify
+      AND s.local_time IS NOT NULL
+      AND h.archived = FALSE
+      AND ($1::bool
+           OR s.id = ANY($2::uuid[])
+           OR h.id = ANY($3::uuid[])
+           OR u.id = ANY($4::uuid[]))
+""", prepare=False)
+
+# Which of the (slot, local day) pairs about to fire are already checked off
+REMINDER_COMPLETED = query("reminder_completed", """
+    SELECT d.slot_id::text AS slot_id
+    FROM unnest($1::uuid[], $2::date[]) AS d(slot_id, day)
+    JOIN public.habit_slot s ON s.id = d.slot_id
+    JOIN public.habit_log l
+      ON l.habit_id = s.habit_id
+     AND l.period = s.period
+     AND l.day = d.day
+    WHERE l.completed = TRUE
+""")
+
+
+# ──────────────────────────
+# Export (server-side cursors, see cursor())
+# ──────────────────────────
+EXPORT_HABITS = query("export_habits", """
+    SELECT id::text AS ref, name, archived, created_at
+    FROM public.habit
+    WHERE user_id = $1::uuid
+    ORDER BY created_at, id
+""", prepare=False)
+
+EXPORT_SLOTS = query("export_slots", """
+    SELECT s.habit_id::text AS habit, s.period::text AS period, s.local_time, s.notify
+    FROM public.habit h
+    JOIN public.habit_slot s ON s.habit_id = h.id
+    WHERE h.user_id = $1::uuid
+    ORDER BY s.habit_id, s.period
+""", prepare=False)
+
+EXPORT_LOGS = query("export_logs", """
+    SELECT l.habit_id::text AS habit, l.period::text AS period, l.day, l.completed, l.note
+    FROM public.habit h
+    JOIN public.habit_log l ON l.habit_id = h.id
+    WHERE h.user_id = $1::uuid
+      AND ($2::date IS NULL OR l.day >= $2::date)
+    ORDER BY l.habit_id, l.day, l.period
+""", prepare=False)
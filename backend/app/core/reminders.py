@@ -0,0 +1,361 @@
+# app/core/reminders.py
+"""
+Reminders for habit slots with `notify` set and a `local_time`.
+
+One worker at a time runs the scheduler: it holds a session advisory lock on
+its own connection, and the other workers retry the lock every
+REMINDERS_LEADER_RETRY_S. The leader:
+
+  - loads every reminder slot once, then keeps it current from the
+    `habit_slot_changes` feed (DB/migrations/005). Changed slots / habits /
+    users are batched and reloaded with one query, so it never rescans
+  - keeps a min-heap of (next UTC fire time, slot). next_fire() resolves the
+    slot's wall-clock time in the user's timezone per day, so DST shifts
+    move the UTC instant
+  - when entries come due, drops the slots already completed that local day
+    (one habit_log query per batch), hands the rest to the sink and
+    re-schedules every slot for its next day
+
+Reminders that came due while no leader was running are not sent late. The
+heap is rebuilt from "now" on takeover or reconnect.
+
+Sinks take a list of Reminder and are picked by REMINDERS_SINK:
+"events" (a "reminder" event on the user's SSE stream), "log", "memory"
+(collects in a list, for local runs), or "package.module:factory".
+"""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import importlib
+import itertools
+import json
+import time as _time
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, List, Optional, Protocol, Set, Tuple
+from zoneinfo import ZoneInfo
+
+import asyncpg
+
+from app.core import queries as q
+from app.core.config import settings
+from app.core.events import CHANNEL as EVENTS_CHANNEL, encode_event
+from app.core.profiles import zone
+
+CHANGES_CHANNEL = "habit_slot_changes"
+# pg_advisory_lock key held by the leader ("habit_reminders")
+LEADER_LOCK = 0x68616269
+# Past this many pending changed keys a full reload is cheaper
+MAX_INCREMENTAL = 500
+# Upper bound on one sleep, so clock jumps are picked up
+MAX_SLEEP_S = 60.0
+
+
+def next_fire(local_time: time, tz: ZoneInfo, after: datetime) -> datetime:
+    """
+    First UTC instant strictly after `after` whose wall-clock time in `tz`
+    is `local_time`. A time inside a spring-forward gap fires at the same
+    offset past the jump (02:30 -> 03:30), and a time repeated at fall-back
+    fires once, at its first occurrence (fold=0).
+    """
+    day = after.astimezone(tz).date()
+    for offset in range(3):
+        fire = datetime.combine(day + timedelta(days=offset), local_time, tzinfo=tz).astimezone(timezone.utc)
+        if fire > after:
+            return fire
+    raise ValueError(f"no fire time for {local_time} in {tz}")  # pragma: no cover
+
+
+@dataclass(frozen=True)
+class Reminder:
+    user_id: str
+    habit_id: str
+    slot_id: str
+    name: str
+    period: str
+    local_time: time
+    day: date
+    fire_at: datetime
+
+
+@dataclass(eq=False)
+class _Slot:
+    slot_id: str
+    habit_id: str
+    user_id: str
+    name: str
+    period: str
+    local_time: time
+    tz: ZoneInfo
+
+
+# ──────────────────────────
+# Sinks
+# ──────────────────────────
+class ReminderSink(Protocol):
+    async def send(self, conn: asyncpg.Connection, reminders: List[Reminder]) -> None: ...
+
+
+class EventSink:
+    """
+    Publish a "reminder" event to each user's open /api/events streams.
+    """
+
+    async def send(self, conn: asyncpg.Connection, reminders: List[Reminder]) -> None:
+        await q.executemany(conn, q.NOTIFY_EVENT, [
+            (EVENTS_CHANNEL, encode_event(r.user_id, {
+                "type": "reminder",
+                "habit_id": r.habit_id,
+                "name": r.name,
+                "period": r.period,
+                "local_time": r.local_time.strftime("%H:%M"),
+                "day": r.day.isoformat(),
+            }))
+            for r in reminders
+        ])
+
+
+class LogSink:
+    async def send(self, conn: asyncpg.Connection, reminders: List[Reminder]) -> None:
+        for r in reminders:
+            print(f"[reminders] user={r.user_id} habit={r.habit_id} {r.period} {r.local_time:%H:%M} ({r.day})")
+
+
+class MemorySink:
+    def __init__(self) -> None:
+        self.sent: List[Reminder] = []
+
+    async def send(self, conn: asyncpg.Connection, reminders: List[Reminder]) -> None:
+        self.sent.extend(reminders)
+
+
+def load_sink(spec: str) -> ReminderSink:
+    builtin = {"events": EventSink, "log": LogSink, "memory": MemorySink}
+    if spec in builtin:
+        return builtin[spec]()
+    module, _, attr = spec.partition(":")
+    if not attr:
+        raise ValueError(f"REMINDERS_SINK must be events, log, memory or module:factory, got {spec!r}")
+    return getattr(importlib.import_module(module), attr)()
+
+
+# ──────────────────────────
+# Scheduler
+# ──────────────────────────
+class ReminderScheduler:
+    def __init__(self, dsn: str, sink: ReminderSink, leader_retry: float = 30.0):
+        self.dsn = dsn
+        self.sink = sink
+        self.leader_retry = leader_retry
+        self.leader = False
+        self.sent = 0
+        self.skipped = 0
+        self._slots: Dict[str, _Slot] = {}
+        self._by_habit: Dict[str, Set[str]] = {}
+        self._by_user: Dict[str, Set[str]] = {}
+        self._heap: List[Tuple[float, int, _Slot]] = []
+        self._seq = itertools.count()
+        self._dirty: Dict[str, Set[str]] = {"slot": set(), "habit": set(), "user": set()}
+        self._wake = asyncio.Event()
+        self._lost = False
+        self._task: Optional[asyncio.Task] = None
+
+    def stats(self) -> Dict[str, Any]:
+        nxt = self._peek()
+        return {
+            "leader": self.leader,
+            "slots": len(self._slots),
+            "next_fire": datetime.fromtimestamp(nxt, timezone.utc).isoformat() if nxt else None,
+            "sent": self.sent,
+            "skipped_completed": self.skipped,
+        }
+
+    # ---- in-memory state ----
+    def _schedule(self, slot: _Slot, after: datetime) -> None:
+        fire = next_fire(slot.local_time, slot.tz, after)
+        heapq.heappush(self._heap, (fire.timestamp(), next(self._seq), slot))
+
+    def _add(self, row: asyncpg.Record, now: datetime) -> None:
+        slot = _Slot(
+            slot_id=row["slot_id"],
+            habit_id=row["habit_id"],
+            user_id=row["user_id"],
+            name=row["name"],
+            period=row["period"],
+            local_time=row["local_time"],
+            tz=zone(row["timezone"]),
+        )
+        self._slots[slot.slot_id] = slot
+        self._by_habit.setdefault(slot.habit_id, set()).add(slot.slot_id)
+        self._by_user.setdefault(slot.user_id, set()).add(slot.slot_id)
+        self._schedule(slot, now)
+
+    def _remove(self, slot_id: str) -> None:
+        # Its heap entry stays behind and is skipped when popped (see _live)
+        slot = self._slots.pop(slot_id, None)
+        if slot is None:
+            return
+        for index, key in ((self._by_habit, slot.habit_id), (self._by_user, slot.user_id)):
+            ids = index.get(key)
+            if ids is not None:
+                ids.discard(slot_id)
+                if not ids:
+                    del index[key]
+
+    def _live(self, slot: _Slot) -> bool:
+        return self._slots.get(slot.slot_id) is slot
+
+    def _peek(self) -> Optional[float]:
+        while self._heap and not self._live(self._heap[0][2]):
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def _compact(self) -> None:
+        if len(self._heap) > 2 * len(self._slots) + 64:
+            self._heap = [e for e in self._heap if self._live(e[2])]
+            heapq.heapify(self._heap)
+
+    # ---- change feed ----
+    def _on_change(self, conn: Any, pid: int, channel: str, payload: str) -> None:
+        try:
+            (kind, key), = json.loads(payload).items()
+            self._dirty[kind].add(key)
+        except (ValueError, KeyError, TypeError):
+            return
+        self._wake.set()
+
+    def _on_lost(self, conn: Any) -> None:
+        self._lost = True
+        self._wake.set()
+
+    async def _load_all(self, conn: asyncpg.Connection) -> None:
+        for keys in self._dirty.values():
+            keys.clear()
+        rows = await q.fetch(conn, q.REMINDER_SLOTS, True, [], [], [])
+        self._slots.clear()
+        self._by_habit.clear()
+        self._by_user.clear()
+        self._heap.clear()
+        now = datetime.now(timezone.utc)
+        for r in rows:
+            self._add(r, now)
+
+    async def _reload_dirty(self, conn: asyncpg.Connection) -> None:
+        slots, habits, users = (set(self._dirty[k]) for k in ("slot", "habit", "user"))
+        for keys in self._dirty.values():
+            keys.clear()
+        if len(slots) + len(habits) + len(users) > MAX_INCREMENTAL:
+            await self._load_all(conn)
+            return
+        rows = await q.fetch(conn, q.REMINDER_SLOTS, False, list(slots), list(habits), list(users))
+        stale = set(slots)
+        for h in habits:
+            stale |= self._by_habit.get(h, set())
+        for u in users:
+            stale |= self._by_user.get(u, set())
+        for slot_id in stale:
+            self._remove(slot_id)
+        now = datetime.now(timezone.utc)
+        for r in rows:
+            self._remove(r["slot_id"])
+            self._add(r, now)
+        self._compact()
+
+    # ---- firing ----
+    async def _fire_due(self, conn: asyncpg.Connection) -> None:
+        now = _time.time()
+        due: List[Tuple[_Slot, datetime]] = []
+        while (nxt := self._peek()) is not None and nxt <= now:
+            _, _, slot = heapq.heappop(self._heap)
+            due.append((slot, datetime.fromtimestamp(nxt, timezone.utc)))
+        if not due:
+            return
+
+        days = [fire.astimezone(slot.tz).date() for slot, fire in due]
+        done = {r["slot_id"] for r in await q.fetch(
+            conn, q.REMINDER_COMPLETED, [slot.slot_id for slot, _ in due], days,
+        )}
+        reminders = []
+        for (slot, fire), day in zip(due, days):
+            self._schedule(slot, fire)
+            if slot.slot_id in done:
+                self.skipped += 1
+                continue
+            reminders.append(Reminder(
+                user_id=slot.user_id,
+                habit_id=slot.habit_id,
+                slot_id=slot.slot_id,
+                name=slot.name,
+                period=slot.period,
+                local_time=slot.local_time,
+                day=day,
+                fire_at=fire,
+            ))
+        if reminders:
+            try:
+                await self.sink.send(conn, reminders)
+                self.sent += len(reminders)
+            except Exception as e:
+                print(f"[reminders] sink failed for {len(reminders)} reminder(s): {e}")
+
+    async def _serve(self, conn: asyncpg.Connection) -> None:
+        while not self._lost:
+            # Cleared before the work so a change arriving meanwhile still wakes the wait
+            self._wake.clear()
+            if any(self._dirty.values()):
+                await self._reload_dirty(conn)
+            await self._fire_due(conn)
+            nxt = self._peek()
+            delay = MAX_SLEEP_S if nxt is None else min(max(nxt - _time.time(), 0.0), MAX_SLEEP_S)
+            try:
+                await asyncio.wait_for(self._wake.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    # ---- leadership / connection ----
+    async def _run(self) -> None:
+        delay = 1.0
+        while True:
+            conn: Optional[asyncpg.Connection] = None
+            try:
+                self._lost = False
+                conn = await asyncpg.connect(self.dsn)
+                conn.add_termination_listener(self._on_lost)
+                while not await conn.fetchval("SELECT pg_try_advisory_lock($1)", LEADER_LOCK):
+                    await asyncio.sleep(self.leader_retry)
+                await conn.add_listener(CHANGES_CHANNEL, self._on_change)
+                await self._load_all(conn)
+                self.leader, delay = True, 1.0
+                print(f"[reminders] leader, {len(self._slots)} slot(s) scheduled")
+                await self._serve(conn)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[reminders] scheduler error: {e}")
+            finally:
+                self.leader = False
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+reminder_scheduler = ReminderScheduler(
+    settings.DATABASE_URL,
+    load_sink(settings.REMINDERS_SINK),
+    settings.REMINDERS_LEADER_RETRY_S,
+)
@@ -0,0 +1,171 @@
+# app/core/replicas.py
+"""
+Read-replica routing with read-your-writes.
+
+DATABASE_REPLICA_URLS (comma-separated) adds one pool per streaming replica.
+Read-only handlers take their pool from db.get_read_pool(), which picks a
+replica unless the caller's own recent write may not have reached it yet:
+
+  - a request whose primary connection wrote (db.mark_write) reads
+    pg_current_wal_lsn() on that connection once its transaction is over,
+    and ReadYourWritesMiddleware returns it in the REPLICA_LSN_COOKIE
+    cookie (valid for REPLICA_STICKY_S)
+  - each worker polls every replica's pg_last_wal_replay_lsn() every
+    REPLICA_POLL_S. A read carrying the cookie goes to a replica whose
+    replayed LSN is at or past it, otherwise to the primary
+  - a replica whose poll fails is skipped until it answers again
+
+Reads without the cookie may lag the primary by the replication delay.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import itertools
+from typing import Any, Dict, List, Optional
+
+from app.core.auth import cookie_header
+from app.core.config import settings
+
+
+def parse_lsn(text: Optional[str]) -> Optional[int]:
+    """
+    "16/B374D848" -> 0x16B374D848; None for anything that is not an LSN.
+    """
+    if not text:
+        return None
+    hi, sep, lo = text.partition("/")
+    try:
+        return (int(hi, 16) << 32) | int(lo, 16) if sep else None
+    except ValueError:
+        return None
+
+
+# ──────────────────────────
+# Write LSN -> cookie
+# ──────────────────────────
+class _WriteNote:
+    __slots__ = ("lsn",)
+
+    def __init__(self) -> None:
+        self.lsn: Optional[str] = None
+
+
+# A mutable holder, so a value stored from inside the endpoint is visible to
+# the middleware even if the endpoint ran in a copied context
+_write_note: contextvars.ContextVar[Optional[_WriteNote]] = contextvars.ContextVar("write_note", default=None)
+
+
+def note_write(lsn: str) -> None:
+    note = _write_note.get()
+    if note is not None:
+        note.lsn = lsn
+
+
+class ReadYourWritesMiddleware:
+    """
+    Pure ASGI middleware: sets the LSN cookie on responses to requests that wrote.
+    """
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http" or not replica_set.replicas:
+            await self.app(scope, receive, send)
+            return
+
+        note = _WriteNote()
+        token = _write_note.set(note)
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start" and note.lsn:
+                header = cookie_header(settings.REPLICA_LSN_COOKIE, note.lsn, settings.REPLICA_STICKY_S)
+                message = {**message, "headers": [*message.get("headers", []), header]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _write_note.reset(token)
+
+
+# ──────────────────────────
+# Replica set
+# ──────────────────────────
+class Replica:
+    def __init__(self, name: str, pool: Any):
+        self.name = name
+        self.pool = pool
+        self.replay_lsn: Optional[int] = None
+        self.healthy = False
+
+
+class ReplicaSet:
+    def __init__(self, poll_interval: float = 0.2):
+        self.poll_interval = poll_interval
+        self.replicas: List[Replica] = []
+        self.routed = {"replica": 0, "primary": 0}
+        self._rr = itertools.count()
+        self._task: Optional[asyncio.Task] = None
+
+    def choose(self, min_lsn: Optional[int]) -> Optional[Any]:
+        """
+        Pool of a healthy replica that has replayed `min_lsn` (any healthy one
+        when None), round-robin; None means "use the primary".
+        """
+        ready = [
+            r for r in self.replicas
+            if r.healthy and (min_lsn is None or (r.replay_lsn is not None and r.replay_lsn >= min_lsn))
+        ]
+        if not ready:
+            self.routed["primary"] += 1
+            return None
+        self.routed["replica"] += 1
+        return ready[next(self._rr) % len(ready)].pool
+
+    async def _poll_one(self, replica: Replica) -> None:
+        try:
+            lsn = await replica.pool.fetchval("SELECT pg_last_wal_replay_lsn()::text")
+            replica.replay_lsn = parse_lsn(lsn)
+            # NULL replay LSN: not a standby (or not replaying); never route to it
+            replica.healthy = replica.replay_lsn is not None
+        except Exception as e:
+            if replica.healthy:
+                print(f"[replicas] {replica.name} unavailable: {e}")
+            replica.healthy = False
+
+    async def _poll_loop(self) -> None:
+        while True:
+            await asyncio.gather(*(self._poll_one(r) for r in self.replicas))
+            await asyncio.sleep(self.poll_interval)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "replicas": [
+                {"name": r.name, "healthy": r.healthy, "replay_lsn": r.replay_lsn}
+                for r in self.replicas
+            ],
+            "routed": dict(self.routed),
+        }
+
+    async def start(self, pools: Dict[str, Any]) -> None:
+        self.replicas = [Replica(name, pool) for name, pool in pools.items()]
+        if self.replicas and self._task is None:
+            await asyncio.gather(*(self._poll_one(r) for r in self.replicas))
+            self._task = asyncio.create_task(self._poll_loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for r in self.replicas:
+            await r.pool.close()
+        self.replicas = []
+
+
+replica_set = ReplicaSet(settings.REPLICA_POLL_S)
@@ -0,0 +1,298 @@
+# app/core/repo.py
+"""
+Async data-access layer over the asyncpg pool (app.state.pool).
+
+Every function takes an open connection so callers decide the transaction
+boundary:  async with pool.acquire() as conn, conn.transaction(): ...
+"""
+from __future__ import annotations
+
+from datetime import date, time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+import asyncpg
+
+from app.core import queries as q
+from app.core.db import mark_write
+from app.core.events import CHANNEL, encode_event
+
+
+# ──────────────────────────
+# Users
+# ──────────────────────────
+async def upsert_user(
+    conn: asyncpg.Connection,
+    email: str,
+    name: Optional[str],
+    image_url: Optional[str],
+) -> asyncpg.Record:
+    mark_write(conn)
+    return await q.fetchrow(conn, q.USER_UPSERT, email, name, image_url)
+
+
+async def fetch_user(conn: asyncpg.Connection, user_id: str) -> Optional[asyncpg.Record]:
+    return await q.fetchrow(conn, q.USER_FETCH, user_id)
+
+
+async def fetch_data_version(conn: asyncpg.Connection, user_id: str) -> int:
+    """
+    Current per-user data version (0 for unknown users).
+    """
+    v = await q.fetchval(conn, q.DATA_VERSION_FETCH, user_id)
+    return v or 0
+
+
+async def bump_data_version(conn: asyncpg.Connection, user_id: str) -> int:
+    """
+    Increment the user's data version. Call inside every write transaction
+    (this is also what marks the connection for read-your-writes routing).
+    """
+    mark_write(conn)
+    return await q.fetchval(conn, q.DATA_VERSION_BUMP, user_id)
+
+
+def user_to_dict(row: asyncpg.Record) -> Dict[str, Any]:
+    return {
+        "id": row["id"],
+        "email": row["email"],
+        "name": row["name"],
+        "image_url": row["image_url"],
+        "timezone": row["timezone"],
+        "created_at": row["created_at"].isoformat() if row["created_at"] else None,
+    }
+
+
+# ──────────────────────────
+# Habits / slots
+# ──────────────────────────
+async def fetch_checklist(conn: asyncpg.Connection, user_id: str, day: date) -> List[asyncpg.Record]:
+    """
+    Active habit slots for a user with per-day completion.
+    """
+    return await q.fetch(conn, q.CHECKLIST, day, user_id)
+
+
+async def fetch_checklist_range(
+    conn: asyncpg.Connection,
+    user_id: str,
+    start: date,
+    end: date,
+) -> List[asyncpg.Record]:
+    """
+    Active habit slots with the days in [start, end] they were completed (done_days).
+    """
+    return await q.fetch(conn, q.CHECKLIST_RANGE, user_id, start, end)
+
+
+async def habit_belongs_to(conn: asyncpg.Connection, habit_id: UUID, user_id: str) -> bool:
+    found = await q.fetchval(conn, q.HABIT_OWNED, habit_id, user_id)
+    return found is not None
+
+
+async def fetch_habit_logs_page(
+    conn: asyncpg.Connection,
+    habit_id: UUID,
+    start: date,
+    end: date,
+    after: Tuple[date, str],
+    limit: int,
+    descending: bool = True,
+) -> List[asyncpg.Record]:
+    """
+    Up to `limit` logs of one habit in [start, end], ordered by (day, period),
+    strictly after the key `after` in that order (before it when descending).
+    """
+    stmt = q.HABIT_LOGS_PAGE_DESC if descending else q.HABIT_LOGS_PAGE_ASC
+    return await q.fetch(conn, stmt, habit_id, start, end, after[0], after[1], limit)
+
+
+async def insert_habit(conn: asyncpg.Connection, user_id: str, name: str) -> UUID:
+    return await q.fetchval(conn, q.HABIT_INSERT, user_id, name)
+
+
+async def insert_habit_slot(
+    conn: asyncpg.Connection,
+    habit_id: UUID,
+    period: str,
+    local_time: Optional[time],
+) -> None:
+    await q.execute(conn, q.SLOT_INSERT, habit_id, period, local_time)
+
+
+# ──────────────────────────
+# Habit log
+# ──────────────────────────
+async def upsert_habit_log(
+    conn: asyncpg.Connection,
+    user_id: str,
+    habit_id: UUID,
+    period: str,
+    day: date,
+    completed: bool,
+    note: Optional[str],
+) -> asyncpg.Record:
+    """
+    UPSERT completion for a calendar day and apply the completed delta to
+    habit_daily_rollup. Must run inside a transaction.
+    Enforces uniqueness on (habit_id, day, period) via DB constraint.
+    """
+    # Serialises writers for this (user, day) so the before/after diff is exact.
+    await lock_rollup_day(conn, user_id, day)
+    return await q.fetchrow(conn, q.LOG_UPSERT, habit_id, period, day, completed, note, user_id)
+
+
+async def owned_habit_ids(conn: asyncpg.Connection, habit_ids: Sequence[UUID], user_id: str) -> set[UUID]:
+    """
+    Subset of `habit_ids` owned by the user, in a single round trip.
+    """
+    rows = await q.fetch(conn, q.HABITS_OWNED, list(habit_ids), user_id)
+    return {r["id"] for r in rows}
+
+
+async def upsert_habit_logs(
+    conn: asyncpg.Connection,
+    user_id: str,
+    items: Sequence[Tuple[UUID, str, date, bool, Optional[str]]],
+) -> List[asyncpg.Record]:
+    """
+    Bulk variant of upsert_habit_log: one unnest() statement for all
+    (habit_id, period, day, completed, note) items, rollup deltas grouped per day.
+    Keys must be unique within `items`. Must run inside a transaction.
+    """
+    if not items:
+        return []
+    habit_ids, periods, days, completed, notes = (list(col) for col in zip(*items))
+    await lock_rollup_days(conn, user_id, days)
+    rows = await q.fetch(conn, q.LOG_UPSERT_MANY, habit_ids, periods, days, completed, notes, user_id)
+    await set_completion_bits(conn, [(r["habit_id"], r["period"], r["day"], r["completed"]) for r in rows])
+    return rows
+
+
+async def notify_event(conn: asyncpg.Connection, user_id: str, event: Dict[str, Any]) -> None:
+    """
+    Queue a change event for the user's open clients; sent when the transaction commits.
+    """
+    await q.execute(conn, q.NOTIFY_EVENT, CHANNEL, encode_event(user_id, event))
+
+
+def log_event(rows: Sequence[asyncpg.Record]) -> Dict[str, Any]:
+    return {
+        "type": "habit_log",
+        "logs": [
+            {
+                "habit_id": str(r["habit_id"]),
+                "period": r["period"],
+                "day": r["day"].isoformat(),
+                "completed": r["completed"],
+            }
+            for r in rows
+        ],
+    }
+
+
+# ──────────────────────────
+# Daily completion rollup
+# ──────────────────────────
+# habit_daily_rollup is sparse: a day only gets a row once something changes
+# on it. Days without a row inherit `total` from the closest earlier row.
+# A slot counts toward `total` from its habit's creation day in the user's
+# timezone, and its logs count toward `completed` only from that day on, so
+# completed never exceeds total.
+
+
+async def lock_rollup_day(conn: asyncpg.Connection, user_id: str, day: date) -> None:
+    """
+    Make sure the (user, day) rollup row exists and hold its row lock until commit.
+    """
+    await lock_rollup_days(conn, user_id, [day])
+
+
+async def lock_rollup_days(conn: asyncpg.Connection, user_id: str, days: Sequence[date]) -> None:
+    """
+    lock_rollup_day for many days in one statement (locked in day order).
+    """
+    await q.execute(conn, q.ROLLUP_LOCK_DAYS, user_id, sorted(set(days)))
+
+
+async def adjust_rollup_total(conn: asyncpg.Connection, user_id: str, from_day: date, delta: int) -> None:
+    """
+    Shift the due-slot count by `delta` from `from_day` onwards.
+    Call from every path that adds, removes, archives or unarchives slots.
+    """
+    await lock_rollup_day(conn, user_id, from_day)
+    await q.execute(conn, q.ROLLUP_ADJUST_TOTAL, user_id, from_day, delta)
+
+
+async def rebuild_daily_rollup(conn: asyncpg.Connection, user_id: str) -> None:
+    """
+    Recompute a user's rollup rows from habit / habit_slot / habit_log.
+    Run inside a transaction.
+    """
+    await q.execute(conn, q.ROLLUP_DELETE_USER, user_id)
+    await q.execute(conn, q.ROLLUP_REBUILD, user_id)
+
+
+async def fetch_daily_rollup(
+    conn: asyncpg.Connection,
+    user_id: str,
+    start: date,
+    end: date,
+) -> List[asyncpg.Record]:
+    """
+    Rollup rows in [start, end] plus the last row before `start` (to seed the carried total).
+    """
+    return await q.fetch(conn, q.ROLLUP_RANGE, user_id, start, end)
+
+
+# ──────────────────────────
+# Completion bitmaps
+# ──────────────────────────
+async def set_completion_bits(
+    conn: asyncpg.Connection,
+    items: Sequence[Tuple[UUID, str, date, bool]],
+) -> None:
+    """
+    Flip the (habit, period, day) bits to `completed`. upsert_habit_log does this
+    inline; bulk writers call it with their upserted rows.
+    """
+    if items:
+        await q.executemany(conn, q.BITMAP_SET, items)
+
+
+async def rebuild_completion_bitmaps(conn: asyncpg.Connection, user_id: str) -> None:
+    """
+    Recompute a user's bitmaps from habit_log. Run inside a transaction.
+    """
+    await q.execute(conn, q.BITMAP_DELETE_USER, user_id)
+    await q.execute(conn, q.BITMAP_REBUILD, user_id)
+
+
+async def fetch_heatmap(conn: asyncpg.Connection, user_id: str, year: int) -> List[asyncpg.Record]:
+    """
+    (habit_id, name, period, created_on, bits) for every active slot; bits may be NULL.
+    """
+    return await q.fetch(conn, q.HEATMAP, user_id, year)
+
+
+# ──────────────────────────
+# Streak inputs
+# ──────────────────────────
+async def fetch_habit_schedules(conn: asyncpg.Connection, user_id: str) -> List[asyncpg.Record]:
+    """
+    Active habits with their schedule (NULLs when no habit_schedule row) and slot count.
+    """
+    return await q.fetch(conn, q.HABIT_SCHEDULES, user_id)
+
+
+async def fetch_completed_slot_counts(
+    conn: asyncpg.Connection,
+    user_id: str,
+    habit_id: Optional[UUID] = None,
+    since: Optional[date] = None,
+) -> List[asyncpg.Record]:
+    """
+    (habit_id, day, n_done): completed slots per habit per day, optionally for one
+    habit and/or from `since` onwards.
+    """
+    return await q.fetch(conn, q.COMPLETED_SLOT_COUNTS, user_id, habit_id, since)
@@ -0,0 +1,45 @@
+# app/core/storage/__init__.py
+"""
+Pluggable storage for users, habits, slots, logs and stats.
+
+    storage = await open_storage("sqlite", "habits.db")
+    rows = await storage.checklist(user_id, day)
+
+Backends (see base.Storage for the interface):
+  - "postgres": app.core.repo over an asyncpg pool; url is a DSN
+  - "sqlite": embedded single-node engine in WAL mode; url is a file path
+  - "memory": dicts in one process, nothing persisted
+
+The request handlers run on the backend named by settings.STORAGE_BACKEND
+(app.core.db.get_storage). On Postgres it is bound to the request's pool, so
+admission control, replica routing and read-your-writes sit below this
+interface. bench.storage compares the backends' results and latency, and
+tests/test_storage.py holds them to the same behaviour.
+"""
+from __future__ import annotations
+
+from typing import Optional
+
+from app.core.storage.base import PERIODS, EventFn, LogItem, Row, Storage
+from app.core.storage.memory import MemoryStorage
+from app.core.storage.sqlite import SQLiteStorage
+
+BACKENDS = ("postgres", "sqlite", "memory")
+
+
+async def open_storage(backend: str, url: Optional[str] = None) -> Storage:
+    if backend == "memory":
+        return MemoryStorage()
+    if backend == "sqlite":
+        return await SQLiteStorage.open(url or "habits.db")
+    if backend == "postgres":
+        if not url:
+            raise ValueError("postgres storage needs a DSN")
+        # Imported here: app.core.repo pulls in the settings and the pool module
+        from app.core.storage.postgres import PostgresStorage
+
+        return await PostgresStorage.connect(url)
+    raise ValueError(f"storage backend must be one of {', '.join(BACKENDS)}, got {backend!r}")
+
+
+__all__ = ["BACKENDS", "PERIODS", "EventFn", "LogItem", "MemoryStorage", "Row", "SQLiteStorage", "Storage", "open_storage"]
@@ -0,0 +1,223 @@
+# app/core/storage/base.py
+"""
+Storage interface shared by the Postgres, SQLite and in-memory backends.
+
+Every method is one atomic operation: writes that touch several tables
+(habit + slot + rollup + data version, log upserts + data version) commit
+together or not at all. Rows come back as mappings with the same keys and
+Python types as the Postgres queries in app.core.queries (UUID ids, date
+days, time local_time, str periods), so callers can treat an asyncpg.Record
+and a dict alike.
+
+Change events for /api/events go out through publish(): Postgres sends a
+NOTIFY that reaches every worker, the embedded backends call `events`. The
+write methods take the event as a callback instead, so Postgres queues the
+NOTIFY in the write's own transaction: it goes out on commit, never for a
+rolled-back write, and is not lost to a failure after the commit.
+"""
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from datetime import date, datetime, time, timezone
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+from uuid import UUID
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from app.core.heatmap import BITMAP_BYTES
+
+Row = Mapping[str, Any]
+# (habit_id, period, day, completed, note), unique on (habit_id, period, day)
+LogItem = Tuple[UUID, str, date, bool, Optional[str]]
+# Builds the change event for a write from what it wrote (e.g. repo.log_event)
+EventFn = Callable[[Any], Dict[str, Any]]
+
+# Same order as the time_period enum: ORDER BY period and (day, period) keys follow it
+PERIODS = ("MORNING", "AFTERNOON", "NIGHT")
+PERIOD_RANK = {p: i for i, p in enumerate(PERIODS)}
+
+# Checklist ordering puts slots without a time last, as COALESCE(local_time, '23:59') does
+LATE = time(23, 59)
+
+# app_user.timezone column default
+USER_TIMEZONE = "America/Chicago"
+
+
+def pack_days(days: Iterable[date], year: int) -> bytes:
+    """
+    46-byte completion bitmap for `year` (bit i = day-of-year i + 1, LSB first),
+    the layout of habit_completion_bitmap.bits.
+    """
+    bits = bytearray(BITMAP_BYTES)
+    start = date(year, 1, 1).toordinal()
+    for d in days:
+        i = d.toordinal() - start
+        bits[i >> 3] |= 1 << (i & 7)
+    return bytes(bits)
+
+
+def year_bounds(year: int) -> Tuple[date, date]:
+    return date(year, 1, 1), date(year, 12, 31)
+
+
+def local_date(at: datetime, tz_name: str) -> date:
+    """
+    Calendar day of `at` in the user's timezone (UTC for an unknown name), the
+    day Postgres computes with (created_at AT TIME ZONE u.timezone)::date.
+    """
+    try:
+        tz = ZoneInfo(tz_name)
+    except (ZoneInfoNotFoundError, ValueError):
+        tz = timezone.utc
+    return at.astimezone(tz).date()
+
+
+class Storage(ABC):
+    """
+    Interface every backend implements.
+    """
+
+    name = "storage"
+
+    # Called by publish(); the app points it at its in-process event hub
+    events: Optional[Callable[[str, Dict[str, Any]], None]] = None
+
+    @abstractmethod
+    async def close(self) -> None:
+        ...
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator["Storage"]:
+        """
+        Storage for one request's calls. Backends that check out connections
+        hold one for the whole block instead of one per call.
+        """
+        yield self
+
+    async def publish(self, user_id: str, event: Dict[str, Any]) -> None:
+        """
+        Hand a change event (app.core.events) to the user's subscribers.
+        """
+        if self.events is not None:
+            self.events(user_id, event)
+
+    # ---- users ----
+    @abstractmethod
+    async def upsert_user(self, email: str, name: Optional[str], image_url: Optional[str]) -> Row:
+        """
+        Insert or update by email; NULL name / image_url keep the stored value.
+        """
+
+    @abstractmethod
+    async def get_user(self, user_id: str) -> Optional[Row]:
+        ...
+
+    @abstractmethod
+    async def data_version(self, user_id: str) -> int:
+        """
+        Per-user data version (0 for unknown users); every write below bumps it.
+        """
+
+    # ---- habits / slots ----
+    @abstractmethod
+    async def create_habit(
+        self,
+        user_id: str,
+        name: str,
+        period: str,
+        local_time: Optional[time],
+        event: Optional[EventFn] = None,
+    ) -> UUID:
+        """
+        New habit with its first slot. `event(habit_id)` is published with the write.
+        """
+
+    @abstractmethod
+    async def add_slot(self, user_id: str, habit_id: UUID, period: str, local_time: Optional[time]) -> None:
+        ...
+
+    @abstractmethod
+    async def owned_habit_ids(self, user_id: str, habit_ids: Sequence[UUID]) -> Set[UUID]:
+        ...
+
+    @abstractmethod
+    async def checklist(self, user_id: str, day: date) -> List[Row]:
+        """
+        (habit_id, name, period, local_time, completed) per active slot, ordered
+        by period, local_time (untimed last), name.
+        """
+
+    @abstractmethod
+    async def checklist_range(self, user_id: str, start: date, end: date) -> List[Row]:
+        """
+        Same rows as checklist() with done_days (sorted completed days in [start, end])
+        in place of completed.
+        """
+
+    # ---- logs ----
+    @abstractmethod
+    async def record_logs(
+        self,
+        user_id: str,
+        items: Sequence[LogItem],
+        event: Optional[EventFn] = None,
+    ) -> Tuple[List[Row], Optional[int]]:
+        """
+        Upsert (habit_id, period, day, completed, note) logs; a NULL note keeps the
+        stored one. Returns (habit_id, period, day, completed, note, created_at) per
+        item and the data version this write bumped to (None when `items` is
+        empty). `event(rows)` is published with the write. The caller checks
+        ownership (owned_habit_ids).
+        """
+
+    @abstractmethod
+    async def habit_logs_page(
+        self,
+        habit_id: UUID,
+        start: date,
+        end: date,
+        after: Tuple[date, str],
+        limit: int,
+        descending: bool = True,
+    ) -> List[Row]:
+        """
+        Up to `limit` (period, day, completed, note, created_at) rows of one habit in
+        [start, end], ordered by (day, period), strictly after `after` in that order.
+        """
+
+    # ---- stats ----
+    @abstractmethod
+    async def daily_rollup(self, user_id: str, start: date, end: date) -> List[Row]:
+        """
+        (day, completed, total) rows as the ROLLUP_RANGE query returns them: an
+        optional row before `start` seeding the total, then rows in [start, end].
+        A day without a row has nothing completed and the previous total.
+        """
+
+    @abstractmethod
+    async def habit_schedules(self, user_id: str) -> List[Row]:
+        """
+        (habit_id, created_on, cadence, dow_mask, interval_days, start_date, n_slots)
+        per active habit with slots; schedule columns are None without a schedule.
+        """
+
+    @abstractmethod
+    async def completed_slot_counts(
+        self,
+        user_id: str,
+        habit_id: Optional[UUID] = None,
+        since: Optional[date] = None,
+    ) -> List[Row]:
+        """
+        (habit_id, day, n_done) for active habits, optionally one habit and/or from `since`.
+        """
+
+    @abstractmethod
+    async def heatmap(self, user_id: str, year: int) -> List[Row]:
+        """
+        (habit_id, name, period, created_on, bits) per active slot, ordered by
+        name, period; bits is a pack_days() bitmap or None.
+        """
@@ -0,0 +1,340 @@
+# app/core/storage/memory.py
+"""
+In-memory storage: plain dicts in one process, nothing persisted.
+
+Meant for local runs and as the reference the other backends are checked
+against (bench.storage). No method awaits before its write is done, so
+each one is atomic on the event loop without a lock.
+
+Each habit's logs are a dict keyed by (day, period rank) plus a sorted list
+of those keys, so range reads and keyset pages are bisect slices. Stats are
+computed on read, using the rollup rebuild's definition (total = active
+slots whose habit existed that day, completed = their logs on that day)
+rather than a maintained rollup table.
+"""
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+from uuid import UUID, uuid4
+
+from app.core.storage.base import (
+    LATE,
+    PERIOD_RANK,
+    PERIODS,
+    USER_TIMEZONE,
+    EventFn,
+    LogItem,
+    Row,
+    Storage,
+    local_date,
+    pack_days,
+    year_bounds,
+)
+
+_Key = Tuple[date, int]
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _checklist_order(row: Row) -> Tuple[int, time, str]:
+    return PERIOD_RANK[row["period"]], row["local_time"] or LATE, row["name"]
+
+
+@dataclass(eq=False)
+class _Habit:
+    id: UUID
+    user_id: str
+    name: str
+    created_at: datetime
+    # created_at's day in the user's timezone
+    created_on: date
+    archived: bool = False
+    # period -> local_time
+    slots: Dict[str, Optional[time]] = field(default_factory=dict)
+
+
+class MemoryStorage(Storage):
+    name = "memory"
+
+    def __init__(self) -> None:
+        self._users: Dict[str, Dict[str, Any]] = {}
+        self._emails: Dict[str, str] = {}
+        self._habits: Dict[UUID, _Habit] = {}
+        self._by_user: Dict[str, List[UUID]] = {}
+        self._logs: Dict[UUID, Dict[_Key, Dict[str, Any]]] = {}
+        self._keys: Dict[UUID, List[_Key]] = {}
+
+    async def close(self) -> None:
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "users": len(self._users),
+            "habits": len(self._habits),
+            "logs": sum(len(logs) for logs in self._logs.values()),
+        }
+
+    # ---- helpers ----
+    def _bump(self, user_id: str) -> int:
+        user = self._users.get(user_id)
+        if user is None:
+            return 0
+        user["data_version"] += 1
+        return user["data_version"]
+
+    def _active(self, user_id: str) -> List[_Habit]:
+        habits = (self._habits[hid] for hid in self._by_user.get(user_id, ()))
+        return [h for h in habits if not h.archived]
+
+    def _owned(self, user_id: str, habit_id: UUID) -> _Habit:
+        habit = self._habits.get(habit_id)
+        if habit is None or habit.user_id != user_id:
+            raise KeyError(f"habit {habit_id} not found")
+        return habit
+
+    def _span(self, habit_id: UUID, start: date, end: date) -> Tuple[List[_Key], int, int]:
+        keys = self._keys.get(habit_id, [])
+        return keys, bisect_left(keys, (start, -1)), bisect_right(keys, (end, len(PERIODS)))
+
+    def _done_days(self, habit_id: UUID, period: str, start: date, end: date) -> Iterator[date]:
+        keys, lo, hi = self._span(habit_id, start, end)
+        logs = self._logs.get(habit_id, {})
+        rank = PERIOD_RANK[period]
+        for i in range(lo, hi):
+            key = keys[i]
+            if key[1] == rank and logs[key]["completed"]:
+                yield key[0]
+
+    @staticmethod
+    def _user_row(user: Dict[str, Any]) -> Row:
+        return {k: user[k] for k in ("id", "email", "name", "image_url", "timezone", "created_at")}
+
+    # ---- users ----
+    async def upsert_user(self, email: str, name: Optional[str], image_url: Optional[str]) -> Row:
+        user_id = self._emails.get(email)
+        if user_id is None:
+            user_id = self._emails[email] = str(uuid4())
+            self._users[user_id] = {
+                "id": user_id,
+                "email": email,
+                "name": name,
+                "image_url": image_url,
+                "timezone": USER_TIMEZONE,
+                "created_at": _now(),
+                "data_version": 0,
+            }
+        user = self._users[user_id]
+        if name is not None:
+            user["name"] = name
+        if image_url is not None:
+            user["image_url"] = image_url
+        return self._user_row(user)
+
+    async def get_user(self, user_id: str) -> Optional[Row]:
+        user = self._users.get(user_id)
+        return self._user_row(user) if user else None
+
+    async def data_version(self, user_id: str) -> int:
+        user = self._users.get(user_id)
+        return user["data_version"] if user else 0
+
+    # ---- habits / slots ----
+    async def create_habit(
+        self,
+        user_id: str,
+        name: str,
+        period: str,
+        local_time: Optional[time],
+        event: Optional[EventFn] = None,
+    ) -> UUID:
+        if user_id not in self._users:
+            raise KeyError(f"user {user_id} not found")
+        now = _now()
+        created_on = local_date(now, self._users[user_id]["timezone"])
+        habit = _Habit(uuid4(), user_id, name, now, created_on, slots={period: local_time})
+        self._habits[habit.id] = habit
+        self._by_user.setdefault(user_id, []).append(habit.id)
+        self._bump(user_id)
+        if event is not None:
+            await self.publish(user_id, event(habit.id))
+        return habit.id
+
+    async def add_slot(self, user_id: str, habit_id: UUID, period: str, local_time: Optional[time]) -> None:
+        habit = self._owned(user_id, habit_id)
+        if period in habit.slots:
+            raise ValueError(f"habit {habit_id} already has a {period} slot")
+        habit.slots[period] = local_time
+        self._bump(user_id)
+
+    async def owned_habit_ids(self, user_id: str, habit_ids: Sequence[UUID]) -> Set[UUID]:
+        return {hid for hid in habit_ids if (h := self._habits.get(hid)) is not None and h.user_id == user_id}
+
+    async def checklist(self, user_id: str, day: date) -> List[Row]:
+        rows = []
+        for h in self._active(user_id):
+            logs = self._logs.get(h.id, {})
+            for period, local_time in h.slots.items():
+                log = logs.get((day, PERIOD_RANK[period]))
+                rows.append({
+                    "habit_id": h.id,
+                    "name": h.name,
+                    "period": period,
+                    "local_time": local_time,
+                    "completed": bool(log and log["completed"]),
+                })
+        rows.sort(key=_checklist_order)
+        return rows
+
+    async def checklist_range(self, user_id: str, start: date, end: date) -> List[Row]:
+        rows = [
+            {
+                "habit_id": h.id,
+                "name": h.name,
+                "period": period,
+                "local_time": local_time,
+                "done_days": list(self._done_days(h.id, period, start, end)),
+            }
+            for h in self._active(user_id)
+            for period, local_time in h.slots.items()
+        ]
+        rows.sort(key=_checklist_order)
+        return rows
+
+    # ---- logs ----
+    async def record_logs(
+        self,
+        user_id: str,
+        items: Sequence[LogItem],
+        event: Optional[EventFn] = None,
+    ) -> Tuple[List[Row], Optional[int]]:
+        if not items:
+            return [], None
+        # Check everything first so a bad item leaves nothing half-written
+        for habit_id, period, *_ in items:
+            if habit_id not in self._habits:
+                raise KeyError(f"habit {habit_id} not found")
+            if period not in PERIOD_RANK:
+                raise ValueError(f"unknown period {period!r}")
+        now = _now()
+        out = []
+        for habit_id, period, day, completed, note in items:
+            key = (day, PERIOD_RANK[period])
+            logs = self._logs.setdefault(habit_id, {})
+            row = logs.get(key)
+            if row is None:
+                row = logs[key] = {
+                    "habit_id": habit_id,
+                    "period": period,
+                    "day": day,
+                    "completed": completed,
+                    "note": note,
+                    "created_at": now,
+                }
+                insort(self._keys.setdefault(habit_id, []), key)
+            else:
+                row["completed"] = completed
+                if note is not None:
+                    row["note"] = note
+            out.append(dict(row))
+        version = self._bump(user_id)
+        if event is not None:
+            await self.publish(user_id, event(out))
+        return out, version
+
+    async def habit_logs_page(
+        self,
+        habit_id: UUID,
+        start: date,
+        end: date,
+        after: Tuple[date, str],
+        limit: int,
+        descending: bool = True,
+    ) -> List[Row]:
+        keys, lo, hi = self._span(habit_id, start, end)
+        key = (after[0], PERIOD_RANK[after[1]])
+        if descending:
+            hi = min(hi, bisect_left(keys, key))
+            picked = keys[max(lo, hi - limit):hi][::-1]
+        else:
+            lo = max(lo, bisect_right(keys, key))
+            picked = keys[lo:min(hi, lo + limit)]
+        logs = self._logs.get(habit_id, {})
+        return [
+            {k: logs[key][k] for k in ("period", "day", "completed", "note", "created_at")}
+            for key in picked
+        ]
+
+    # ---- stats ----
+    async def daily_rollup(self, user_id: str, start: date, end: date) -> List[Row]:
+        if end < start:
+            return []
+        n_days = (end - start).days + 1
+        completed = [0] * n_days
+        since: List[date] = []
+        for h in self._active(user_id):
+            for period in h.slots:
+                since.append(h.created_on)
+                # Logs from before the habit existed count toward neither side
+                for day in self._done_days(h.id, period, max(start, h.created_on), end):
+                    completed[(day - start).days] += 1
+        since.sort()
+        rows = []
+        for i in range(n_days):
+            day = start + timedelta(days=i)
+            rows.append({"day": day, "completed": completed[i], "total": bisect_right(since, day)})
+        return rows
+
+    async def habit_schedules(self, user_id: str) -> List[Row]:
+        # No write path sets a habit_schedule yet: every habit is DAILY from its creation
+        return [
+            {
+                "habit_id": h.id,
+                "created_on": h.created_on,
+                "cadence": None,
+                "dow_mask": None,
+                "interval_days": None,
+                "start_date": None,
+                "n_slots": len(h.slots),
+            }
+            for h in self._active(user_id)
+            if h.slots
+        ]
+
+    async def completed_slot_counts(
+        self,
+        user_id: str,
+        habit_id: Optional[UUID] = None,
+        since: Optional[date] = None,
+    ) -> List[Row]:
+        rows = []
+        for h in self._active(user_id):
+            if habit_id is not None and h.id != habit_id:
+                continue
+            counts: Counter = Counter()
+            for period in h.slots:
+                counts.update(self._done_days(h.id, period, since or date.min, date.max))
+            rows.extend({"habit_id": h.id, "day": day, "n_done": n} for day, n in counts.items())
+        return rows
+
+    async def heatmap(self, user_id: str, year: int) -> List[Row]:
+        first, last = year_bounds(year)
+        rows = []
+        for h in self._active(user_id):
+            for period in h.slots:
+                days = list(self._done_days(h.id, period, first, last))
+                rows.append({
+                    "habit_id": h.id,
+                    "name": h.name,
+                    "period": period,
+                    "created_on": h.created_on,
+                    "bits": pack_days(days, year) if days else None,
+                })
+        rows.sort(key=lambda r: (r["name"], PERIOD_RANK[r["period"]]))
+        return rows
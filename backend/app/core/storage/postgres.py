@@ -0,0 +1,183 @@
+# app/core/storage/postgres.py
+"""
+Postgres storage: the Storage interface over app.core.repo and its prepared
+statements, one pool checkout (and transaction, for writes) per call, or
+one checkout for a whole session() block.
+
+Writes keep the maintained tables current: the habit_daily_rollup deltas,
+the completion bitmaps and the data version, and queue their change event's
+NOTIFY in the same transaction. The request handlers get it
+bound to their request's pool (with_pool), so admission control, replica
+routing and read-your-writes apply as before.
+"""
+from __future__ import annotations
+
+from contextlib import asynccontextmanager
+from datetime import date, time
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Set, Tuple
+from uuid import UUID
+
+import asyncpg
+
+from app.core import repo
+from app.core.db import AppConnection
+from app.core.profiles import user_today
+from app.core.storage.base import EventFn, LogItem, Row, Storage
+
+
+class PostgresStorage(Storage):
+    name = "postgres"
+
+    def __init__(self, pool: Any, owns_pool: bool = False, conn: Optional[asyncpg.Connection] = None):
+        self.pool = pool
+        self._owns_pool = owns_pool
+        # Set inside session(): every call runs on this connection
+        self._conn = conn
+
+    @classmethod
+    async def connect(cls, dsn: str, min_size: int = 2, max_size: int = 10) -> "PostgresStorage":
+        """
+        Storage on a pool of its own (the app's pool can be passed to __init__ instead).
+        """
+        pool = await asyncpg.create_pool(dsn=dsn, min_size=min_size, max_size=max_size,
+                                         connection_class=AppConnection)
+        return cls(pool, owns_pool=True)
+
+    def with_pool(self, pool: Any) -> "PostgresStorage":
+        """
+        The same storage on another pool, e.g. a request's primary or replica pool.
+        """
+        return PostgresStorage(pool)
+
+    async def close(self) -> None:
+        if self._owns_pool:
+            await self.pool.close()
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[Storage]:
+        if self._conn is not None:
+            yield self
+            return
+        async with self.pool.acquire() as conn:
+            yield PostgresStorage(self.pool, conn=conn)
+
+    @asynccontextmanager
+    async def _connection(self) -> AsyncIterator[asyncpg.Connection]:
+        if self._conn is not None:
+            yield self._conn
+            return
+        async with self.pool.acquire() as conn:
+            yield conn
+
+    async def publish(self, user_id: str, event: Dict[str, Any]) -> None:
+        # NOTIFY: every worker's event hub fans it out (sent on commit inside a transaction)
+        async with self._connection() as conn:
+            await repo.notify_event(conn, user_id, event)
+
+    # ---- users ----
+    async def upsert_user(self, email: str, name: Optional[str], image_url: Optional[str]) -> Row:
+        async with self._connection() as conn:
+            return await repo.upsert_user(conn, email, name, image_url)
+
+    async def get_user(self, user_id: str) -> Optional[Row]:
+        async with self._connection() as conn:
+            return await repo.fetch_user(conn, user_id)
+
+    async def data_version(self, user_id: str) -> int:
+        async with self._connection() as conn:
+            return await repo.fetch_data_version(conn, user_id)
+
+    # ---- habits / slots ----
+    async def create_habit(
+        self,
+        user_id: str,
+        name: str,
+        period: str,
+        local_time: Optional[time],
+        event: Optional[EventFn] = None,
+    ) -> UUID:
+        # One more slot is due from the user's today onwards
+        today = await user_today(self, user_id)
+        async with self._connection() as conn, conn.transaction():
+            habit_id = await repo.insert_habit(conn, user_id, name)
+            await repo.insert_habit_slot(conn, habit_id, period, local_time)
+            await repo.adjust_rollup_total(conn, user_id, today, 1)
+            await repo.bump_data_version(conn, user_id)
+            if event is not None:
+                await repo.notify_event(conn, user_id, event(habit_id))
+        return habit_id
+
+    async def add_slot(self, user_id: str, habit_id: UUID, period: str, local_time: Optional[time]) -> None:
+        today = await user_today(self, user_id)
+        async with self._connection() as conn, conn.transaction():
+            if not await repo.habit_belongs_to(conn, habit_id, user_id):
+                raise KeyError(f"habit {habit_id} not found")
+            await repo.insert_habit_slot(conn, habit_id, period, local_time)
+            await repo.adjust_rollup_total(conn, user_id, today, 1)
+            await repo.bump_data_version(conn, user_id)
+
+    async def owned_habit_ids(self, user_id: str, habit_ids: Sequence[UUID]) -> Set[UUID]:
+        async with self._connection() as conn:
+            return await repo.owned_habit_ids(conn, habit_ids, user_id)
+
+    async def checklist(self, user_id: str, day: date) -> List[Row]:
+        async with self._connection() as conn:
+            return await repo.fetch_checklist(conn, user_id, day)
+
+    async def checklist_range(self, user_id: str, start: date, end: date) -> List[Row]:
+        async with self._connection() as conn:
+            return await repo.fetch_checklist_range(conn, user_id, start, end)
+
+    # ---- logs ----
+    async def record_logs(
+        self,
+        user_id: str,
+        items: Sequence[LogItem],
+        event: Optional[EventFn] = None,
+    ) -> Tuple[List[Row], Optional[int]]:
+        if not items:
+            return [], None
+        async with self._connection() as conn, conn.transaction():
+            if len(items) == 1:
+                # A single toggle: log, rollup delta and bitmap bit in one statement
+                rows = [await repo.upsert_habit_log(conn, user_id, *items[0])]
+            else:
+                rows = await repo.upsert_habit_logs(conn, user_id, items)
+            version = await repo.bump_data_version(conn, user_id)
+            if event is not None:
+                await repo.notify_event(conn, user_id, event(rows))
+        return rows, version
+
+    async def habit_logs_page(
+        self,
+        habit_id: UUID,
+        start: date,
+        end: date,
+        after: Tuple[date, str],
+        limit: int,
+        descending: bool = True,
+    ) -> List[Row]:
+        async with self._connection() as conn:
+            return await repo.fetch_habit_logs_page(conn, habit_id, start, end, after, limit, descending)
+
+    # ---- stats ----
+    async def daily_rollup(self, user_id: str, start: date, end: date) -> List[Row]:
+        async with self._connection() as conn:
+            return await repo.fetch_daily_rollup(conn, user_id, start, end)
+
+    async def habit_schedules(self, user_id: str) -> List[Row]:
+        async with self._connection() as conn:
+            return await repo.fetch_habit_schedules(conn, user_id)
+
+    async def completed_slot_counts(
+        self,
+        user_id: str,
+        habit_id: Optional[UUID] = None,
+        since: Optional[date] = None,
+    ) -> List[Row]:
+        async with self._connection() as conn:
+            return await repo.fetch_completed_slot_counts(conn, user_id, habit_id, since)
+
+    async def heatmap(self, user_id: str, year: int) -> List[Row]:
+        async with self._connection() as conn:
+            return await repo.fetch_heatmap(conn, user_id, year)
@@ -0,0 +1,540 @@
+# app/core/storage/sqlite.py
+"""
+Embedded single-node storage on SQLite (stdlib sqlite3) in WAL mode.
+
+One file, no server: for single-instance deployments and local runs. The
+schema mirrors DB/schema.txt with SQLite types:
+
+  - ids are UUID text, days ISO 'YYYY-MM-DD' text, times 'HH:MM:SS' text,
+    timestamps ISO text in UTC
+  - periods are stored as their time_period rank (0, 1, 2), so ORDER BY
+    period and (day, period) row comparisons follow the enum order
+  - habit_log is a WITHOUT ROWID table keyed (habit_id, day, period): one
+    habit's history is contiguous in the primary key b-tree, which serves the
+    range scans and keyset pages the way habit_log_lookup_idx does in Postgres
+
+There is no rollup or bitmap table; stats are aggregated from habit_log on
+read (totals by the rollup rebuild's definition).
+
+sqlite3 blocks, so every call runs in a worker thread (asyncio.to_thread).
+Writes go through one connection and one lock (SQLite has a single writer
+anyway). Reads use a second connection that WAL lets run alongside a write.
+"""
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+from datetime import date, datetime, time, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple, TypeVar
+from uuid import UUID, uuid4
+
+from app.core.storage.base import (
+    PERIOD_RANK,
+    PERIODS,
+    USER_TIMEZONE,
+    EventFn,
+    LogItem,
+    Row,
+    Storage,
+    local_date,
+    pack_days,
+    year_bounds,
+)
+
+T = TypeVar("T")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS app_user (
+    id           TEXT PRIMARY KEY,
+    email        TEXT NOT NULL UNIQUE,
+    name         TEXT,
+    image_url    TEXT,
+    timezone     TEXT NOT NULL,
+    created_at   TEXT NOT NULL,
+    data_version INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS habit (
+    id          TEXT PRIMARY KEY,
+    user_id     TEXT NOT NULL REFERENCES app_user (id) ON DELETE CASCADE,
+    name        TEXT NOT NULL,
+    description TEXT,
+    archived    INTEGER NOT NULL DEFAULT 0,
+    created_at  TEXT NOT NULL,
+    -- created_at's day in the user's timezone (SQLite has no AT TIME ZONE)
+    created_on  TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS habit_user_idx ON habit (user_id);
+
+CREATE TABLE IF NOT EXISTS habit_slot (
+    id         TEXT PRIMARY KEY,
+    habit_id   TEXT NOT NULL REFERENCES habit (id) ON DELETE CASCADE,
+    period     INTEGER NOT NULL,
+    local_time TEXT,
+    notify     INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (habit_id, period)
+);
+
+CREATE TABLE IF NOT EXISTS habit_log (
+    habit_id   TEXT NOT NULL REFERENCES habit (id) ON DELETE CASCADE,
+    day        TEXT NOT NULL,
+    period     INTEGER NOT NULL,
+    completed  INTEGER NOT NULL DEFAULT 1,
+    note       TEXT,
+    created_at TEXT NOT NULL,
+    PRIMARY KEY (habit_id, day, period)
+) WITHOUT ROWID;
+"""
+
+_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    # Durable at checkpoints rather than on every commit; a crash can lose the
+    # last commits but never corrupts the file
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA busy_timeout = 5000",
+)
+
+# ──────────────────────────
+# SQL
+# ──────────────────────────
+USER_UPSERT = """
+    INSERT INTO app_user (id, email, name, image_url, timezone, created_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (email) DO UPDATE
+       SET name = COALESCE(excluded.name, app_user.name),
+           image_url = COALESCE(excluded.image_url, app_user.image_url)
+    RETURNING id, email, name, image_url, timezone, created_at
+"""
+
+USER_FETCH = """
+    SELECT id, email, name, image_url, timezone, created_at FROM app_user WHERE id = ?
+"""
+
+DATA_VERSION_FETCH = "SELECT data_version FROM app_user WHERE id = ?"
+
+DATA_VERSION_BUMP = "UPDATE app_user SET data_version = data_version + 1 WHERE id = ?"
+
+USER_TIMEZONE_FETCH = "SELECT timezone FROM app_user WHERE id = ?"
+
+HABIT_INSERT = "INSERT INTO habit (id, user_id, name, created_at, created_on) VALUES (?, ?, ?, ?, ?)"
+
+HABIT_OWNED = "SELECT 1 FROM habit WHERE id = ? AND user_id = ?"
+
+SLOT_INSERT = "INSERT INTO habit_slot (id, habit_id, period, local_time) VALUES (?, ?, ?, ?)"
+
+CHECKLIST = """
+    SELECT h.id AS habit_id, h.name, s.period, s.local_time,
+           COALESCE(l.completed, 0) AS completed
+    FROM habit h
+    JOIN habit_slot s ON s.habit_id = h.id
+    LEFT JOIN habit_log l
+      ON l.habit_id = h.id AND l.day = :day AND l.period = s.period
+    WHERE h.user_id = :user AND h.archived = 0
+    ORDER BY s.period, COALESCE(s.local_time, '23:59:00'), h.name
+"""
+
+CHECKLIST_RANGE = """
+    SELECT h.id AS habit_id, h.name, s.period, s.local_time,
+           group_concat(l.day) FILTER (WHERE l.completed) AS done_days
+    FROM habit h
+    JOIN habit_slot s ON s.habit_id = h.id
+    LEFT JOIN habit_log l
+      ON l.habit_id = h.id AND l.day BETWEEN :start AND :end AND l.period = s.period
+    WHERE h.user_id = :user AND h.archived = 0
+    GROUP BY s.id
+    ORDER BY s.period, COALESCE(s.local_time, '23:59:00'), h.name
+"""
+
+LOG_UPSERT = """
+    INSERT INTO habit_log (habit_id, day, period, completed, note, created_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (habit_id, day, period) DO UPDATE
+       SET completed = excluded.completed,
+           note = COALESCE(excluded.note, habit_log.note)
+    RETURNING habit_id, period, day, completed, note, created_at
+"""
+
+HABIT_LOGS_PAGE_DESC = """
+    SELECT period, day, completed, note, created_at
+    FROM habit_log
+    WHERE habit_id = ? AND day BETWEEN ? AND ? AND (day, period) < (?, ?)
+    ORDER BY day DESC, period DESC
+    LIMIT ?
+"""
+
+HABIT_LOGS_PAGE_ASC = """
+    SELECT period, day, completed, note, created_at
+    FROM habit_log
+    WHERE habit_id = ? AND day BETWEEN ? AND ? AND (day, period) > (?, ?)
+    ORDER BY day, period
+    LIMIT ?
+"""
+
+# Dense (day, completed, total) for [start, end]; total = active slots whose
+# habit existed that day and completed = their logs that day, as ROLLUP_REBUILD
+# defines them
+DAILY_ROLLUP = """
+    WITH RECURSIVE days (day) AS (
+      SELECT :start
+      UNION ALL
+      SELECT date(day, '+1 day') FROM days WHERE day < :end
+    ),
+    slots AS (
+      SELECT s.habit_id, s.period, h.created_on AS since
+      FROM habit h
+      JOIN habit_slot s ON s.habit_id = h.id
+      WHERE h.user_id = :user AND h.archived = 0
+    ),
+    done AS (
+      SELECT l.day, COUNT(*) AS n
+      FROM slots s
+      JOIN habit_log l
+        ON l.habit_id = s.habit_id AND l.day BETWEEN :start AND :end AND l.period = s.period
+      WHERE l.completed AND l.day >= s.since
+      GROUP BY l.day
+    )
+    SELECT d.day,
+           COALESCE(done.n, 0) AS completed,
+           (SELECT COUNT(*) FROM slots s WHERE s.since <= d.day) AS total
+    FROM days d
+    LEFT JOIN done ON done.day = d.day
+    ORDER BY d.day
+"""
+
+HABIT_SCHEDULES = """
+    SELECT h.id AS habit_id, h.created_on, COUNT(s.id) AS n_slots
+    FROM habit h
+    JOIN habit_slot s ON s.habit_id = h.id
+    WHERE h.user_id = ? AND h.archived = 0
+    GROUP BY h.id
+"""
+
+COMPLETED_SLOT_COUNTS = """
+    SELECT l.habit_id, l.day, COUNT(*) AS n_done
+    FROM habit h
+    JOIN habit_slot s ON s.habit_id = h.id
+    JOIN habit_log l ON l.habit_id = s.habit_id AND l.period = s.period
+    WHERE h.user_id = :user
+      AND h.archived = 0
+      AND l.completed
+      AND (:habit IS NULL OR h.id = :habit)
+      AND (:since IS NULL OR l.day >= :since)
+    GROUP BY l.habit_id, l.day
+"""
+
+HEATMAP_SLOTS = """
+    SELECT h.id AS habit_id, h.name, s.period, h.created_on
+    FROM habit h
+    JOIN habit_slot s ON s.habit_id = h.id
+    WHERE h.user_id = ? AND h.archived = 0
+    ORDER BY h.name, s.period
+"""
+
+HEATMAP_DAYS = """
+    SELECT l.habit_id, l.period, l.day
+    FROM habit h
+    JOIN habit_log l ON l.habit_id = h.id
+    WHERE h.user_id = ? AND h.archived = 0 AND l.day BETWEEN ? AND ? AND l.completed
+"""
+
+
+# ──────────────────────────
+# Row conversion
+# ──────────────────────────
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _time(value: Optional[str]) -> Optional[time]:
+    return time.fromisoformat(value) if value is not None else None
+
+
+def _user(r: sqlite3.Row) -> Row:
+    return {
+        "id": r["id"],
+        "email": r["email"],
+        "name": r["name"],
+        "image_url": r["image_url"],
+        "timezone": r["timezone"],
+        "created_at": datetime.fromisoformat(r["created_at"]),
+    }
+
+
+def _log(r: sqlite3.Row) -> Row:
+    row = {
+        "period": PERIODS[r["period"]],
+        "day": date.fromisoformat(r["day"]),
+        "completed": bool(r["completed"]),
+        "note": r["note"],
+        "created_at": datetime.fromisoformat(r["created_at"]),
+    }
+    if "habit_id" in r.keys():
+        row = {"habit_id": UUID(r["habit_id"]), **row}
+    return row
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    # Autocommit mode: write transactions are opened explicitly (BEGIN IMMEDIATE)
+    conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    for pragma in _PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+class SQLiteStorage(Storage):
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._writer: Optional[sqlite3.Connection] = None
+        self._reader: Optional[sqlite3.Connection] = None
+        self._write_lock = asyncio.Lock()
+        self._read_lock = asyncio.Lock()
+
+    @classmethod
+    async def open(cls, path: str) -> "SQLiteStorage":
+        """
+        Open (creating if needed) the database file and its schema.
+        """
+        storage = cls(path)
+        await asyncio.to_thread(storage._open)
+        return storage
+
+    def _open(self) -> None:
+        self._writer = _connect(self.path)
+        self._writer.executescript(SCHEMA)
+        self._reader = _connect(self.path)
+
+    async def close(self) -> None:
+        async with self._write_lock, self._read_lock:
+            for conn in (self._reader, self._writer):
+                if conn is not None:
+                    await asyncio.to_thread(conn.close)
+            self._reader = self._writer = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "path": self.path}
+
+    # ---- execution ----
+    async def _read(self, fn: Callable[[sqlite3.Connection], T]) -> T:
+        async with self._read_lock:
+            return await asyncio.to_thread(fn, self._reader)
+
+    async def _write(self, fn: Callable[[sqlite3.Connection], T]) -> T:
+        """
+        Run `fn` in one write transaction (committed, or rolled back if it raises).
+        """
+        def run(conn: sqlite3.Connection) -> T:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(conn)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            return result
+
+        async with self._write_lock:
+            return await asyncio.to_thread(run, self._writer)
+
+    # ---- users ----
+    async def upsert_user(self, email: str, name: Optional[str], image_url: Optional[str]) -> Row:
+        def run(conn: sqlite3.Connection) -> Row:
+            args = (str(uuid4()), email, name, image_url, USER_TIMEZONE, _now())
+            return _user(conn.execute(USER_UPSERT, args).fetchone())
+
+        return await self._write(run)
+
+    async def get_user(self, user_id: str) -> Optional[Row]:
+        r = await self._read(lambda conn: conn.execute(USER_FETCH, (user_id,)).fetchone())
+        return _user(r) if r else None
+
+    async def data_version(self, user_id: str) -> int:
+        r = await self._read(lambda conn: conn.execute(DATA_VERSION_FETCH, (user_id,)).fetchone())
+        return r[0] if r else 0
+
+    # ---- habits / slots ----
+    async def create_habit(
+        self,
+        user_id: str,
+        name: str,
+        period: str,
+        local_time: Optional[time],
+        event: Optional[EventFn] = None,
+    ) -> UUID:
+        habit_id = uuid4()
+
+        def run(conn: sqlite3.Connection) -> None:
+            user = conn.execute(USER_TIMEZONE_FETCH, (user_id,)).fetchone()
+            if user is None:
+                raise KeyError(f"user {user_id} not found")
+            now = datetime.now(timezone.utc)
+            conn.execute(HABIT_INSERT, (str(habit_id), user_id, name, now.isoformat(),
+                                        local_date(now, user["timezone"]).isoformat()))
+            conn.execute(SLOT_INSERT, (str(uuid4()), str(habit_id), PERIOD_RANK[period],
+                                       local_time.isoformat() if local_time else None))
+            conn.execute(DATA_VERSION_BUMP, (user_id,))
+
+        await self._write(run)
+        if event is not None:
+            await self.publish(user_id, event(habit_id))
+        return habit_id
+
+    async def add_slot(self, user_id: str, habit_id: UUID, period: str, local_time: Optional[time]) -> None:
+        def run(conn: sqlite3.Connection) -> None:
+            if conn.execute(HABIT_OWNED, (str(habit_id), user_id)).fetchone() is None:
+                raise KeyError(f"habit {habit_id} not found")
+            conn.execute(SLOT_INSERT, (str(uuid4()), str(habit_id), PERIOD_RANK[period],
+                                       local_time.isoformat() if local_time else None))
+            conn.execute(DATA_VERSION_BUMP, (user_id,))
+
+        await self._write(run)
+
+    async def owned_habit_ids(self, user_id: str, habit_ids: Sequence[UUID]) -> Set[UUID]:
+        ids = [str(h) for h in habit_ids]
+        if not ids:
+            return set()
+        sql = f"SELECT id FROM habit WHERE user_id = ? AND id IN ({','.join('?' * len(ids))})"
+        rows = await self._read(lambda conn: conn.execute(sql, (user_id, *ids)).fetchall())
+        return {UUID(r["id"]) for r in rows}
+
+    async def checklist(self, user_id: str, day: date) -> List[Row]:
+        args = {"user": user_id, "day": day.isoformat()}
+        rows = await self._read(lambda conn: conn.execute(CHECKLIST, args).fetchall())
+        return [
+            {
+                "habit_id": UUID(r["habit_id"]),
+                "name": r["name"],
+                "period": PERIODS[r["period"]],
+                "local_time": _time(r["local_time"]),
+                "completed": bool(r["completed"]),
+            }
+            for r in rows
+        ]
+
+    async def checklist_range(self, user_id: str, start: date, end: date) -> List[Row]:
+        args = {"user": user_id, "start": start.isoformat(), "end": end.isoformat()}
+        rows = await self._read(lambda conn: conn.execute(CHECKLIST_RANGE, args).fetchall())
+        return [
+            {
+                "habit_id": UUID(r["habit_id"]),
+                "name": r["name"],
+                "period": PERIODS[r["period"]],
+                "local_time": _time(r["local_time"]),
+                # group_concat has no ORDER BY before SQLite 3.44; ISO days sort as text
+                "done_days": [date.fromisoformat(d) for d in sorted(r["done_days"].split(","))]
+                if r["done_days"] else [],
+            }
+            for r in rows
+        ]
+
+    # ---- logs ----
+    async def record_logs(
+        self,
+        user_id: str,
+        items: Sequence[LogItem],
+        event: Optional[EventFn] = None,
+    ) -> Tuple[List[Row], Optional[int]]:
+        if not items:
+            return [], None
+
+        def run(conn: sqlite3.Connection) -> Tuple[List[Row], int]:
+            now = _now()
+            out = [
+                _log(conn.execute(LOG_UPSERT, (str(habit_id), day.isoformat(), PERIOD_RANK[period],
+                                               completed, note, now)).fetchone())
+                for habit_id, period, day, completed, note in items
+            ]
+            conn.execute(DATA_VERSION_BUMP, (user_id,))
+            version = conn.execute(DATA_VERSION_FETCH, (user_id,)).fetchone()
+            return out, version[0] if version else 0
+
+        rows, version = await self._write(run)
+        if event is not None:
+            await self.publish(user_id, event(rows))
+        return rows, version
+
+    async def habit_logs_page(
+        self,
+        habit_id: UUID,
+        start: date,
+        end: date,
+        after: Tuple[date, str],
+        limit: int,
+        descending: bool = True,
+    ) -> List[Row]:
+        sql = HABIT_LOGS_PAGE_DESC if descending else HABIT_LOGS_PAGE_ASC
+        args = (str(habit_id), start.isoformat(), end.isoformat(),
+                after[0].isoformat(), PERIOD_RANK[after[1]], limit)
+        rows = await self._read(lambda conn: conn.execute(sql, args).fetchall())
+        return [_log(r) for r in rows]
+
+    # ---- stats ----
+    async def daily_rollup(self, user_id: str, start: date, end: date) -> List[Row]:
+        if end < start:
+            return []
+        args = {"user": user_id, "start": start.isoformat(), "end": end.isoformat()}
+        rows = await self._read(lambda conn: conn.execute(DAILY_ROLLUP, args).fetchall())
+        return [
+            {"day": date.fromisoformat(r["day"]), "completed": r["completed"], "total": r["total"]}
+            for r in rows
+        ]
+
+    async def habit_schedules(self, user_id: str) -> List[Row]:
+        rows = await self._read(lambda conn: conn.execute(HABIT_SCHEDULES, (user_id,)).fetchall())
+        # No write path sets a habit_schedule yet: every habit is DAILY from its creation
+        return [
+            {
+                "habit_id": UUID(r["habit_id"]),
+                "created_on": date.fromisoformat(r["created_on"]),
+                "cadence": None,
+                "dow_mask": None,
+                "interval_days": None,
+                "start_date": None,
+                "n_slots": r["n_slots"],
+            }
+            for r in rows
+        ]
+
+    async def completed_slot_counts(
+        self,
+        user_id: str,
+        habit_id: Optional[UUID] = None,
+        since: Optional[date] = None,
+    ) -> List[Row]:
+        args = {
+            "user": user_id,
+            "habit": str(habit_id) if habit_id else None,
+            "since": since.isoformat() if since else None,
+        }
+        rows = await self._read(lambda conn: conn.execute(COMPLETED_SLOT_COUNTS, args).fetchall())
+        return [
+            {"habit_id": UUID(r["habit_id"]), "day": date.fromisoformat(r["day"]), "n_done": r["n_done"]}
+            for r in rows
+        ]
+
+    async def heatmap(self, user_id: str, year: int) -> List[Row]:
+        first, last = year_bounds(year)
+
+        def run(conn: sqlite3.Connection) -> Tuple[List[sqlite3.Row], List[sqlite3.Row]]:
+            slots = conn.execute(HEATMAP_SLOTS, (user_id,)).fetchall()
+            days = conn.execute(HEATMAP_DAYS, (user_id, first.isoformat(), last.isoformat())).fetchall()
+            return slots, days
+
+        slots, done = await self._read(run)
+        by_slot: Dict[Tuple[str, int], List[date]] = {}
+        for r in done:
+            by_slot.setdefault((r["habit_id"], r["period"]), []).append(date.fromisoformat(r["day"]))
+        rows = []
+        for r in slots:
+            days = by_slot.get((r["habit_id"], r["period"]))
+            rows.append({
+                "habit_id": UUID(r["habit_id"]),
+                "name": r["name"],
+                "period": PERIODS[r["period"]],
+                "created_on": date.fromisoformat(r["created_on"]),
+                "bits": pack_days(days, year) if days else None,
+            })
+        return rows
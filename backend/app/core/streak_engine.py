@@ -0,0 +1,255 @@
+# app/core/streak_engine.py
+"""
+Schedule-aware streaks.
+
+Each active habit's habit_schedule row is expanded into the days it is due
+(NumPy datetime64[D] arithmetic), matched against completed habit_log rows,
+and reduced to current / longest streaks per habit and per user.
+
+A due day counts as done when every slot of the habit was completed that day.
+A user day counts as done when every habit due that day is done. The current
+streak is not broken by today until today is over.
+
+Schedule conventions:
+  - DAILY:  every day from start_date
+  - WEEKLY: days whose bit is set in dow_mask (bit 0 = Monday ... bit 6 = Sunday,
+            same as date.weekday()); without a mask, start_date's weekday
+  - CUSTOM: every interval_days from start_date (1 when NULL)
+  - no habit_schedule row: DAILY from the habit's creation day
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+import numpy as np
+
+from app.core.storage.base import Row, Storage
+
+# 1970-01-01 was a Thursday (weekday 3)
+_EPOCH_WEEKDAY = 3
+
+
+# ──────────────────────────
+# Vectorised helpers
+# ──────────────────────────
+def expand_due_days(
+    cadence: Optional[str],
+    dow_mask: Optional[int],
+    interval_days: Optional[int],
+    start: date,
+    end: date,
+) -> np.ndarray:
+    """
+    Due days in [start, end] as a sorted datetime64[D] array.
+    """
+    if end < start:
+        return np.empty(0, dtype="datetime64[D]")
+    first = np.datetime64(start, "D")
+    stop = np.datetime64(end, "D") + 1
+
+    if cadence == "CUSTOM":
+        return np.arange(first, stop, max(interval_days or 1, 1), dtype="datetime64[D]")
+
+    days = np.arange(first, stop, dtype="datetime64[D]")
+    if cadence == "WEEKLY":
+        mask = dow_mask if dow_mask else 1 << start.weekday()
+        weekday = (days.astype(np.int64) + _EPOCH_WEEKDAY) % 7
+        days = days[(np.right_shift(mask, weekday) & 1).astype(bool)]
+    return days
+
+
+def _trailing_and_longest(ok: np.ndarray) -> Tuple[int, int]:
+    """
+    (length of the run of True ending at the last element, longest run of True).
+    """
+    if ok.size == 0:
+        return 0, 0
+    edges = np.diff(np.concatenate(([0], ok.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    if starts.size == 0:
+        return 0, 0
+    runs = ends - starts
+    current = int(runs[-1]) if ends[-1] == ok.size else 0
+    return current, int(runs.max())
+
+
+def streaks(due: np.ndarray, done: np.ndarray, today: date) -> Tuple[int, int]:
+    """
+    (current, longest) over aligned due/done arrays. An unfinished `today` does
+    not break the current streak.
+    """
+    _, longest = _trailing_and_longest(done)
+    if due.size and due[-1] == np.datetime64(today, "D") and not done[-1]:
+        current, _ = _trailing_and_longest(done[:-1])
+    else:
+        current, _ = _trailing_and_longest(done)
+    return current, longest
+
+
+# ──────────────────────────
+# Per-habit / per-user state
+# ──────────────────────────
+@dataclass
+class HabitStreak:
+    habit_id: str
+    n_slots: int
+    due: np.ndarray            # datetime64[D], sorted
+    done: np.ndarray           # bool, aligned with `due`
+    current: int = 0
+    longest: int = 0
+
+    def recount(self, today: date) -> None:
+        self.current, self.longest = streaks(self.due, self.done, today)
+
+    def apply_counts(self, days: np.ndarray, n_done: np.ndarray, since: Optional[date] = None) -> None:
+        """
+        Overwrite `done` from (day, completed-slot count) pairs, for due days >= since.
+        """
+        lo = 0 if since is None else int(np.searchsorted(self.due, np.datetime64(since, "D")))
+        tail = self.due[lo:]
+        full = days[n_done >= self.n_slots]
+        self.done[lo:] = np.isin(tail, full)
+
+    def as_dict(self, today: date) -> Dict[str, Any]:
+        past = self.due[self.due <= np.datetime64(today, "D")]
+        return {
+            "habit_id": self.habit_id,
+            "current": self.current,
+            "longest": self.longest,
+            "due_today": bool(past.size and past[-1] == np.datetime64(today, "D")),
+            "last_due": str(past[-1]) if past.size else None,
+        }
+
+
+@dataclass
+class UserStreaks:
+    today: date
+    # data_version the state reflects, and the newest one `dirty` accounts for
+    version: int = 0
+    covered: int = 0
+    habits: Dict[str, HabitStreak] = field(default_factory=dict)
+    # habit_id -> earliest day whose completion changed since the last recount
+    dirty: Dict[str, date] = field(default_factory=dict)
+    current: int = 0
+    longest: int = 0
+
+    def recount_user(self) -> None:
+        if not self.habits:
+            self.current = self.longest = 0
+            return
+        due = np.concatenate([h.due for h in self.habits.values()])
+        done = np.concatenate([h.done for h in self.habits.values()])
+        days, inverse = np.unique(due, return_inverse=True)
+        missed = np.bincount(inverse, weights=(~done).astype(np.float64), minlength=days.size)
+        self.current, self.longest = streaks(days, missed == 0, self.today)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "user": {"current": self.current, "longest": self.longest},
+            "habits": [h.as_dict(self.today) for h in self.habits.values()],
+        }
+
+
+def _group_counts(rows: List[Row]) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    grouped: Dict[str, Tuple[List[date], List[int]]] = {}
+    for r in rows:
+        days, counts = grouped.setdefault(str(r["habit_id"]), ([], []))
+        days.append(r["day"])
+        counts.append(r["n_done"])
+    return {
+        hid: (np.array(days, dtype="datetime64[D]"), np.array(counts, dtype=np.int32))
+        for hid, (days, counts) in grouped.items()
+    }
+
+
+_EMPTY_COUNTS = (np.empty(0, dtype="datetime64[D]"), np.empty(0, dtype=np.int32))
+
+
+# ──────────────────────────
+# Cache
+# ──────────────────────────
+class StreakCache:
+    """
+    LRU of per-user streak state, tagged with the user's data_version.
+
+    A read passes the current data_version; a state built at another version
+    is rebuilt, so writes made through other workers, imports or CLI jobs are
+    picked up on the next read. A habit_log write handled by this worker
+    calls mark_dirty() with the version its transaction produced: while those
+    versions follow on from the cached one, the next read reloads and
+    recounts only the dirty habits' tails instead of rebuilding.
+    """
+
+    def __init__(self, max_users: int = 2048):
+        self.max_users = max_users
+        self._users: "OrderedDict[str, UserStreaks]" = OrderedDict()
+
+    def mark_dirty(self, user_id: str, habit_id: UUID | str, day: date, version: int) -> None:
+        state = self._users.get(user_id)
+        if state is None:
+            return
+        hid = str(habit_id)
+        # A gap means some other write (another worker's) is not in `dirty`
+        if hid not in state.habits or version not in (state.covered, state.covered + 1):
+            self._users.pop(user_id, None)
+            return
+        state.covered = version
+        prev = state.dirty.get(hid)
+        state.dirty[hid] = day if prev is None else min(prev, day)
+
+    def invalidate(self, user_id: str) -> None:
+        self._users.pop(user_id, None)
+
+    async def get(self, storage: Storage, user_id: str, today: date, version: int) -> UserStreaks:
+        state = self._users.get(user_id)
+        if state is None or state.today != today or state.covered != version:
+            state = await self._build(storage, user_id, today, version)
+        elif state.dirty:
+            try:
+                await self._refresh_dirty(storage, user_id, state)
+            except BaseException:
+                self._users.pop(user_id, None)
+                raise
+        state.version = version
+
+        self._users[user_id] = state
+        self._users.move_to_end(user_id)
+        while len(self._users) > self.max_users:
+            self._users.popitem(last=False)
+        return state
+
+    async def _build(self, storage: Storage, user_id: str, today: date, version: int) -> UserStreaks:
+        schedules = await storage.habit_schedules(user_id)
+        counts = _group_counts(await storage.completed_slot_counts(user_id))
+
+        state = UserStreaks(today=today, version=version, covered=version)
+        for s in schedules:
+            hid = str(s["habit_id"])
+            due = expand_due_days(
+                s["cadence"], s["dow_mask"], s["interval_days"],
+                s["start_date"] or s["created_on"], today,
+            )
+            h = HabitStreak(hid, s["n_slots"], due, np.zeros(due.size, dtype=bool))
+            h.apply_counts(*counts.get(hid, _EMPTY_COUNTS))
+            h.recount(today)
+            state.habits[hid] = h
+        state.recount_user()
+        return state
+
+    async def _refresh_dirty(self, storage: Storage, user_id: str, state: UserStreaks) -> None:
+        # Pop before awaiting: a mark_dirty() landing during the query re-adds its habit
+        while state.dirty:
+            hid, since = state.dirty.popitem()
+            rows = await storage.completed_slot_counts(user_id, UUID(hid), since)
+            h = state.habits[hid]
+            h.apply_counts(*_group_counts(rows).get(hid, _EMPTY_COUNTS), since=since)
+            h.recount(state.today)
+        state.recount_user()
+
+
+streak_cache = StreakCache()
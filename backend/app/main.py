@@ -1,87 +1,209 @@
 # app/main.py
+"""
+Application factory.
+
+Importing this module or calling create_app() does no I/O. The asyncpg pool,
+the LISTEN connections and the background tasks are created in the lifespan
+handler, i.e. per worker process after any fork, so the module can be
+preloaded by a preforking master (app.cli.serve).
+
+STORAGE_BACKEND=sqlite|memory runs the handlers on an embedded backend
+instead (app.core.storage): no pools, no LISTEN, no reminders, and one
+worker only, as events and caches stay in the process.
+
+    uvicorn app.main:app                                # one worker
+    uvicorn --factory app.main:create_app
+    python -m app.cli.serve --workers 4 --port 8000     # preforked workers
+
+/health answers 503 until the worker's startup has finished (and again while
+it shuts down), so load balancers and the launcher gate on readiness.
+"""
+import os
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
-from fastapi import FastAPI
+from typing import AsyncIterator
+
+from fastapi import FastAPI, Request
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-import asyncpg
 
+from app.core.auth import session_cache
+from app.core.cache import response_cache
 from app.core.config import settings
+from app.core.db import create_pool, create_replica_pools, create_transfer_pool
+from app.core.events import event_hub
+from app.core.google_auth import google_keys
+from app.core import metrics, partitions
+from app.core.profiles import profile_cache
+from app.core.reminders import reminder_scheduler
+from app.core.replicas import ReadYourWritesMiddleware, replica_set
+from app.core.storage import open_storage
+from app.core.storage.postgres import PostgresStorage
 from app.routers import auth as auth_router
+from app.routers import events as events_router
 from app.routers import habits as habits_router
-from app.routers import streaks as streaks_router  # 👈 add
-
-# Create FastAPI app
-app = FastAPI(
-    title="Habit Tracker API",
-    version="0.1.0",
-    docs_url="/docs",
-    redoc_url="/redoc",
-)
-
-# --- CORS (send cookies from the frontend) ---
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=[settings.FRONTEND_ORIGIN],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# --- DB: asyncpg pool on startup/shutdown ---
-@app.on_event("startup")
-async def startup_pool():
-    app.state.pool = await asyncpg.create_pool(dsn=settings.DATABASE_URL, min_size=1, max_size=5)
-    # DEBUG: list mounted routes so we can see duplicates/types
-    for r in app.router.routes:
-        try:
-            path = getattr(r, "path", "")
-            name = getattr(r, "name", "")
-            methods = getattr(r, "methods", set())
-            print(f"[ROUTE] {methods} {path} -> {name}")
-        except Exception:
-            pass
-
-
-@app.on_event("shutdown")
-async def shutdown_pool():
-    pool = getattr(app.state, "pool", None)
-    if pool:
-        await pool.close()
-
-# --- Routers (this brings in ALL your endpoints) ---
-# Auth:
-#   POST /auth/google
-#   GET  /me
-#   POST /logout
-app.include_router(auth_router.router, tags=["auth"])
-
-# Habits:
-#   GET  /api/checklist/today
-#   POST /api/habit_log
-#   POST /api/habits
-app.include_router(habits_router.router, prefix="/api", tags=["habits"])
-
-# Streaks:
-#   GET  /api/stats/daily_completion
-app.include_router(streaks_router.router, prefix="/api", tags=["streaks"])
-
-# --- Basic health check ---
-@app.get("/health", tags=["meta"])
-def health():
-    return {"ok": True, "time": datetime.now(timezone.utc).isoformat()}
-
-# Optional: a friendly root
-@app.get("/", tags=["meta"])
-def root():
-    return {
-        "name": "Habit Tracker API",
-        "docs": "/docs",
-        "auth_endpoints": ["/auth/google", "/me", "/logout"],
-        "habit_endpoints": [
-            "/api/checklist/today",
-            "/api/habit_log",
-            "/api/habits",
-        ],
-        "streak_endpoints": [
-            "/api/stats/daily_completion",
-        ],
-    }
+from app.routers import streaks as streaks_router
+from app.routers import transfer as transfer_router
+
+
+async def _ensure_partitions(pool) -> None:
+    try:
+        async with pool.acquire() as conn:
+            n = await partitions.ensure(conn, settings.HABIT_LOG_PARTITIONS_AHEAD)
+        if n:
+            print(f"[partitions] created {n} habit_log partition(s)")
+    except Exception as e:
+        print(f"[partitions] ensure failed: {e}")
+
+
+# --- Lifespan: one asyncpg pool (or embedded storage) per worker, shared by every router ---
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    app.state.ready = False
+    app.state.pool = app.state.transfer_pool = None
+    if settings.STORAGE_BACKEND == "postgres":
+        app.state.pool = await create_pool()
+        app.state.storage = PostgresStorage(app.state.pool)
+    else:
+        app.state.storage = await open_storage(settings.STORAGE_BACKEND, settings.STORAGE_URL)
+        # No NOTIFY: change events go straight to this worker's subscribers
+        app.state.storage.events = event_hub.publish
+    # Everything after the pool is inside the try: a failing startup step still
+    # stops what was started and closes the pools
+    try:
+        if app.state.pool is not None:
+            app.state.transfer_pool = await create_transfer_pool()
+            await replica_set.start(await create_replica_pools())
+            await _ensure_partitions(app.state.pool)
+            await event_hub.start()
+            if settings.REMINDERS_ENABLED:
+                await reminder_scheduler.start()
+        await google_keys.start()
+        app.state.ready = True
+        yield
+    finally:
+        app.state.ready = False
+        await google_keys.stop()
+        await event_hub.stop()
+        await reminder_scheduler.stop()
+        await replica_set.stop()
+        if app.state.transfer_pool is not None:
+            await app.state.transfer_pool.close()
+        await app.state.storage.close()
+        if app.state.pool is not None:
+            await app.state.pool.close()
+
+
+def create_app() -> FastAPI:
+    app = FastAPI(
+        title="Habit Tracker API",
+        version="0.1.0",
+        docs_url="/docs",
+        redoc_url="/redoc",
+        default_response_class=ORJSONResponse,
+        lifespan=lifespan,
+    )
+    app.state.ready = False
+
+    # --- CORS (send cookies from the frontend) ---
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=[settings.FRONTEND_ORIGIN],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # --- Metrics: per-route latency / status counts (served at /metrics) ---
+    # (the SSE stream is long-lived by design, so it is kept out of the latency histogram)
+    app.add_middleware(metrics.MetricsMiddleware, skip_paths=("/metrics", "/api/events"))
+
+    # --- Read replicas: hand writers their commit LSN (no-op without DATABASE_REPLICA_URLS) ---
+    app.add_middleware(ReadYourWritesMiddleware)
+
+    # --- Routers (this brings in ALL your endpoints) ---
+    # Auth:
+    #   POST /auth/google
+    #   GET  /me
+    #   POST /logout
+    app.include_router(auth_router.router, tags=["auth"])
+
+    # Habits:
+    #   GET  /api/checklist/today
+    #   GET  /api/checklist/range
+    #   POST /api/habit_log
+    #   POST /api/habit_log/batch
+    #   POST /api/habits
+    #   GET  /api/habits/{habit_id}/logs
+    app.include_router(habits_router.router, prefix="/api", tags=["habits"])
+
+    # Streaks:
+    #   GET  /api/stats/daily_completion
+    #   GET  /api/stats/streaks
+    #   GET  /api/stats/heatmap
+    app.include_router(streaks_router.router, prefix="/api", tags=["streaks"])
+
+    # Transfer:
+    #   POST /api/import
+    #   GET  /api/export
+    app.include_router(transfer_router.router, prefix="/api", tags=["transfer"])
+
+    # Events:
+    #   GET  /api/events   (SSE)
+    app.include_router(events_router.router, prefix="/api", tags=["events"])
+
+    # --- Basic health check / readiness ---
+    @app.get("/health", tags=["meta"])
+    def health(request: Request):
+        ready = request.app.state.ready
+        body = {
+            "ok": ready,
+            "ready": ready,
+            "pid": os.getpid(),
+            "time": datetime.now(timezone.utc).isoformat(),
+            "session_cache": session_cache.stats(),
+            "profile_cache": profile_cache.stats(),
+            "events": event_hub.stats(),
+            "reminders": reminder_scheduler.stats(),
+            "replicas": replica_set.stats(),
+            "response_cache": response_cache.stats(),
+            "storage": request.app.state.storage.stats() if hasattr(request.app.state, "storage") else None,
+        }
+        return ORJSONResponse(body, status_code=200 if ready else 503)
+
+    # --- Prometheus scrape endpoint (per worker) ---
+    @app.get("/metrics", tags=["meta"], response_class=PlainTextResponse)
+    def metrics_endpoint():
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+    # Optional: a friendly root
+    @app.get("/", tags=["meta"])
+    def root():
+        return {
+            "name": "Habit Tracker API",
+            "docs": "/docs",
+            "auth_endpoints": ["/auth/google", "/me", "/logout"],
+            "habit_endpoints": [
+                "/api/checklist/today",
+                "/api/checklist/range",
+                "/api/habit_log",
+                "/api/habit_log/batch",
+                "/api/habits",
+                "/api/habits/{habit_id}/logs",
+            ],
+            "transfer_endpoints": [
+                "/api/import",
+                "/api/export",
+            ],
+            "event_endpoints": ["/api/events"],
+            "streak_endpoints": [
+                "/api/stats/daily_completion",
+                "/api/stats/streaks",
+                "/api/stats/heatmap",
+            ],
+        }
+
+    return app
+
+
+app = create_app()
@@ -1,24 +1,28 @@
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import JSONResponse
-from google.oauth2 import id_token
-from google.auth.transport import requests as g_requests
 
-from app.core.config import settings
-from app.core.db import dbconn, dbput
+from app.core import repo
+from app.core.db import get_read_storage, get_storage
+from app.core.google_auth import JWKSUnavailable, verify_google_id_token
+from app.core.profiles import load_profile, profile_cache
+from app.core.storage import Storage
 from app.core.auth import create_jwt, set_session_cookie, clear_session_cookie, current_user_from_cookie
 from app.schemas import GoogleCredential
 
 router = APIRouter()
 
 @router.post("/auth/google")
-def auth_google(body: GoogleCredential):
+async def auth_google(body: GoogleCredential, storage: Storage = Depends(get_storage)):
     if not body.credential:
         raise HTTPException(status_code=400, detail="Missing credential")
 
     try:
-        idinfo = id_token.verify_oauth2_token(
-            body.credential, g_requests.Request(), settings.GOOGLE_CLIENT_ID
-        )
+        idinfo = await verify_google_id_token(body.credential)
+    except JWKSUnavailable as e:
+        # Our side (or Google's) is down, not the user's credential: let the client retry
+        print(f"[auth] {e}")
+        raise HTTPException(status_code=503, detail="Google sign-in is temporarily unavailable",
+                            headers={"Retry-After": "5"})
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid Google credential")
 
@@ -28,32 +32,10 @@ def auth_google(body: GoogleCredential):
     if not email:
         raise HTTPException(status_code=400, detail="Google token missing email")
 
-    conn = dbconn()
-    try:
-        with conn, conn.cursor() as cur:
-            cur.execute(
-                """
-                INSERT INTO public.app_user (email, "name", image_url)
-                VALUES (%s, %s, %s)
-                ON CONFLICT (email) DO UPDATE
-                   SET "name" = COALESCE(EXCLUDED."name", public.app_user."name"),
-                       image_url = COALESCE(EXCLUDED.image_url, public.app_user.image_url)
-                RETURNING id::text, email, "name", image_url, timezone, created_at
-                """,
-                (email, name, image_url),
-            )
-            row = cur.fetchone()
-    finally:
-        dbput(conn)
+    row = await storage.upsert_user(email, name, image_url)
 
-    user = {
-        "id": row[0],
-        "email": row[1],
-        "name": row[2],
-        "image_url": row[3],
-        "timezone": row[4],
-        "created_at": row[5].isoformat() if row[5] else None,
-    }
+    # Write-through: the next /me (and "today" lookups) on this worker see the fresh row
+    user = profile_cache.put(repo.user_to_dict(row))
 
     token = create_jwt(user["id"], user["email"])
     resp = JSONResponse({"user": user})
@@ -61,34 +43,13 @@ def auth_google(body: GoogleCredential):
     return resp
 
 @router.get("/me")
-def me(request: Request):
+async def me(request: Request, storage: Storage = Depends(get_read_storage)):
     cj = current_user_from_cookie(request)
     if not cj:
         return {"user": None}
 
-    conn = dbconn()
-    try:
-        with conn, conn.cursor() as cur:
-            cur.execute(
-                """SELECT id::text, email, "name", image_url, timezone, created_at
-                   FROM public.app_user WHERE id = %s::uuid""",
-                (cj["id"],),
-            )
-            row = cur.fetchone()
-    finally:
-        dbput(conn)
-
-    if not row:
-        return {"user": None}
-
-    user = {
-        "id": row[0],
-        "email": row[1],
-        "name": row[2],
-        "image_url": row[3],
-        "timezone": row[4],
-        "created_at": row[5].isoformat() if row[5] else None,
-    }
+    # Served from the profile cache; the user row is only read on a miss
+    user = await load_profile(storage, cj["id"])
     return {"user": user}
 
 @router.post("/logout")
@@ -0,0 +1,39 @@
+# app/routers/events.py
+import json
+
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+
+from app.core.auth import require_user
+from app.core.config import settings
+from app.core.events import event_hub
+
+router = APIRouter()
+
+
+@router.get("/events")
+async def events(request: Request, cj: dict = Depends(require_user)):
+    """
+    Server-Sent Events stream of the signed-in user's changes (see app.core.events
+    for the event types). Holds no DB connection, only an in-memory queue.
+    """
+    sub = event_hub.subscribe(cj["id"])
+
+    async def stream():
+        try:
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                event = await sub.get(settings.EVENTS_KEEPALIVE_S)
+                if event is None:
+                    # Comment line: keeps proxies from timing out an idle stream
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event, separators=(',', ':'))}\n\n"
+        finally:
+            sub.close()
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,134 +1,320 @@
 # app/routers/habits.py
-from datetime import date, datetime
+import base64
+import json
+from datetime import date, datetime, timedelta
+from typing import Literal
 from uuid import UUID
 
-from fastapi import APIRouter, HTTPException, Request, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 
-from app.core.db import dbconn, dbput
-from app.core.auth import current_user_from_cookie
-from app.schemas import HabitCreate, HabitLogCreate
+from app.core import repo
+from app.core.db import get_read_storage, get_storage
+from app.core.auth import require_user
+from app.core.cache import (
+    CHECKLIST_RANGE_SCOPE,
+    DAILY_COMPLETION_SCOPE,
+    HEATMAP_SCOPE,
+    checklist_scope,
+    response_cache,
+)
+from app.core.encoding import encode, encoded_response, negotiate
+from app.core.etag import etag_matches, make_etag, not_modified, set_etag
+from app.core.profiles import user_today
+from app.core.storage import Storage
+from app.core.streak_engine import streak_cache
+from app.schemas import HabitCreate, HabitLogBatch, HabitLogCreate
 
 router = APIRouter()
 
+MAX_RANGE_DAYS = 366
+MAX_LOGS_PAGE = 1000
+# Outermost days a filter may name; the first page's sentinel key sits one day beyond
+_FIRST_DAY = date.min + timedelta(days=1)
+_LAST_DAY = date.max - timedelta(days=1)
+
 @router.get("/checklist/today")
-def checklist_today(
+async def checklist_today(
     request: Request,
     day: date | None = Query(
         None,
-        description="Calendar day in user's local time (YYYY-MM-DD). Defaults to server 'today' if omitted."
+        description="Calendar day in user's local time (YYYY-MM-DD). Defaults to 'today' in the user's timezone."
     ),
+    storage: Storage = Depends(get_read_storage),
+    cj: dict = Depends(require_user),
 ):
     """
     Return the user's checklist for a specific calendar day.
     CRITICAL: LEFT JOIN to habit_log ON that day so completion is per-day.
     """
-    cj = current_user_from_cookie(request)
-    if not cj:
-        raise HTTPException(status_code=401, detail="Not signed in")
+    media_type = negotiate(request)
+    async with storage.session() as s:
+        target_day = day or await user_today(s, cj["id"])
+        scope = checklist_scope(target_day)
+        version = await s.data_version(cj["id"])
+        etag = make_etag(version, "checklist", target_day, media_type)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        # Keyed on the data version too, so writes from other workers / CLI imports can't be served stale
+        params = (version, media_type)
+        body, token = await response_cache.get(cj["id"], scope, params)
+        if body is None:
+            rows = await s.checklist(cj["id"], target_day)
+            body = encode([
+                {
+                    "habit_id": str(r["habit_id"]),
+                    "name": r["name"],
+                    "period": r["period"],
+                    "local_time": r["local_time"].strftime("%H:%M") if r["local_time"] else None,
+                    "completed": r["completed"],
+                }
+                for r in rows
+            ], media_type)
+            await response_cache.set(cj["id"], scope, params, body, token)
+
+    resp = encoded_response(body, media_type)
+    set_etag(resp, etag)
+    return resp
+
+
+@router.get("/checklist/range")
+async def checklist_range(
+    request: Request,
+    start: date = Query(..., description="First day (YYYY-MM-DD), inclusive"),
+    end: date = Query(..., description="Last day (YYYY-MM-DD), inclusive"),
+    storage: Storage = Depends(get_read_storage),
+    cj: dict = Depends(require_user),
+):
+    """
+    Checklist for a whole date range in one round trip (week / month views).
+    Columnar: each habit is listed once; each slot points at its habit by index
+    and carries `done`, a string with one '0'/'1' per day from `start`
+    (done[i] is start + i days).
+    """
+    if end < start:
+        raise HTTPException(status_code=422, detail="end must not be before start")
+    n_days = (end - start).days + 1
+    if n_days > MAX_RANGE_DAYS:
+        raise HTTPException(status_code=422, detail=f"Range is limited to {MAX_RANGE_DAYS} days")
+
+    media_type = negotiate(request)
+    async with storage.session() as s:
+        version = await s.data_version(cj["id"])
+        etag = make_etag(version, "checklist_range", start, end, media_type)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        params = (version, start, end, media_type)
+        body, token = await response_cache.get(cj["id"], CHECKLIST_RANGE_SCOPE, params)
+        if body is None:
+            rows = await s.checklist_range(cj["id"], start, end)
+            body = encode(_range_grid(rows, start, end, n_days), media_type)
+            await response_cache.set(cj["id"], CHECKLIST_RANGE_SCOPE, params, body, token)
+
+    resp = encoded_response(body, media_type)
+    set_etag(resp, etag)
+    return resp
+
+
+def _range_grid(rows, start: date, end: date, n_days: int) -> dict:
+    habits, index = [], {}
+    slots = []
+    for r in rows:
+        hid = str(r["habit_id"])
+        if hid not in index:
+            index[hid] = len(habits)
+            habits.append({"id": hid, "name": r["name"]})
+        done = ["0"] * n_days
+        for d in r["done_days"]:
+            done[(d - start).days] = "1"
+        slots.append({
+            "habit": index[hid],
+            "period": r["period"],
+            "local_time": r["local_time"].strftime("%H:%M") if r["local_time"] else None,
+            "done": "".join(done),
+        })
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "days": n_days,
+        "habits": habits,
+        "slots": slots,
+    }
+
+
+@router.get("/habits/{habit_id}/logs")
+async def habit_logs(
+    request: Request,
+    habit_id: UUID,
+    start: date | None = Query(None, description="First day (YYYY-MM-DD), inclusive"),
+    end: date | None = Query(None, description="Last day (YYYY-MM-DD), inclusive"),
+    limit: int = Query(100, ge=1, le=MAX_LOGS_PAGE),
+    order: Literal["desc", "asc"] = Query("desc", description="desc = newest first"),
+    cursor: str | None = Query(None, description="next_cursor from the previous page"),
+    storage: Storage = Depends(get_read_storage),
+    cj: dict = Depends(require_user),
+):
+    """
+    One habit's log history, a page at a time, ordered by (day, period).
+    Keyset pagination: `next_cursor` encodes the last key of the page and is
+    null on the last page. Pass it back with the same filters.
+    """
+    start = max(start or _FIRST_DAY, _FIRST_DAY)
+    end = min(end or _LAST_DAY, _LAST_DAY)
+    if end < start:
+        raise HTTPException(status_code=422, detail="end must not be before start")
+    descending = order == "desc"
+    if cursor:
+        after = _decode_cursor(cursor, order)
+    else:
+        after = (end + timedelta(days=1), "MORNING") if descending else (start - timedelta(days=1), "NIGHT")
+
+    media_type = negotiate(request)
+    async with storage.session() as s:
+        if not await s.owned_habit_ids(cj["id"], [habit_id]):
+            raise HTTPException(status_code=404, detail="Habit not found")
+        version = await s.data_version(cj["id"])
+        etag = make_etag(version, "habit_logs", habit_id, start, end, limit, order, cursor, media_type)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        # One extra row says whether there is a next page
+        rows = await s.habit_logs_page(habit_id, start, end, after, limit + 1, descending)
+
+    more = len(rows) > limit
+    rows = rows[:limit]
+    body = encode({
+        "habit_id": str(habit_id),
+        "logs": [
+            {
+                "period": r["period"],
+                "day": r["day"].isoformat(),
+                "completed": r["completed"],
+                "note": r["note"],
+                "created_at": r["created_at"].isoformat(),
+            }
+            for r in rows
+        ],
+        "next_cursor": _encode_cursor(order, rows[-1]["day"], rows[-1]["period"]) if more else None,
+    }, media_type)
+    resp = encoded_response(body, media_type)
+    set_etag(resp, etag)
+    return resp
+
 
-    target_day = day or date.today()
+def _encode_cursor(order: str, day: date, period: str) -> str:
+    raw = json.dumps([order, day.isoformat(), period], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
 
-    conn = dbconn()
+
+def _decode_cursor(cursor: str, order: str) -> tuple[date, str]:
     try:
-        with conn, conn.cursor() as cur:
-            cur.execute(
-                """
-                SELECT h.id AS habit_id,
-                       h.name,
-                       s.period,
-                       s.local_time,
-                       COALESCE(l.completed, false) AS completed
-                FROM public.habit h
-                JOIN public.habit_slot s
-                  ON s.habit_id = h.id
-                LEFT JOIN public.habit_log l
-                  ON l.habit_id = h.id
-                 AND l.period   = s.period
-                 AND l.day      = %s::date        -- <<< per-day join (uses ?day)
-                WHERE h.user_id = %s::uuid
-                  AND h.archived = FALSE
-                ORDER BY s.period, COALESCE(s.local_time, '23:59'::time), h.name
-                """,
-                (target_day.isoformat(), cj["id"]),
-            )
-            rows = cur.fetchall()
-    finally:
-        dbput(conn)
-
-    return [
-        {
-            "habit_id": str(r[0]),
-            "name": r[1],
-            "period": r[2],
-            "local_time": r[3].strftime("%H:%M") if r[3] else None,
-            "completed": r[4],
-        }
-        for r in rows
-    ]
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        c_order, day, period = json.loads(raw)
+        key = (date.fromisoformat(day), period)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if c_order != order or period not in ("MORNING", "AFTERNOON", "NIGHT"):
+        raise HTTPException(status_code=400, detail="Cursor does not match this query")
+    return key
 
 
 @router.post("/habit_log")
-def habit_log(request: Request, body: HabitLogCreate):
+async def habit_log(
+    body: HabitLogCreate,
+    storage: Storage = Depends(get_storage),
+    cj: dict = Depends(require_user),
+):
     """
     Upsert a completion for a habit on a given day/period.
     Enforces uniqueness on (habit_id, day, period) via DB constraint.
     """
-    cj = current_user_from_cookie(request)
-    if not cj:
-        raise HTTPException(status_code=401, detail="Not signed in")
-
     try:
         habit_uuid = UUID(str(body.habit_id))
     except Exception:
         raise HTTPException(status_code=422, detail="habit_id must be a valid UUID")
 
-    conn = dbconn()
-    try:
-        with conn, conn.cursor() as cur:
-            # Ensure the habit belongs to the signed-in user
-            cur.execute(
-                "SELECT 1 FROM public.habit WHERE id = %s::uuid AND user_id = %s::uuid",
-                (str(habit_uuid), cj["id"]),
-            )
-            if not cur.fetchone():
-                raise HTTPException(status_code=404, detail="Habit not found")
-
-            # UPSERT completion for that calendar day
-            cur.execute(
-                """
-                INSERT INTO public.habit_log (habit_id, period, day, completed, note)
-                VALUES (%s::uuid, %s::time_period, %s::date, %s::boolean, %s::text)
-                ON CONFLICT (habit_id, day, period)
-                DO UPDATE SET
-                  completed = EXCLUDED.completed,
-                  note      = COALESCE(EXCLUDED.note, public.habit_log.note)
-                RETURNING habit_id, period, day, completed, note, created_at
-                """,
-                (str(habit_uuid), body.period, body.day, body.completed, body.note),
-            )
-            r = cur.fetchone()
-    finally:
-        dbput(conn)
+    async with storage.session() as s:
+        # Ensure the habit belongs to the signed-in user
+        if not await s.owned_habit_ids(cj["id"], [habit_uuid]):
+            raise HTTPException(status_code=404, detail="Habit not found")
+
+        # UPSERT completion for that calendar day (+ daily rollup, data version and
+        # the habit_log event, one transaction)
+        rows, version = await s.record_logs(
+            cj["id"], [(habit_uuid, body.period, body.day, body.completed, body.note)], event=repo.log_event
+        )
+    r = rows[0]
+    streak_cache.mark_dirty(cj["id"], habit_uuid, body.day, version)
+    await response_cache.invalidate(
+        cj["id"], [checklist_scope(body.day), CHECKLIST_RANGE_SCOPE, DAILY_COMPLETION_SCOPE, HEATMAP_SCOPE]
+    )
+
+    return _log_to_dict(r)
+
+
+@router.post("/habit_log/batch")
+async def habit_log_batch(
+    body: HabitLogBatch,
+    storage: Storage = Depends(get_storage),
+    cj: dict = Depends(require_user),
+):
+    """
+    Upsert many completions at once (offline replay).
+    One ownership query for all habit ids + one bulk upsert; per-item results
+    are returned in request order. Later items win over earlier ones for the
+    same (habit_id, day, period).
+    """
+    # Last write wins for duplicate keys (ON CONFLICT can't touch a row twice per statement)
+    latest = {}
+    for it in body.items:
+        latest[(it.habit_id, it.day, it.period)] = it
 
+    async with storage.session() as s:
+        owned = await s.owned_habit_ids(cj["id"], list({it.habit_id for it in body.items}))
+        rows, version = await s.record_logs(
+            cj["id"],
+            [
+                (it.habit_id, it.period, it.day, it.completed, it.note)
+                for it in latest.values()
+                if it.habit_id in owned
+            ],
+            event=repo.log_event,
+        )
+
+    saved = {(r["habit_id"], r["day"], r["period"]): _log_to_dict(r) for r in rows}
+    results = []
+    for i, it in enumerate(body.items):
+        if it.habit_id not in owned:
+            results.append({"index": i, "status": 404, "detail": "Habit not found"})
+            continue
+        results.append({"index": i, "status": 200, "log": saved[(it.habit_id, it.day, it.period)]})
+        streak_cache.mark_dirty(cj["id"], it.habit_id, it.day, version)
+    if rows:
+        scopes = {checklist_scope(r["day"]) for r in rows}
+        scopes |= {CHECKLIST_RANGE_SCOPE, DAILY_COMPLETION_SCOPE, HEATMAP_SCOPE}
+        await response_cache.invalidate(cj["id"], scopes)
+
+    return {"results": results}
+
+
+def _log_to_dict(r) -> dict:
     return {
-        "habit_id": str(r[0]),
-        "period": r[1],
-        "day": r[2].isoformat(),
-        "completed": r[3],
-        "note": r[4],
-        "created_at": r[5].isoformat(),
+        "habit_id": str(r["habit_id"]),
+        "period": r["period"],
+        "day": r["day"].isoformat(),
+        "completed": r["completed"],
+        "note": r["note"],
+        "created_at": r["created_at"].isoformat(),
     }
 
 
 @router.post("/habits", status_code=201)
-def create_habit(request: Request, body: HabitCreate):
+async def create_habit(
+    body: HabitCreate,
+    storage: Storage = Depends(get_storage),
+    cj: dict = Depends(require_user),
+):
     """
     Create a habit for the current user and its slot for the chosen period/time.
     """
-    cj = current_user_from_cookie(request)
-    if not cj:
-        raise HTTPException(status_code=401, detail="Not signed in")
-
     lt = None
     if body.local_time:
         try:
@@ -136,32 +322,16 @@ def create_habit(request: Request, body: HabitCreate):
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid time format, expected HH:MM")
 
-    conn = dbconn()
-    try:
-        with conn, conn.cursor() as cur:
-            cur.execute(
-                """
-                INSERT INTO public.habit (user_id, name, archived)
-                VALUES (%s::uuid, %s, FALSE)
-                RETURNING id
-                """,
-                (cj["id"], body.name),
-            )
-            habit_id = cur.fetchone()[0]
-
-            cur.execute(
-                """
-                INSERT INTO public.habit_slot (habit_id, period, local_time)
-                VALUES (%s::uuid, %s::time_period, %s)
-                """,
-                (str(habit_id), body.period, lt),
-            )
-    finally:
-        dbput(conn)
+    fields = {"name": body.name, "period": body.period, "local_time": body.local_time}
 
-    return {
-        "id": str(habit_id),
-        "name": body.name,
-        "period": body.period,
-        "local_time": body.local_time,
-    }
+    def created(habit_id):
+        return {"type": "habit_created", "habit": {"id": str(habit_id), **fields}}
+
+    async with storage.session() as s:
+        # Habit + slot + rollup total + data version + habit_created event, one transaction
+        habit_id = await s.create_habit(cj["id"], body.name, body.period, lt, event=created)
+    habit = {"id": str(habit_id), **fields}
+    streak_cache.invalidate(cj["id"])
+    await response_cache.invalidate(cj["id"])
+
+    return habit
@@ -1,9 +1,18 @@
 # app/routers/streaks.py
-from datetime import date
+from datetime import date, timedelta
 from typing import List, Dict, Any, Optional
-from uuid import UUID
 
-from fastapi import APIRouter, Query, Request, HTTPException
+from fastapi import APIRouter, Depends, Query, Request, Response, HTTPException
+
+from app.core.auth import require_user
+from app.core import heatmap
+from app.core.cache import DAILY_COMPLETION_SCOPE, HEATMAP_SCOPE, response_cache
+from app.core.db import get_read_storage
+from app.core.encoding import encode, encoded_response, negotiate
+from app.core.etag import etag_matches, make_etag, not_modified, set_etag
+from app.core.profiles import user_today
+from app.core.storage import Row, Storage
+from app.core.streak_engine import streak_cache
 
 router = APIRouter()
 
@@ -11,135 +20,129 @@ router = APIRouter()
 async def stats_ping():
     return {"ok": True, "router": "streaks", "path": "/api/stats/ping"}
 
+def _fill_window(rows: List[Row], first_day: date, days: int) -> List[Dict[str, Any]]:
+    by_day = {r["day"]: r for r in rows}
+    # Seed the carried-forward total from the last row before the window
+    total = rows[0]["total"] if rows and rows[0]["day"] < first_day else 0
+
+    out: List[Dict[str, Any]] = []
+    for i in range(days):
+        d = first_day + timedelta(days=i)
+        r = by_day.get(d)
+        completed = 0
+        if r is not None:
+            completed, total = r["completed"], r["total"]
+        out.append({
+            "date": d.isoformat(),
+            "completed": completed,
+            "total": total,
+            "pct": completed / total if total > 0 else 0,
+        })
+    return out
+
 async def _compute_daily_completion(
     request: Request,
+    storage: Storage,
     user_id: str,
     days: int,
     end_day: Optional[date],
-) -> List[Dict[str, Any]]:
-    # Validate UUID explicitly
+) -> Response:
+    # On Postgres the window is read from habit_daily_rollup (maintained on write, see
+    # app.core.repo): O(days) precomputed rows instead of re-scanning habit_log per request.
+    media_type = negotiate(request)
     try:
-        uid = UUID(user_id)
-    except Exception:
-        raise HTTPException(status_code=422, detail="user_id must be a valid UUID")
+        async with storage.session() as s:
+            last_day = end_day or await user_today(s, user_id)
+            first_day = last_day - timedelta(days=days - 1)
+            version = await s.data_version(user_id)
+            etag = make_etag(version, "daily_completion", first_day, last_day, media_type)
+            if etag_matches(request, etag):
+                return not_modified(etag)
+            params = (version, first_day, last_day, media_type)
+            body, token = await response_cache.get(user_id, DAILY_COMPLETION_SCOPE, params)
+            if body is None:
+                rows = await s.daily_rollup(user_id, first_day, last_day)
+                body = encode(_fill_window(rows, first_day, days), media_type)
+                await response_cache.set(user_id, DAILY_COMPLETION_SCOPE, params, body, token)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to compute streaks: {e}")
 
-    pool = getattr(request.app.state, "pool", None)
-    if pool is None:
-        raise HTTPException(status_code=500, detail="DB pool not initialized")
-
-    # If no end_day provided, use CURRENT_DATE in SQL; else bind end_day
-    # We’ll keep two similar SQLs for clarity.
-    if end_day is None:
-        sql = """
-          WITH days AS (
-            SELECT generate_series(CURRENT_DATE - ($2::int - 1), CURRENT_DATE, INTERVAL '1 day')::date AS day
-          ),
-          slots AS (
-            SELECT s.habit_id, s.period
-            FROM public.habit h
-            JOIN public.habit_slot s ON s.habit_id = h.id
-            WHERE h.user_id = $1::uuid
-              AND h.archived = FALSE
-          ),
-          totals AS (
-            SELECT d.day, COUNT(*)::int AS total
-            FROM days d
-            LEFT JOIN LATERAL (SELECT 1 FROM slots) z ON TRUE
-            GROUP BY d.day
-          ),
-          completions AS (
-            SELECT l.day, COUNT(*)::int AS completed
-            FROM public.habit_log l
-            JOIN slots s
-              ON s.habit_id = l.habit_id
-             AND s.period    = l.period
-            WHERE l.day BETWEEN CURRENT_DATE - ($2::int - 1) AND CURRENT_DATE
-              AND l.completed = TRUE
-            GROUP BY l.day
-          )
-          SELECT
-            d.day::text                      AS date,
-            COALESCE(c.completed, 0)         AS completed,
-            COALESCE(t.total, 0)             AS total,
-            CASE WHEN COALESCE(t.total, 0) > 0
-                 THEN COALESCE(c.completed, 0)::float / t.total
-                 ELSE 0
-            END                              AS pct
-          FROM days d
-          LEFT JOIN totals t ON t.day = d.day
-          LEFT JOIN completions c ON c.day = d.day
-          ORDER BY d.day;
-        """
-        try:
-            async with pool.acquire() as conn:
-                rows = await conn.fetch(sql, str(uid), days)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to compute streaks: {e}")
-    else:
-        sql = """
-          WITH days AS (
-            SELECT generate_series($3::date - ($2::int - 1), $3::date, INTERVAL '1 day')::date AS day
-          ),
-          slots AS (
-            SELECT s.habit_id, s.period
-            FROM public.habit h
-            JOIN public.habit_slot s ON s.habit_id = h.id
-            WHERE h.user_id = $1::uuid
-              AND h.archived = FALSE
-          ),
-          totals AS (
-            SELECT d.day, COUNT(*)::int AS total
-            FROM days d
-            LEFT JOIN LATERAL (SELECT 1 FROM slots) z ON TRUE
-            GROUP BY d.day
-          ),
-          completions AS (
-            SELECT l.day, COUNT(*)::int AS completed
-            FROM public.habit_log l
-            JOIN slots s
-              ON s.habit_id = l.habit_id
-             AND s.period    = l.period
-            WHERE l.day BETWEEN ($3::date - ($2::int - 1)) AND $3::date
-              AND l.completed = TRUE
-            GROUP BY l.day
-          )
-          SELECT
-            d.day::text                      AS date,
-            COALESCE(c.completed, 0)         AS completed,
-            COALESCE(t.total, 0)             AS total,
-            CASE WHEN COALESCE(t.total, 0) > 0
-                 THEN COALESCE(c.completed, 0)::float / t.total
-                 ELSE 0
-            END                              AS pct
-          FROM days d
-          LEFT JOIN totals t ON t.day = d.day
-          LEFT JOIN completions c ON c.day = d.day
-          ORDER BY d.day;
-        """
-        try:
-            async with pool.acquire() as conn:
-                rows = await conn.fetch(sql, str(uid), days, end_day.isoformat())
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to compute streaks: {e}")
-
-    return [dict(r) for r in rows]
+    resp = encoded_response(body, media_type)
+    set_etag(resp, etag)
+    return resp
 
 # Keep your existing v2 path
 @router.get("/stats/daily_completion_v2")
 async def daily_completion_v2(
     request: Request,
-    user_id: str = Query(..., description="User ID (UUID as string)"),
     days: int = Query(21, ge=1, le=365, description="How many days back"),
     end_day: Optional[date] = Query(None, description="YYYY-MM-DD (optional end date)"),
+    storage: Storage = Depends(get_read_storage),
+    cj: dict = Depends(require_user),
 ) -> List[Dict[str, Any]]:
-    return await _compute_daily_completion(request, user_id, days, end_day)
+    return await _compute_daily_completion(request, storage, cj["id"], days, end_day)
 
 # Add a compatibility alias the frontend expects
 @router.get("/stats/daily_completion")
 async def daily_completion(
     request: Request,
-    user_id: str = Query(..., description="User ID (UUID as string)"),
     days: int = Query(21, ge=1, le=365, description="How many days back"),
     end_day: Optional[date] = Query(None, description="YYYY-MM-DD (optional end date)"),
+    storage: Storage = Depends(get_read_storage),
+    cj: dict = Depends(require_user),
 ) -> List[Dict[str, Any]]:
-    return await _compute_daily_completion(request, user_id, days, end_day)
+    return await _compute_daily_completion(request, storage, cj["id"], days, end_day)
+
+
+# Schedule-aware current/longest streaks for the signed-in user
+@router.get("/stats/streaks")
+async def streaks(
+    request: Request,
+    storage: Storage = Depends(get_read_storage),
+    cj: dict = Depends(require_user),
+) -> Dict[str, Any]:
+    media_type = negotiate(request)
+    async with storage.session() as s:
+        today = await user_today(s, cj["id"])
+        version = await s.data_version(cj["id"])
+        etag = make_etag(version, "streaks", today, media_type)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        state = await streak_cache.get(s, cj["id"], today, version)
+    resp = encoded_response(encode(state.as_dict(), media_type), media_type)
+    set_etag(resp, etag)
+    return resp
+
+
+# Year heatmap from the packed per-slot completion bitmaps
+@router.get("/stats/heatmap")
+async def stats_heatmap(
+    request: Request,
+    year: Optional[int] = Query(None, ge=1970, le=2100, description="Calendar year (defaults to the user's current year)"),
+    storage: Storage = Depends(get_read_storage),
+    cj: dict = Depends(require_user),
+):
+    """
+    Per-slot bitmaps (base64, 46 bytes, bit i = day-of-year i + 1, LSB first)
+    plus per-day completed / due counts and rates across all active habits.
+    """
+    media_type = negotiate(request)
+    async with storage.session() as s:
+        today = await user_today(s, cj["id"])
+        year = year or today.year
+        version = await s.data_version(cj["id"])
+        etag = make_etag(version, "heatmap", year, today, media_type)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        params = (version, year, today, media_type)
+        body, token = await response_cache.get(cj["id"], HEATMAP_SCOPE, params)
+        if body is None:
+            rows = await s.heatmap(cj["id"], year)
+            body = encode(heatmap.build(rows, year, today), media_type)
+            await response_cache.set(cj["id"], HEATMAP_SCOPE, params, body, token)
+
+    resp = encoded_response(body, media_type)
+    set_etag(resp, etag)
+    return resp
@@ -0,0 +1,162 @@
+# app/routers/transfer.py
+import csv
+import json
+import zlib
+from datetime import date, datetime, time
+from typing import Optional
+
+import asyncpg
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+from app.core import queries as q
+from app.core import repo
+from app.core.auth import require_user
+from app.core.cache import response_cache
+from app.core.db import get_read_storage, get_transfer_pool, mark_write
+from app.core.encoding import accepts_gzip
+from app.core.events import RESYNC
+from app.core.importer import HistoryImporter, iter_lines, iter_records
+from app.core.profiles import user_today
+from app.core.storage import Storage
+from app.core.streak_engine import streak_cache
+
+router = APIRouter()
+
+# ──────────────────────────
+# Import
+# ──────────────────────────
+@router.post("/import")
+async def import_history(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="Body format: ndjson or csv"),
+    pool: asyncpg.Pool = Depends(get_transfer_pool),
+    cj: dict = Depends(require_user),
+):
+    """
+    Stream habits, slots and habit_log history into the user's account.
+    The body is parsed line by line and staged with COPY, so its size is not
+    bounded by memory. The whole import is one transaction.
+    See app.core.importer for the record format.
+    """
+    # A large import holds its connection for minutes: it comes from the small
+    # transfer pool, never the request pool. Progress shows in /metrics.
+    async with pool.acquire() as conn:
+        try:
+            async with conn.transaction():
+                imp = HistoryImporter(conn, cj["id"])
+                await imp.start()
+                async for rec in iter_records(iter_lines(request.stream()), format):
+                    await imp.add(rec)
+                summary = await imp.finish()
+                await repo.notify_event(conn, cj["id"], RESYNC)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        # Commit LSN for the read-your-writes cookie
+        mark_write(conn)
+
+    streak_cache.invalidate(cj["id"])
+    await response_cache.invalidate(cj["id"])
+    return summary
+
+
+# ──────────────────────────
+# Export
+# ──────────────────────────
+EXPORT_CSV_COLUMNS = [
+    "type", "ref", "habit", "name", "archived", "created_at",
+    "period", "local_time", "notify", "day", "completed", "note",
+]
+_FLUSH_BYTES = 64 * 1024
+
+
+def _export_value(v):
+    if isinstance(v, (date, datetime)):
+        return v.isoformat()
+    if isinstance(v, time):
+        return v.strftime("%H:%M")
+    return v
+
+
+class _CsvLine:
+    """csv.writer target that hands back the last written line."""
+    def __init__(self):
+        self.value = ""
+
+    def write(self, s):
+        self.value = s
+
+
+async def _export_records(pool: asyncpg.Pool, user_id: str, since: Optional[date]):
+    """
+    (type, row-dict) for every habit, slot and log, read through server-side cursors.
+    """
+    async with pool.acquire() as conn, conn.transaction(readonly=True):
+        for kind, query, args in (
+            ("habit", q.EXPORT_HABITS, (user_id,)),
+            ("slot", q.EXPORT_SLOTS, (user_id,)),
+            ("log", q.EXPORT_LOGS, (user_id, since)),
+        ):
+            async for r in q.cursor(conn, query, *args, prefetch=2000):
+                yield kind, {k: _export_value(v) for k, v in r.items()}
+
+
+async def _export_stream(records, fmt: str, compress: bool):
+    gz = zlib.compressobj(wbits=31) if compress else None   # 31 = gzip container
+    buf = []
+    size = 0
+
+    if fmt == "csv":
+        line = _CsvLine()
+        writer = csv.DictWriter(line, fieldnames=EXPORT_CSV_COLUMNS, lineterminator="\n")
+        writer.writeheader()
+        buf.append(line.value)
+
+    async for kind, row in records:
+        if fmt == "csv":
+            writer.writerow({"type": kind, **row})
+            text = line.value
+        else:
+            text = json.dumps({"type": kind, **row}, separators=(",", ":")) + "\n"
+        buf.append(text)
+        size += len(text)
+        if size >= _FLUSH_BYTES:
+            chunk = "".join(buf).encode()
+            buf, size = [], 0
+            yield gz.compress(chunk) if gz else chunk
+
+    chunk = "".join(buf).encode()
+    if gz:
+        yield gz.compress(chunk) + gz.flush()
+    elif chunk:
+        yield chunk
+
+
+@router.get("/export")
+async def export_history(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="ndjson or csv"),
+    since: Optional[date] = Query(None, description="Only habit_log rows on/after this day (YYYY-MM-DD)"),
+    pool: asyncpg.Pool = Depends(get_transfer_pool),
+    storage: Storage = Depends(get_read_storage),
+    cj: dict = Depends(require_user),
+):
+    """
+    Stream the user's habits, slots and habit_log rows in the /api/import format.
+    Constant memory: rows come from server-side cursors and leave in ~64 KB chunks,
+    gzip-compressed on the fly when the client accepts it. The connection is held
+    for the whole download, so it comes from the transfer pool: a slow client
+    never ties up a request-pool connection.
+    """
+    compress = accepts_gzip(request)
+    stamp = (await user_today(storage, cj["id"])).strftime("%Y%m%d")
+    headers = {"Content-Disposition": f'attachment; filename="habits-{stamp}.{format}"'}
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+
+    return StreamingResponse(
+        _export_stream(_export_records(pool, cj["id"], since), format, compress),
+        media_type="text/csv" if format == "csv" else "application/x-ndjson",
+        headers=headers,
+    )
@@ -1,8 +1,8 @@
 # app/schemas.py
 from datetime import date
-from typing import Optional, Literal
+from typing import List, Optional, Literal
 from uuid import UUID
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 TimePeriod = Literal["MORNING", "AFTERNOON", "NIGHT"]
 
@@ -20,3 +20,7 @@ class HabitLogCreate(BaseModel):
     day: date
     completed: bool = True
     note: Optional[str] = None   # ✅ add this
+
+class HabitLogBatch(BaseModel):
+    # Offline clients replay queued ticks in one request
+    items: List[HabitLogCreate] = Field(..., min_length=1, max_length=500)
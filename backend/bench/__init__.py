@@ -0,0 +1,10 @@
+"""
+Load benchmarks for the Habit Tracker API.
+
+    python -m bench.seed --users 200 --habits 6 --years 2      # fill a local Postgres
+    python -m bench.load --duration 30 --concurrency 32 --out runs/base.json
+    python -m bench.compare runs/base.json runs/new.json
+    python -m bench.encoding                                    # payload encode time / size
+    python -m bench.startup --boot --workers 4                  # import / per-worker boot time
+    python -m bench.storage --users 50 --days 365               # storage backends: results + latency
+"""
@@ -0,0 +1,47 @@
+# bench/compare.py
+"""
+Compare two bench.load result files endpoint by endpoint.
+
+    python -m bench.compare runs/base.json runs/new.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+from typing import Optional
+
+METRICS = ("rps", "p50_ms", "p95_ms", "p99_ms", "pool_wait_mean_ms")
+
+
+def _delta(old: Optional[float], new: Optional[float]) -> str:
+    if old is None or new is None:
+        return "      -"
+    if old == 0:
+        return "      ∞" if new else "   0.0%"
+    return f"{(new - old) / old * 100:+6.1f}%"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare two benchmark runs")
+    parser.add_argument("base")
+    parser.add_argument("new")
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)["endpoints"]
+    with open(args.new) as f:
+        new = json.load(f)["endpoints"]
+
+    print(f"{'endpoint':<18}" + "".join(f"{m:>20}" for m in METRICS))
+    for name in sorted(set(base) | set(new)):
+        b, n = base.get(name, {}), new.get(name, {})
+        cells = []
+        for m in METRICS:
+            bv, nv = b.get(m), n.get(m)
+            shown = "-" if nv is None else f"{nv:.1f}"
+            cells.append(f"{shown:>11} {_delta(bv, nv)}")
+        print(f"{name:<18}" + "".join(f"{c:>20}" for c in cells))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# bench/encoding.py
+"""
+Encode-time and size comparison for the read payloads (no database needed).
+
+    python -m bench.encoding --repeat 2000
+
+Rows: FastAPI's old path (jsonable_encoder + json.dumps), orjson, columnar
+orjson and columnar MessagePack, each also gzip-compressed for the wire size.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+import zlib
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List
+
+from fastapi.encoders import jsonable_encoder
+
+from app.core.encoding import COLUMNAR, JSON, MSGPACK, encode, supported
+
+
+def daily_completion_payload(days: int, rng: random.Random) -> List[Dict[str, Any]]:
+    start = date.today() - timedelta(days=days - 1)
+    out = []
+    for i in range(days):
+        total = 6
+        completed = rng.randint(0, total)
+        out.append({
+            "date": (start + timedelta(days=i)).isoformat(),
+            "completed": completed,
+            "total": total,
+            "pct": completed / total,
+        })
+    return out
+
+
+def checklist_payload(slots: int, rng: random.Random) -> List[Dict[str, Any]]:
+    return [
+        {
+            "habit_id": f"{rng.getrandbits(128):032x}",
+            "name": f"habit {i}",
+            "period": rng.choice(("MORNING", "AFTERNOON", "NIGHT")),
+            "local_time": f"{rng.randint(5, 22):02d}:00",
+            "completed": rng.random() < 0.6,
+        }
+        for i in range(slots)
+    ]
+
+
+def _stdlib(payload: Any) -> bytes:
+    return json.dumps(jsonable_encoder(payload)).encode()
+
+
+def _time(fn: Callable[[], bytes], repeat: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat * 1e6
+
+
+def run(repeat: int) -> Dict[str, Dict[str, Dict[str, float]]]:
+    rng = random.Random(1)
+    payloads = {
+        "daily_completion_365": daily_completion_payload(365, rng),
+        "daily_completion_21": daily_completion_payload(21, rng),
+        "checklist_12": checklist_payload(12, rng),
+    }
+    encoders: Dict[str, Callable[[Any], bytes]] = {
+        "stdlib json": _stdlib,
+        "orjson": lambda p: encode(p, JSON),
+        "columnar orjson": lambda p: encode(p, COLUMNAR),
+    }
+    if MSGPACK in supported():
+        encoders["columnar msgpack"] = lambda p: encode(p, MSGPACK)
+
+    results: Dict[str, Dict[str, Dict[str, float]]] = {}
+    for name, payload in payloads.items():
+        results[name] = {}
+        for enc_name, enc in encoders.items():
+            body = enc(payload)
+            results[name][enc_name] = {
+                "us_per_op": _time(lambda: enc(payload), repeat),
+                "bytes": len(body),
+                "gzip_bytes": len(zlib.compress(body, 6)),
+            }
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark response encodings")
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    for payload, rows in run(args.repeat).items():
+        print(f"\n{payload}")
+        print(f"  {'encoding':<20}{'us/op':>10}{'bytes':>10}{'gzip':>10}")
+        for enc_name, r in rows.items():
+            print(f"  {enc_name:<20}{r['us_per_op']:>10.1f}{r['bytes']:>10}{r['gzip_bytes']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+# bench/load.py
+"""
+Drive a realistic request mix against the API and report per-endpoint
+throughput, latency percentiles and (in-process only) pool acquire wait.
+
+    # in-process (ASGI transport, same event loop; measures pool wait)
+    python -m bench.load --duration 30 --concurrency 32 --out runs/base.json
+
+    # against a running server, e.g. uvicorn app.main:app --workers 4
+    python -m bench.load --base-url http://127.0.0.1:8000 --duration 30
+
+Sessions are minted with the app's own JWT secret for users already in
+DATABASE_URL (see bench.seed), so both sides must share the same settings.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextvars
+import json
+import platform
+import random
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import asyncpg
+import httpx
+
+from app.core.auth import create_jwt
+from app.core.config import settings
+
+# endpoint -> relative weight (roughly what the React client does per session)
+DEFAULT_MIX = {
+    "checklist": 40,
+    "habit_log": 25,
+    "daily_completion": 18,
+    "me": 15,
+    "habits": 2,
+}
+
+_endpoint: contextvars.ContextVar[str] = contextvars.ContextVar("bench_endpoint", default="?")
+
+
+# ──────────────────────────
+# Recording
+# ──────────────────────────
+@dataclass
+class Samples:
+    latencies: List[float] = field(default_factory=list)
+    pool_waits: List[float] = field(default_factory=list)
+    statuses: Dict[int, int] = field(default_factory=lambda: defaultdict(int))
+    errors: int = 0
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    idx = min(int(round(q / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[idx]
+
+
+def summarize(samples: Dict[str, Samples], elapsed: float) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    for name, s in sorted(samples.items()):
+        ms = [v * 1000 for v in s.latencies]
+        waits = [v * 1000 for v in s.pool_waits]
+        out[name] = {
+            "requests": len(ms),
+            "errors": s.errors,
+            "statuses": dict(s.statuses),
+            "rps": len(ms) / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(ms, 50),
+            "p95_ms": percentile(ms, 95),
+            "p99_ms": percentile(ms, 99),
+            "mean_ms": sum(ms) / len(ms) if ms else None,
+            "pool_wait_mean_ms": sum(waits) / len(waits) if waits else None,
+            "pool_wait_p99_ms": percentile(waits, 99),
+        }
+    return out
+
+
+# ──────────────────────────
+# Pool wait probe (in-process only)
+# ──────────────────────────
+class _TimedAcquire:
+    def __init__(self, ctx, samples: Dict[str, Samples]):
+        self._ctx = ctx
+        self._samples = samples
+
+    async def __aenter__(self):
+        t0 = time.perf_counter()
+        conn = await self._ctx.__aenter__()
+        self._samples[_endpoint.get()].pool_waits.append(time.perf_counter() - t0)
+        return conn
+
+    async def __aexit__(self, *exc):
+        return await self._ctx.__aexit__(*exc)
+
+
+class TimedPool:
+    """
+    Wraps app.state.pool so every acquire() is attributed to the calling endpoint.
+    httpx's ASGI transport runs the app in the caller's task, so the contextvar holds.
+    """
+
+    def __init__(self, pool: asyncpg.Pool, samples: Dict[str, Samples]):
+        self._pool = pool
+        self._samples = samples
+
+    def acquire(self, *args, **kwargs):
+        return _TimedAcquire(self._pool.acquire(*args, **kwargs), self._samples)
+
+    def __getattr__(self, name):
+        return getattr(self._pool, name)
+
+
+# ──────────────────────────
+# Workload
+# ──────────────────────────
+@dataclass
+class BenchUser:
+    id: str
+    cookie: str
+    slots: List[Tuple[str, str]]      # (habit_id, period)
+
+
+async def load_users(dsn: str, limit: int) -> List[BenchUser]:
+    conn = await asyncpg.connect(dsn)
+    try:
+        rows = await conn.fetch(
+            """
+            SELECT u.id::text AS id, u.email,
+                   array_agg(s.habit_id::text) AS habit_ids,
+                   array_agg(s.period::text)   AS periods
+            FROM public.app_user u
+            JOIN public.habit h ON h.user_id = u.id AND NOT h.archived
+            JOIN public.habit_slot s ON s.habit_id = h.id
+            GROUP BY u.id
+            ORDER BY u.id
+            LIMIT $1
+            """,
+            limit,
+        )
+    finally:
+        await conn.close()
+    return [
+        BenchUser(r["id"], create_jwt(r["id"], r["email"]), list(zip(r["habit_ids"], r["periods"])))
+        for r in rows
+    ]
+
+
+def build_request(name: str, user: BenchUser, rng: random.Random) -> Tuple[str, str, Dict[str, Any]]:
+    today = date.today()
+    if name == "checklist":
+        day = today - timedelta(days=rng.choice((0, 0, 0, 1, 2)))
+        return "GET", "/api/checklist/today", {"params": {"day": day.isoformat()}}
+    if name == "habit_log":
+        habit_id, period = rng.choice(user.slots)
+        day = today - timedelta(days=rng.randint(0, 6))
+        body = {"habit_id": habit_id, "period": period, "day": day.isoformat(), "completed": rng.random() < 0.8}
+        return "POST", "/api/habit_log", {"json": body}
+    if name == "daily_completion":
+        days = rng.choice((7, 21, 21, 30, 90, 365))
+        return "GET", "/api/stats/daily_completion", {"params": {"user_id": user.id, "days": days}}
+    if name == "me":
+        return "GET", "/me", {}
+    if name == "habits":
+        body = {"name": f"bench {rng.randint(0, 1 << 30)}", "period": rng.choice(("MORNING", "AFTERNOON", "NIGHT"))}
+        return "POST", "/api/habits", {"json": body}
+    raise ValueError(f"unknown endpoint {name}")
+
+
+async def worker(
+    client: httpx.AsyncClient,
+    users: List[BenchUser],
+    mix: Dict[str, int],
+    deadline: float,
+    samples: Dict[str, Samples],
+    rng: random.Random,
+) -> None:
+    names, weights = zip(*mix.items())
+    while time.perf_counter() < deadline:
+        user = rng.choice(users)
+        name = rng.choices(names, weights)[0]
+        method, path, kwargs = build_request(name, user, rng)
+        _endpoint.set(name)
+        t0 = time.perf_counter()
+        try:
+            resp = await client.request(method, path, cookies={settings.COOKIE_NAME: user.cookie}, **kwargs)
+            samples[name].statuses[resp.status_code] += 1
+            if resp.status_code >= 500:
+                samples[name].errors += 1
+        except Exception:
+            samples[name].errors += 1
+        samples[name].latencies.append(time.perf_counter() - t0)
+
+
+async def run(
+    base_url: Optional[str],
+    duration: float,
+    concurrency: int,
+    n_users: int,
+    mix: Dict[str, int],
+    seed: int,
+) -> Dict[str, Any]:
+    users = await load_users(settings.DATABASE_URL, n_users)
+    if not users:
+        raise SystemExit("No users with habits in DATABASE_URL; run python -m bench.seed first")
+
+    samples: Dict[str, Samples] = defaultdict(Samples)
+    app = None
+    if base_url:
+        client = httpx.AsyncClient(base_url=base_url, timeout=30)
+    else:
+        from app.main import app
+
+        await app.router.startup()
+        app.state.pool = TimedPool(app.state.pool, samples)
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=30)
+
+    try:
+        start = time.perf_counter()
+        deadline = start + duration
+        await asyncio.gather(*(
+            worker(client, users, mix, deadline, samples, random.Random(seed + i))
+            for i in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - start
+    finally:
+        await client.aclose()
+        if app is not None:
+            app.state.pool = app.state.pool._pool
+            await app.router.shutdown()
+
+    return {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "mode": "http" if base_url else "in-process",
+            "base_url": base_url,
+            "duration_s": elapsed,
+            "concurrency": concurrency,
+            "users": len(users),
+            "mix": mix,
+            "seed": seed,
+            "python": platform.python_version(),
+        },
+        "endpoints": summarize(samples, elapsed),
+    }
+
+
+def print_table(result: Dict[str, Any]) -> None:
+    def fmt(v: Optional[float]) -> str:
+        return "-" if v is None else f"{v:8.2f}"
+
+    print(f"{'endpoint':<18}{'req':>8}{'err':>6}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'pool_wait':>11}")
+    for name, s in result["endpoints"].items():
+        print(
+            f"{name:<18}{s['requests']:>8}{s['errors']:>6}{s['rps']:>9.1f}"
+            f"{fmt(s['p50_ms'])}{fmt(s['p95_ms'])}{fmt(s['p99_ms'])}{fmt(s['pool_wait_mean_ms']):>11}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the API load benchmark")
+    parser.add_argument("--base-url", default=None, help="Target a running server instead of the in-process app")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--users", type=int, default=100, help="distinct seeded users to impersonate")
+    parser.add_argument("--mix", default=None, help='JSON weights, e.g. \'{"checklist": 1}\'')
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default=None, help="Write results JSON here")
+    args = parser.parse_args()
+
+    mix = json.loads(args.mix) if args.mix else DEFAULT_MIX
+    result = asyncio.run(run(args.base_url, args.duration, args.concurrency, args.users, mix, args.seed))
+    print_table(result)
+    if args.out:
+        out = Path(args.out)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        out.write_text(json.dumps(result, indent=2))
+        print(f"[bench] wrote {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# bench/seed.py
+"""
+Recreate a local benchmark database from DB/schema.txt (+ DB/migrations) and
+fill it with synthetic users, habits, slots and years of habit_log history.
+
+    python -m bench.seed --dsn postgresql://localhost/habits_bench --users 200 --years 2
+
+Rows are streamed with COPY (copy_records_to_table) in batches, so multi-year
+histories for hundreds of users load in seconds with bounded memory.
+THIS DROPS THE TARGET DATABASE'S public SCHEMA.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import uuid
+from datetime import date, datetime, time, timedelta, timezone
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+import asyncpg
+
+from app.cli.backfill_rollup import backfill
+
+DB_DIR = Path(__file__).resolve().parents[2] / "DB"
+PERIODS = ("MORNING", "AFTERNOON", "NIGHT")
+BATCH = 50_000
+
+
+async def apply_schema(conn: asyncpg.Connection) -> None:
+    await conn.execute("DROP SCHEMA IF EXISTS public CASCADE")
+    schema = (DB_DIR / "schema.txt").read_text()
+    # The dump's trailing pgcrypto wrappers need the extension's C library;
+    # gen_random_uuid() is built in since PG13, so only keep the type/table DDL
+    schema = schema.split("-- DROP FUNCTION", 1)[0]
+    await conn.execute(schema)
+    for migration in sorted((DB_DIR / "migrations").glob("*.sql")):
+        await conn.execute(migration.read_text())
+
+
+def _batched(rows: Iterator[tuple], size: int = BATCH) -> Iterator[List[tuple]]:
+    batch: List[tuple] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def _copy(conn: asyncpg.Connection, table: str, columns: Tuple[str, ...], rows: Iterator[tuple]) -> int:
+    n = 0
+    for batch in _batched(rows):
+        await conn.copy_records_to_table(table, schema_name="public", columns=columns, records=batch)
+        n += len(batch)
+    return n
+
+
+async def seed(
+    dsn: str,
+    users: int,
+    habits: int,
+    max_slots: int,
+    years: float,
+    completion: float,
+    rng_seed: int,
+) -> dict:
+    rng = random.Random(rng_seed)
+    today = date.today()
+    history_days = int(years * 365)
+    first_day = today - timedelta(days=history_days - 1)
+    created_at = datetime.combine(first_day, time(0), tzinfo=timezone.utc)
+
+    user_rows = [(uuid.uuid4(), f"bench{i}@example.com", f"Bench User {i}", "America/Chicago", created_at)
+                 for i in range(users)]
+    habit_rows = []
+    slot_rows = []
+    for (uid, *_rest) in user_rows:
+        for j in range(habits):
+            hid = uuid.uuid4()
+            habit_rows.append((hid, uid, f"Habit {j}", False, created_at))
+            for period in rng.sample(PERIODS, rng.randint(1, max_slots)):
+                slot_rows.append((uuid.uuid4(), hid, period, time(rng.randint(6, 22), 0), rng.random() < 0.3))
+
+    def log_rows() -> Iterator[tuple]:
+        for (_sid, hid, period, _lt, _notify) in slot_rows:
+            # Per-slot adherence so streak lengths vary realistically
+            p = min(max(rng.gauss(completion, 0.15), 0.05), 0.99)
+            for d in range(history_days):
+                if rng.random() < p:
+                    yield (uuid.uuid4(), hid, period, first_day + timedelta(days=d), True)
+
+    conn = await asyncpg.connect(dsn)
+    try:
+        await apply_schema(conn)
+        counts = {
+            "app_user": await _copy(conn, "app_user", ("id", "email", "name", "timezone", "created_at"), iter(user_rows)),
+            "habit": await _copy(conn, "habit", ("id", "user_id", "name", "archived", "created_at"), iter(habit_rows)),
+            "habit_slot": await _copy(conn, "habit_slot", ("id", "habit_id", "period", "local_time", "notify"), iter(slot_rows)),
+            "habit_log": await _copy(conn, "habit_log", ("id", "habit_id", "period", "day", "completed"), log_rows()),
+        }
+        await conn.execute("ANALYZE")
+    finally:
+        await conn.close()
+
+    await backfill(dsn)
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Seed a benchmark database")
+    parser.add_argument("--dsn", required=True)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--habits", type=int, default=5, help="habits per user")
+    parser.add_argument("--slots", type=int, default=2, choices=(1, 2, 3), help="max slots per habit")
+    parser.add_argument("--years", type=float, default=1.0, help="years of habit_log history")
+    parser.add_argument("--completion", type=float, default=0.7, help="mean completion rate")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    counts = asyncio.run(seed(
+        args.dsn, args.users, args.habits, args.slots, args.years, args.completion, args.seed,
+    ))
+    for table, n in counts.items():
+        print(f"[seed] {table}: {n} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# bench/startup.py
+"""
+Worker startup time: import cost of app.main and boot time per worker.
+
+    python -m bench.startup --repeat 5                        # import time only (no database)
+    python -m bench.startup --boot --workers 4 --port 8765    # + launcher boot, needs Postgres
+
+Import: `import app.main` in a fresh interpreter, median of --repeat runs,
+plus the slowest direct imports of app.main from `python -X importtime`.
+Boot: runs app.cli.serve with and without --preload and reports, per worker,
+the time from fork to "lifespan finished" and the import time it paid.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+
+_IMPORT_SNIPPET = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+_IMPORTTIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)$")
+_WORKER = re.compile(r"\[serve\] worker pid=(\d+) import_ms=([\d.]+) boot_ms=([\d.]+)")
+_READY = re.compile(r"\[serve\] \S.* workers=(\d+) preload_ms=([\d.]+) total_ms=([\d.]+)")
+
+
+def import_times(repeat: int) -> List[float]:
+    out = []
+    for _ in range(repeat):
+        res = subprocess.run([sys.executable, "-c", _IMPORT_SNIPPET], capture_output=True, text=True, check=True)
+        out.append(float(res.stdout.strip().splitlines()[-1]) * 1000)
+    return out
+
+
+def slowest_imports(top: int) -> List[Tuple[str, float]]:
+    """
+    Modules imported directly by app.main, by cumulative import time (ms).
+    """
+    res = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"],
+                         capture_output=True, text=True, check=True)
+    rows = [m for m in map(_IMPORTTIME.match, res.stderr.splitlines()) if m]
+    if not rows:
+        return []
+    # Children are listed before their parent, one indent level deeper
+    main = next(m for m in rows if m.group(4) == "app.main")
+    depth = len(main.group(3)) + 2
+    children, i = [], rows.index(main) - 1
+    while i >= 0 and len(rows[i].group(3)) >= depth:
+        if len(rows[i].group(3)) == depth:
+            children.append((rows[i].group(4), int(rows[i].group(2)) / 1000))
+        i -= 1
+    return sorted(children, key=lambda r: -r[1])[:top]
+
+
+def boot(workers: int, port: int, preload: bool, timeout: float) -> Dict[str, Any]:
+    cmd = [sys.executable, "-m", "app.cli.serve", "--workers", str(workers), "--port", str(port)]
+    if not preload:
+        cmd.append("--no-preload")
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True, env=os.environ.copy())
+    result: Dict[str, Any] = {"workers": []}
+    deadline = time.monotonic() + timeout
+    try:
+        for line in proc.stdout:
+            if m := _WORKER.search(line):
+                result["workers"].append({"pid": int(m.group(1)), "import_ms": float(m.group(2)),
+                                          "boot_ms": float(m.group(3))})
+            elif m := _READY.search(line):
+                result.update(preload_ms=float(m.group(2)), total_ms=float(m.group(3)))
+                break
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"launcher not ready after {timeout:.0f}s")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark import and worker boot time")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--boot", action="store_true", help="Also time app.cli.serve (needs the database)")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    times = import_times(args.repeat)
+    print(f"import app.main: median {statistics.median(times):.1f} ms "
+          f"(min {min(times):.1f}, max {max(times):.1f}, n={len(times)})")
+    print(f"\n  {'module':<28}{'cumulative ms':>14}")
+    for name, ms in slowest_imports(args.top):
+        print(f"  {name:<28}{ms:>14.1f}")
+
+    if not args.boot:
+        return
+    for preload in (True, False):
+        r = boot(args.workers, args.port, preload, args.timeout)
+        print(f"\n{'preload' if preload else 'no preload'}: {len(r['workers'])} workers ready in "
+              f"{r.get('total_ms', float('nan')):.1f} ms (master import {r.get('preload_ms', 0.0):.1f} ms)")
+        print(f"  {'pid':>8}{'import ms':>12}{'boot ms':>12}")
+        for w in r["workers"]:
+            print(f"  {w['pid']:>8}{w['import_ms']:>12.1f}{w['boot_ms']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
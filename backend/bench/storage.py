@@ -0,0 +1,283 @@
+# bench/storage.py
+"""
+Storage backends side by side: the same synthetic data loaded into each,
+results cross-checked, then checklist / stats latency per backend.
+
+    python -m bench.storage --users 50 --habits 6 --days 365
+    python -m bench.storage --dsn postgresql://localhost/habits_storage_bench   # + Postgres
+
+Every backend gets the same users, habits, slots and log history through the
+Storage interface (same RNG seed). Before timing, each read is run for a
+sample of users on every backend and compared with the in-memory backend,
+with ids mapped to creation order and rollup rows expanded to one per day.
+Any difference is printed and the exit status is 1.
+
+Timed reads run one at a time against a random user (--iterations each):
+checklist, checklist_range (7 days), daily_completion (30-day rollup),
+streak_inputs (schedules + completed slot counts), heatmap (this year),
+habit_logs_page (100 rows), plus log_toggle (one record_logs write).
+
+SQLite uses a fresh file under a temporary directory unless --sqlite-path is
+given. With --dsn, THE TARGET DATABASE'S public SCHEMA IS DROPPED and
+recreated from DB/schema.txt (+ DB/migrations), as bench.seed does.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import date, time as dtime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from app.core.storage import PERIODS, Storage, open_storage
+
+LOG_BATCH = 5_000
+CHECK_USERS = 5
+Op = Callable[[Storage, "Seeded", str, date], Awaitable[Any]]
+
+
+@dataclass
+class Seeded:
+    users: List[str] = field(default_factory=list)
+    # user -> habit ids in creation order
+    habits: Dict[str, List[UUID]] = field(default_factory=dict)
+    # str(habit id) -> creation index across all users (the same on every backend)
+    index: Dict[str, int] = field(default_factory=dict)
+
+
+async def seed(storage: Storage, users: int, habits: int, days: int, completion: float, rng_seed: int) -> Seeded:
+    rng = random.Random(rng_seed)
+    today = date.today()
+    out = Seeded()
+    for i in range(users):
+        user = await storage.upsert_user(f"bench{i}@example.com", f"Bench User {i}", None)
+        user_id = str(user["id"])
+        out.users.append(user_id)
+        slots: List[Tuple[UUID, str]] = []
+        for j in range(habits):
+            period = PERIODS[j % len(PERIODS)]
+            local_time = dtime(rng.randrange(6, 23), rng.choice((0, 15, 30, 45))) if rng.random() < 0.7 else None
+            habit_id = await storage.create_habit(user_id, f"Habit {j}", period, local_time)
+            out.index[str(habit_id)] = len(out.index)
+            out.habits.setdefault(user_id, []).append(habit_id)
+            slots.append((habit_id, period))
+            if rng.random() < 0.3:
+                extra = PERIODS[(j + 1) % len(PERIODS)]
+                await storage.add_slot(user_id, habit_id, extra, None)
+                slots.append((habit_id, extra))
+
+        items = [
+            (habit_id, period, today - timedelta(days=d), rng.random() < completion, None)
+            for d in range(days)
+            for habit_id, period in slots
+            if rng.random() < 0.9
+        ]
+        for k in range(0, len(items), LOG_BATCH):
+            await storage.record_logs(user_id, items[k:k + LOG_BATCH])
+    return out
+
+
+# ──────────────────────────
+# Operations
+# ──────────────────────────
+async def _streak_inputs(s: Storage, seeded: Seeded, user: str, today: date) -> Any:
+    return await s.habit_schedules(user), await s.completed_slot_counts(user)
+
+
+async def _logs_page(s: Storage, seeded: Seeded, user: str, today: date) -> Any:
+    return await s.habit_logs_page(seeded.habits[user][0], date.min, today, (today + timedelta(days=1), PERIODS[0]), 100)
+
+
+async def _log_toggle(s: Storage, seeded: Seeded, user: str, today: date) -> Any:
+    done = random.random() < 0.5
+    return await s.record_logs(user, [(seeded.habits[user][0], PERIODS[0], today, done, None)])
+
+
+READS: Dict[str, Op] = {
+    "checklist": lambda s, seeded, u, today: s.checklist(u, today),
+    "checklist_range": lambda s, seeded, u, today: s.checklist_range(u, today - timedelta(days=6), today),
+    "daily_completion": lambda s, seeded, u, today: s.daily_rollup(u, today - timedelta(days=29), today),
+    "streak_inputs": _streak_inputs,
+    "heatmap": lambda s, seeded, u, today: s.heatmap(u, today.year),
+    "habit_logs_page": _logs_page,
+}
+WRITES: Dict[str, Op] = {"log_toggle": _log_toggle}
+
+
+# ──────────────────────────
+# Cross-check
+# ──────────────────────────
+# Differ between backends by design (clock / server timezone) or are opaque
+_SKIP = {"created_at", "created_on"}
+
+
+def _norm_row(row: Any, seeded: Seeded) -> Tuple:
+    out = []
+    for k in row.keys():
+        if k in _SKIP:
+            continue
+        v = row[k]
+        if k == "habit_id":
+            v = seeded.index.get(str(v), str(v))
+        elif k == "bits":
+            v = bytes(v) if v is not None else None
+            v = None if v is not None and not any(v) else v
+        elif k == "done_days":
+            v = tuple(v)
+        out.append((k, v))
+    return tuple(out)
+
+
+def _dense_rollup(rows: List[Any], first_day: date, last_day: date) -> List[Tuple[date, int, int]]:
+    by_day = {r["day"]: r for r in rows}
+    total = rows[0]["total"] if rows and rows[0]["day"] < first_day else 0
+    out = []
+    day = first_day
+    while day <= last_day:
+        r = by_day.get(day)
+        completed = 0
+        if r is not None:
+            completed, total = r["completed"], r["total"]
+        out.append((day, completed, total))
+        day += timedelta(days=1)
+    return out
+
+
+def normalize(name: str, result: Any, seeded: Seeded, today: date) -> Any:
+    if name == "daily_completion":
+        return _dense_rollup(result, today - timedelta(days=29), today)
+    if name == "streak_inputs":
+        schedules, counts = result
+        return (sorted(_norm_row(r, seeded) for r in schedules), sorted(_norm_row(r, seeded) for r in counts))
+    return [_norm_row(r, seeded) for r in result]
+
+
+async def cross_check(
+    backends: Dict[str, Storage],
+    seeded: Dict[str, Seeded],
+    reference: str,
+    today: date,
+) -> List[str]:
+    problems = []
+    n_users = len(seeded[reference].users)
+    for i in range(min(CHECK_USERS, n_users)):
+        for name, op in READS.items():
+            results = {}
+            for b, storage in backends.items():
+                user = seeded[b].users[i]
+                results[b] = normalize(name, await op(storage, seeded[b], user, today), seeded[b], today)
+            for b, got in results.items():
+                if got != results[reference]:
+                    problems.append(f"{name}: {b} differs from {reference} for user #{i}")
+    return problems
+
+
+# ──────────────────────────
+# Timing
+# ──────────────────────────
+def _summary(ms: List[float]) -> Dict[str, float]:
+    qs = statistics.quantiles(ms, n=100) if len(ms) > 1 else ms * 99
+    return {"p50": statistics.median(ms), "p95": qs[94], "mean": statistics.fmean(ms)}
+
+
+async def time_ops(storage: Storage, seeded: Seeded, iterations: int, rng: random.Random) -> Dict[str, Dict[str, float]]:
+    today = date.today()
+    out = {}
+    for name, op in {**READS, **WRITES}.items():
+        ms = []
+        for _ in range(iterations):
+            user = rng.choice(seeded.users)
+            t0 = time.perf_counter()
+            await op(storage, seeded, user, today)
+            ms.append((time.perf_counter() - t0) * 1000)
+        out[name] = _summary(ms)
+    return out
+
+
+async def _reset_postgres(dsn: str) -> None:
+    import asyncpg
+
+    from bench.seed import apply_schema
+
+    conn = await asyncpg.connect(dsn)
+    try:
+        await apply_schema(conn)
+    finally:
+        await conn.close()
+
+
+async def run(args: argparse.Namespace) -> int:
+    targets: List[Tuple[str, Optional[str]]] = [("memory", None)]
+    tmp = None
+    if args.sqlite_path:
+        targets.append(("sqlite", args.sqlite_path))
+    else:
+        tmp = tempfile.TemporaryDirectory()
+        targets.append(("sqlite", os.path.join(tmp.name, "bench.db")))
+    if args.dsn:
+        await _reset_postgres(args.dsn)
+        targets.append(("postgres", args.dsn))
+
+    backends: Dict[str, Storage] = {}
+    seeded: Dict[str, Seeded] = {}
+    try:
+        for name, url in targets:
+            storage = backends[name] = await open_storage(name, url)
+            t0 = time.perf_counter()
+            seeded[name] = await seed(storage, args.users, args.habits, args.days, args.completion, args.seed)
+            print(f"[seed] {name}: {args.users} users x {args.habits} habits x {args.days} days "
+                  f"in {time.perf_counter() - t0:.1f}s")
+
+        status = 0
+        if args.check:
+            problems = await cross_check(backends, seeded, "memory", date.today())
+            for p in problems:
+                print(f"[check] {p}")
+            print(f"[check] {'results match' if not problems else f'{len(problems)} mismatch(es)'} "
+                  f"across {', '.join(backends)}")
+            status = 1 if problems else 0
+
+        results = {
+            name: await time_ops(storage, seeded[name], args.iterations, random.Random(args.seed))
+            for name, storage in backends.items()
+        }
+    finally:
+        for storage in backends.values():
+            await storage.close()
+        if tmp is not None:
+            tmp.cleanup()
+
+    print(f"\n{'op':<18}" + "".join(f"{name + ' p50 / p95 ms':>26}" for name in results))
+    for op in {**READS, **WRITES}:
+        cells = [f"{r[op]['p50']:.3f} / {r[op]['p95']:.3f}" for r in results.values()]
+        print(f"{op:<18}" + "".join(f"{c:>26}" for c in cells))
+    return status
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare storage backends")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--habits", type=int, default=6)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--completion", type=float, default=0.7)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--sqlite-path", help="SQLite file to use (default: a temporary file)")
+    parser.add_argument("--dsn", help="Also benchmark Postgres (its public schema is recreated)")
+    parser.add_argument("--check", action=argparse.BooleanOptionalAction, default=True,
+                        help="Cross-check results against the in-memory backend first (default: on)")
+    args = parser.parse_args()
+    if args.users < 1 or args.habits < 1:
+        parser.error("--users and --habits must be at least 1")
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
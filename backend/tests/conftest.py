@@ -0,0 +1,38 @@
+# tests/conftest.py
+import os
+
+# app.core.config reads these at import time; nothing below talks to a real database or Google
+os.environ.setdefault("GOOGLE_CLIENT_ID", "test-client-id")
+os.environ.setdefault("JWT_SECRET", "test-secret")
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/habits_test")
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """
+    TestClient for the whole app on the in-memory storage backend, signed in
+    as a fresh user. Yields (client, user_id).
+    """
+    from fastapi.testclient import TestClient
+
+    from app import main
+    from app.core.auth import create_jwt
+    from app.core.config import settings
+
+    async def noop():
+        pass
+
+    monkeypatch.setattr(settings, "STORAGE_BACKEND", "memory")
+    monkeypatch.setattr(main.google_keys, "start", noop)
+    app = main.create_app()
+    with TestClient(app) as client:
+        user = client.portal.call(app.state.storage.upsert_user, "user@example.com", "User", None)
+        client.cookies.set(settings.COOKIE_NAME, create_jwt(str(user["id"]), user["email"]))
+        yield client, str(user["id"])
@@ -0,0 +1,125 @@
+# tests/test_admission.py
+"""
+AdmissionPool: write-first queueing, the read reserve, and 503 + Retry-After
+on a full queue or an expired wait.
+"""
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.core.db import READ, WRITE, AdmissionPool, request_priority
+
+pytestmark = pytest.mark.anyio
+
+
+class FakePool:
+    """
+    Just enough of asyncpg.Pool for AdmissionPool: hands out fresh objects.
+    """
+
+    def __init__(self, size):
+        self.size = size
+
+    def get_max_size(self):
+        return self.size
+
+    async def acquire(self, timeout=None):
+        return object()
+
+    async def release(self, conn):
+        pass
+
+
+def _gate(size=2, max_waiters=4, acquire_timeout=1.0, write_reserve=1):
+    return AdmissionPool(FakePool(size), max_waiters, acquire_timeout, write_reserve)
+
+
+async def _hold(gate, priority, order, release):
+    request_priority.set(priority)
+    async with gate.acquire():
+        order.append(priority)
+        await release.wait()
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def test_reads_leave_the_write_reserve():
+    gate = _gate(size=2, write_reserve=1)
+    release = asyncio.Event()
+    order = []
+    tasks = [asyncio.create_task(_hold(gate, READ, order, release)) for _ in range(2)]
+    await _settle()
+    # The second read waits: the last connection is kept for writes
+    assert order == [READ]
+    assert gate.waiting() == {WRITE: 0, READ: 1}
+
+    tasks.append(asyncio.create_task(_hold(gate, WRITE, order, release)))
+    await _settle()
+    assert order == [READ, WRITE]
+
+    release.set()
+    await asyncio.gather(*tasks)
+    assert order == [READ, WRITE, READ]
+    assert gate.in_use == 0
+
+
+async def test_queued_writes_go_before_queued_reads():
+    gate = _gate(size=1, write_reserve=0)
+    first = asyncio.Event()
+    rest = asyncio.Event()
+    rest.set()
+    order = []
+    holder = asyncio.create_task(_hold(gate, READ, order, first))
+    await _settle()
+    queued = [asyncio.create_task(_hold(gate, p, order, rest)) for p in (READ, READ, WRITE)]
+    await _settle()
+    assert gate.waiting() == {WRITE: 1, READ: 2}
+
+    first.set()
+    await asyncio.gather(holder, *queued)
+    assert order == [READ, WRITE, READ, READ]
+
+
+async def test_full_queue_is_rejected_with_retry_after():
+    gate = _gate(size=1, max_waiters=1, write_reserve=0)
+    release = asyncio.Event()
+    order = []
+    tasks = [asyncio.create_task(_hold(gate, WRITE, order, release)) for _ in range(2)]
+    await _settle()
+
+    request_priority.set(WRITE)
+    with pytest.raises(HTTPException) as exc:
+        async with gate.acquire():
+            pass
+    assert exc.value.status_code == 503
+    assert exc.value.headers["Retry-After"] == str(settings.DB_RETRY_AFTER_S)
+
+    release.set()
+    await asyncio.gather(*tasks)
+    assert gate.in_use == 0
+
+
+async def test_expired_wait_is_rejected():
+    gate = _gate(size=1, acquire_timeout=0.05, write_reserve=0)
+    release = asyncio.Event()
+    holder = asyncio.create_task(_hold(gate, WRITE, [], release))
+    await _settle()
+
+    request_priority.set(READ)
+    with pytest.raises(HTTPException) as exc:
+        async with gate.acquire():
+            pass
+    assert exc.value.status_code == 503
+    assert "Retry-After" in exc.value.headers
+    # The timed-out waiter left the queue and took no slot
+    assert gate.waiting() == {WRITE: 0, READ: 0}
+    assert gate.in_use == 1
+
+    release.set()
+    await holder
+    assert gate.in_use == 0
@@ -0,0 +1,77 @@
+# tests/test_cache.py
+import pytest
+
+from app.core.cache import CacheBackend, MemoryBackend
+
+pytestmark = pytest.mark.anyio
+
+USER = "u1"
+
+
+def test_backend_is_abstract():
+    with pytest.raises(TypeError):
+        CacheBackend()
+
+
+async def test_scoped_invalidation_leaves_other_scopes():
+    cache = MemoryBackend()
+    for scope in ("checklist:2024-05-01", "heatmap"):
+        _, token = await cache.get(USER, scope, ())
+        await cache.set(USER, scope, (), scope.encode(), token)
+
+    await cache.invalidate(USER, ["checklist:2024-05-01"])
+    assert (await cache.get(USER, "checklist:2024-05-01", ()))[0] is None
+    assert (await cache.get(USER, "heatmap", ()))[0] == b"heatmap"
+
+
+async def test_read_racing_invalidation_is_not_stored():
+    cache = MemoryBackend()
+    _, checklist_token = await cache.get(USER, "checklist:2024-05-01", ())
+    _, heatmap_token = await cache.get(USER, "heatmap", ())
+    await cache.invalidate(USER, ["checklist:2024-05-01"])
+
+    await cache.set(USER, "checklist:2024-05-01", (), b"stale", checklist_token)
+    await cache.set(USER, "heatmap", (), b"fresh", heatmap_token)
+    assert (await cache.get(USER, "checklist:2024-05-01", ()))[0] is None
+    assert (await cache.get(USER, "heatmap", ()))[0] == b"fresh"
+
+
+async def test_user_wide_invalidation():
+    cache = MemoryBackend()
+    _, token = await cache.get(USER, "heatmap", ())
+    await cache.set(USER, "heatmap", (), b"x", token)
+    _, pending = await cache.get(USER, "daily_completion", ())
+
+    await cache.invalidate(USER)
+    assert (await cache.get(USER, "heatmap", ()))[0] is None
+    await cache.set(USER, "daily_completion", (), b"stale", pending)
+    assert (await cache.get(USER, "daily_completion", ()))[0] is None
+
+
+async def test_folded_scope_stamps_stay_conservative():
+    cache = MemoryBackend()
+    _, pending = await cache.get(USER, "heatmap", ())
+    for day in range(cache.MAX_SCOPE_GENS + 1):
+        await cache.invalidate(USER, [f"checklist:{day}"])
+    # Folding into a user-wide stamp may refuse a store, never accept a stale one
+    _, token = await cache.get(USER, "checklist:0", ())
+    await cache.set(USER, "checklist:0", (), b"x", token)
+    assert (await cache.get(USER, "checklist:0", ()))[0] == b"x"
+    await cache.set(USER, "heatmap", (), b"y", pending)
+    assert (await cache.get(USER, "heatmap", ()))[0] is None
+
+
+async def test_stamps_are_bounded_per_user():
+    cache = MemoryBackend(max_users=2)
+    _, pending = await cache.get("a", "heatmap", ())
+    await cache.invalidate("a", ["heatmap"])
+    for user in ("b", "c", "d"):
+        await cache.invalidate(user, ["checklist:2024-05-01"])
+    assert cache.stats()["stamped_users"] == 2
+
+    # "a" was evicted: its stamp lives on in the floor, so the racing read is still refused
+    await cache.set("a", "heatmap", (), b"stale", pending)
+    assert (await cache.get("a", "heatmap", ()))[0] is None
+    _, token = await cache.get("a", "heatmap", ())
+    await cache.set("a", "heatmap", (), b"fresh", token)
+    assert (await cache.get("a", "heatmap", ()))[0] == b"fresh"
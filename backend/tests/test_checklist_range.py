@@ -0,0 +1,54 @@
+# tests/test_checklist_range.py
+from datetime import date, time, timedelta
+from uuid import uuid4
+
+from app.routers.habits import MAX_RANGE_DAYS, _range_grid
+
+START = date(2026, 3, 9)
+
+
+def test_range_grid_is_columnar():
+    walk, read = uuid4(), uuid4()
+    rows = [
+        {"habit_id": walk, "name": "Walk", "period": "MORNING", "local_time": time(7, 30),
+         "done_days": [START, START + timedelta(days=2)]},
+        {"habit_id": read, "name": "Read", "period": "NIGHT", "local_time": None, "done_days": []},
+        {"habit_id": walk, "name": "Walk", "period": "NIGHT", "local_time": None,
+         "done_days": [START + timedelta(days=3)]},
+    ]
+    grid = _range_grid(rows, START, START + timedelta(days=3), 4)
+
+    assert grid["days"] == 4
+    assert grid["habits"] == [{"id": str(walk), "name": "Walk"}, {"id": str(read), "name": "Read"}]
+    assert grid["slots"] == [
+        {"habit": 0, "period": "MORNING", "local_time": "07:30", "done": "1010"},
+        {"habit": 1, "period": "NIGHT", "local_time": None, "done": "0000"},
+        {"habit": 0, "period": "NIGHT", "local_time": None, "done": "0001"},
+    ]
+
+
+def test_checklist_range(api):
+    client, _ = api
+    habit = client.post("/api/habits", json={"name": "Walk", "period": "MORNING"}).json()["id"]
+    for d in (0, 2, 9):
+        client.post("/api/habit_log", json={
+            "habit_id": habit, "period": "MORNING", "day": (START + timedelta(days=d)).isoformat(),
+        })
+
+    resp = client.get("/api/checklist/range", params={"start": START.isoformat(), "end": "2026-03-15"})
+    assert resp.status_code == 200
+    body = resp.json()
+    assert (body["start"], body["end"], body["days"]) == ("2026-03-09", "2026-03-15", 7)
+    assert [s["done"] for s in body["slots"]] == ["1010000"]
+
+
+def test_checklist_range_validation(api):
+    client, _ = api
+
+    def status(start, end):
+        return client.get("/api/checklist/range", params={"start": start.isoformat(), "end": end.isoformat()}).status_code
+
+    assert status(START, START - timedelta(days=1)) == 422
+    assert status(START, START + timedelta(days=MAX_RANGE_DAYS)) == 422
+    assert status(START, START + timedelta(days=MAX_RANGE_DAYS - 1)) == 200
+    assert status(START, START) == 200
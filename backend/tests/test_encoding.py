@@ -0,0 +1,46 @@
+# tests/test_encoding.py
+"""
+Accept / Accept-Encoding negotiation.
+"""
+import pytest
+from starlette.requests import Request
+
+from app.core import encoding
+from app.core.encoding import accepts_gzip, negotiate
+
+
+def _request(**headers) -> Request:
+    raw = [(k.replace("_", "-").encode(), v.encode()) for k, v in headers.items()]
+    return Request({"type": "http", "headers": raw})
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, False),
+    ("gzip", True),
+    ("GZIP, deflate", True),
+    ("deflate, gzip;q=0.5", True),
+    ("x-gzip", True),
+    ("gzip;q=0", False),
+    ("gzip;q=0.0, deflate", False),
+    ("*", True),
+    ("*;q=0", False),
+    ("gzip;q=0, *", False),
+    ("br, identity", False),
+    ("gzip;q=nope", False),
+])
+def test_accepts_gzip(header, expected):
+    req = _request(accept_encoding=header) if header is not None else _request()
+    assert accepts_gzip(req) is expected
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, encoding.JSON),
+    ("*/*", encoding.JSON),
+    ("application/vnd.habit.columnar+json", encoding.COLUMNAR),
+    ("application/json;q=0.5, application/vnd.habit.columnar+json", encoding.COLUMNAR),
+    ("application/vnd.habit.columnar+json;q=0, application/json", encoding.JSON),
+    ("text/html", encoding.JSON),
+])
+def test_negotiate(header, expected):
+    req = _request(accept=header) if header is not None else _request()
+    assert negotiate(req) == expected
@@ -0,0 +1,188 @@
+# tests/test_google_auth.py
+"""
+GoogleKeyStore against a local stand-in for Google's JWKS endpoint.
+"""
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core import google_auth
+from app.core.db import get_storage
+from app.core.google_auth import GoogleKeyStore, JWKSUnavailable
+from app.routers import auth as auth_router
+
+pytestmark = pytest.mark.anyio
+
+
+def _jwk(key: rsa.RSAPrivateKey, kid: str) -> dict:
+    jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(key.public_key()))
+    return {**jwk, "kid": kid, "alg": "RS256", "use": "sig"}
+
+
+class JWKSServer:
+    """
+    Serves {"keys": [...]} for the keys in `keys`; `status` != 200 makes it fail.
+    """
+
+    def __init__(self):
+        self.keys = {}
+        self.status = 200
+        self.max_age = 3600
+        self.hits = 0
+        self.delay = 0.0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.hits += 1
+                time.sleep(server.delay)
+                body = json.dumps({"keys": [_jwk(k, kid) for kid, k in server.keys.items()]}).encode()
+                self.send_response(server.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Cache-Control", f"public, max-age={server.max_age}")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/certs"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def add_key(self, kid: str) -> rsa.RSAPrivateKey:
+        key = self.keys[kid] = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        return key
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def jwks():
+    server = JWKSServer()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def store(jwks):
+    return GoogleKeyStore(jwks.url)
+
+
+def _token(key: rsa.RSAPrivateKey, kid: str, **claims) -> str:
+    now = int(time.time())
+    payload = {
+        "iss": "https://accounts.google.com",
+        "aud": google_auth.settings.GOOGLE_CLIENT_ID,
+        "sub": "1234",
+        "email": "user@example.com",
+        "iat": now,
+        "exp": now + 600,
+        **claims,
+    }
+    return jwt.encode(payload, key, algorithm="RS256", headers={"kid": kid})
+
+
+async def test_cache_hit(jwks, store):
+    jwks.add_key("k1")
+    first = await store.get_key("k1")
+    assert await store.get_key("k1") is first
+    assert jwks.hits == 1
+
+
+async def test_refresh_on_expiry(jwks, store):
+    jwks.add_key("k1")
+    await store.get_key("k1")
+    store._expires_at = time.monotonic() - 1
+    await store.get_key("k1")
+    assert jwks.hits == 2
+    assert store._expires_at > time.monotonic() + 3000
+
+
+async def test_expired_keys_share_one_fetch(jwks, store):
+    jwks.add_key("k1")
+    await store.get_key("k1")
+    store._expires_at = time.monotonic() - 1
+    jwks.delay = 0.1
+    await asyncio.gather(*(store.get_key("k1") for _ in range(20)))
+    assert jwks.hits == 2
+
+
+async def test_unknown_kid_refetches_once(jwks, store):
+    jwks.add_key("k1")
+    await store.get_key("k1")
+    jwks.add_key("k2")  # rotation
+
+    # Just fetched: an unknown kid does not hit the endpoint again
+    with pytest.raises(jwt.InvalidTokenError):
+        await store.get_key("k2")
+    assert jwks.hits == 1
+
+    store._fetched_at -= store.MIN_REFETCH
+    assert await asyncio.gather(*(store.get_key("k2") for _ in range(10)))
+    assert jwks.hits == 2
+
+    with pytest.raises(jwt.InvalidTokenError):
+        await store.get_key("never-published")
+    assert jwks.hits == 2
+
+
+async def test_fetch_failure(jwks, store):
+    jwks.add_key("k1")
+    jwks.status = 500
+    with pytest.raises(JWKSUnavailable):
+        await store.get_key("k1")
+
+    jwks.status = 200
+    assert await store.get_key("k1") is not None
+
+
+async def test_unreachable_endpoint():
+    store = GoogleKeyStore("http://127.0.0.1:9/certs")
+    with pytest.raises(JWKSUnavailable):
+        await store.get_key("k1")
+
+
+async def test_verify_id_token(jwks, store, monkeypatch):
+    monkeypatch.setattr(google_auth, "google_keys", store)
+    key = jwks.add_key("k1")
+    claims = await google_auth.verify_google_id_token(_token(key, "k1"))
+    assert claims["email"] == "user@example.com"
+
+    with pytest.raises(jwt.InvalidAudienceError):
+        await google_auth.verify_google_id_token(_token(key, "k1", aud="someone-else"))
+    with pytest.raises(jwt.InvalidIssuerError):
+        await google_auth.verify_google_id_token(_token(key, "k1", iss="evil.example.com"))
+
+
+def _auth_client() -> TestClient:
+    app = FastAPI()
+    app.include_router(auth_router.router)
+    app.dependency_overrides[get_storage] = lambda: None
+    return TestClient(app)
+
+
+def test_auth_google_status(jwks, store, monkeypatch):
+    monkeypatch.setattr(google_auth, "google_keys", store)
+    key = jwks.add_key("k1")
+    client = _auth_client()
+
+    jwks.status = 503
+    resp = client.post("/auth/google", json={"credential": _token(key, "k1")})
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"]
+
+    jwks.status = 200
+    other = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    resp = client.post("/auth/google", json={"credential": _token(other, "k1")})
+    assert resp.status_code == 401
@@ -0,0 +1,65 @@
+# tests/test_habit_log_batch.py
+from uuid import uuid4
+
+DAY = "2026-03-10"
+
+
+def _habit(client, name="Walk", period="MORNING"):
+    resp = client.post("/api/habits", json={"name": name, "period": period})
+    assert resp.status_code == 201
+    return resp.json()["id"]
+
+
+def test_batch_results_in_request_order(api):
+    client, _ = api
+    walk = _habit(client)
+    read = _habit(client, "Read", "NIGHT")
+    stranger = str(uuid4())
+
+    resp = client.post("/api/habit_log/batch", json={"items": [
+        {"habit_id": walk, "period": "MORNING", "day": DAY, "completed": True, "note": "first"},
+        {"habit_id": stranger, "period": "MORNING", "day": DAY},
+        {"habit_id": read, "period": "NIGHT", "day": DAY, "completed": False},
+    ]})
+    assert resp.status_code == 200
+    results = resp.json()["results"]
+    assert [(r["index"], r["status"]) for r in results] == [(0, 200), (1, 404), (2, 200)]
+    assert results[0]["log"]["note"] == "first"
+    assert results[2]["log"]["completed"] is False
+
+    rows = client.get("/api/checklist/today", params={"day": DAY}).json()
+    assert {(r["name"], r["completed"]) for r in rows} == {("Walk", True), ("Read", False)}
+
+
+def test_batch_later_duplicates_win(api):
+    client, _ = api
+    walk = _habit(client)
+
+    resp = client.post("/api/habit_log/batch", json={"items": [
+        {"habit_id": walk, "period": "MORNING", "day": DAY, "completed": True},
+        {"habit_id": walk, "period": "MORNING", "day": DAY, "completed": False},
+    ]})
+    # Both items report the row as finally saved
+    assert [r["log"]["completed"] for r in resp.json()["results"]] == [False, False]
+    rows = client.get("/api/checklist/today", params={"day": DAY}).json()
+    assert [r["completed"] for r in rows] == [False]
+
+
+def test_batch_of_unowned_habits_writes_nothing(api):
+    client, _ = api
+    _habit(client)
+    before = client.get("/api/checklist/today", params={"day": DAY}).headers["ETag"]
+
+    resp = client.post("/api/habit_log/batch", json={"items": [
+        {"habit_id": str(uuid4()), "period": "MORNING", "day": DAY},
+    ]})
+    assert resp.json()["results"] == [{"index": 0, "status": 404, "detail": "Habit not found"}]
+    # No write, so the data version (and the ETag) did not move
+    assert client.get("/api/checklist/today", params={"day": DAY}).headers["ETag"] == before
+
+
+def test_batch_size_is_capped(api):
+    client, _ = api
+    assert client.post("/api/habit_log/batch", json={"items": []}).status_code == 422
+    item = {"habit_id": str(uuid4()), "period": "MORNING", "day": DAY}
+    assert client.post("/api/habit_log/batch", json={"items": [item] * 501}).status_code == 422
@@ -0,0 +1,64 @@
+# tests/test_heatmap.py
+import base64
+from datetime import date
+from uuid import uuid4
+
+from app.core.heatmap import BITMAP_BYTES, build, due_matrix, unpack
+from app.core.storage.base import pack_days
+
+
+def test_pack_days_layout():
+    bits = pack_days([date(2024, 1, 1), date(2024, 1, 10), date(2024, 12, 31)], 2024)
+    assert len(bits) == BITMAP_BYTES
+    # Bit i is day-of-year i + 1, least significant bit first
+    assert bits[0] == 0b0000_0001
+    assert bits[1] == 0b0000_0010
+    assert bits[365 >> 3] == 1 << (365 & 7)
+    assert sum(bin(b).count("1") for b in bits) == 3
+
+    grid = unpack([bits, bytes(BITMAP_BYTES)], 366)
+    assert grid.shape == (2, 366)
+    assert grid[0].nonzero()[0].tolist() == [0, 9, 365]
+    assert not grid[1].any()
+
+
+def test_due_matrix():
+    due = due_matrix([date(2025, 1, 1), date(2025, 1, 3), date(2024, 6, 1)], 2025, 365, date(2025, 1, 4))
+    assert due[:, :5].astype(int).tolist() == [
+        [1, 1, 1, 1, 0],
+        [0, 0, 1, 1, 0],
+        [1, 1, 1, 1, 0],
+    ]
+    assert not due[:, 4:].any()
+
+
+def test_build():
+    walk = uuid4()
+    done_days = [date(2025, 1, 2), date(2025, 1, 3)]
+    rows = [
+        {"habit_id": walk, "name": "Walk", "period": "MORNING",
+         "created_on": date(2025, 1, 2), "bits": pack_days(done_days, 2025)},
+        # Imported history before the creation day still counts as due
+        {"habit_id": walk, "name": "Walk", "period": "NIGHT",
+         "created_on": date(2025, 1, 3), "bits": pack_days([date(2025, 1, 1)], 2025)},
+    ]
+    out = build(rows, 2025, date(2025, 1, 4))
+
+    assert (out["days"], out["start"], out["bit_order"]) == (365, "2025-01-01", "little")
+    assert out["completed"][:5] == [1, 1, 1, 0, 0]
+    assert out["total"][:5] == [1, 1, 2, 2, 0]
+    assert out["rate"][:5] == [1.0, 1.0, 0.5, 0.0, 0.0]
+    assert [(s["period"], s["done"], s["due"], s["rate"]) for s in out["slots"]] == [
+        ("MORNING", 2, 3, 0.6667),
+        ("NIGHT", 1, 3, 0.3333),
+    ]
+    assert base64.b64decode(out["slots"][0]["bits"]) == rows[0]["bits"]
+
+
+def test_build_without_bitmaps():
+    rows = [{"habit_id": uuid4(), "name": "Floss", "period": "NIGHT", "created_on": date(2024, 1, 1), "bits": None}]
+    out = build(rows, 2024, date(2025, 1, 1))
+    assert out["days"] == 366
+    assert out["slots"][0]["done"] == 0
+    assert out["slots"][0]["due"] == 366
+    assert sum(out["completed"]) == 0
@@ -0,0 +1,61 @@
+# tests/test_importer.py
+import pytest
+
+from app.core.importer import MAX_NOTE_CHARS, HistoryImporter, iter_lines, iter_records
+
+pytestmark = pytest.mark.anyio
+
+
+async def _chunks(body: bytes, size: int):
+    for i in range(0, len(body), size):
+        yield body[i:i + size]
+
+
+async def _records(body: str, fmt: str, chunk_size: int = 7):
+    return [r async for r in iter_records(iter_lines(_chunks(body.encode(), chunk_size)), fmt)]
+
+
+async def test_csv_quoted_newlines():
+    body = (
+        "type,habit,period,day,note\r\n"
+        'log,Run,MORNING,2024-05-01,"line1\r\nline2"\r\n'
+        "\r\n"
+        'log,Run,NIGHT,2024-05-01,"say ""hi""\n\nbye"\n'
+        "log,Read,NIGHT,2024-05-02,\n"
+    )
+    recs = await _records(body, "csv")
+    assert [r["note"] for r in recs] == ["line1\nline2", 'say "hi"\n\nbye', None]
+    assert recs[2] == {"type": "log", "habit": "Read", "period": "NIGHT", "day": "2024-05-02", "note": None}
+
+
+async def test_csv_unterminated_quote():
+    recs = await _records('type,habit,note\nlog,Run,"open\nmore\n', "csv")
+    assert recs == [{"__error__": "unterminated quoted field at end of input"}]
+
+
+async def test_ndjson_bad_lines():
+    body = '{"type":"log"}\n\n[1,2]\n{oops\n"text"\n'
+    recs = await _records(body, "ndjson")
+    assert recs[0] == {"type": "log"}
+    assert recs[1] == [1, 2]
+    assert "__error__" in recs[2]
+    assert recs[3] == "text"
+
+
+async def test_non_object_records_are_skipped():
+    imp = HistoryImporter(None, "user")  # nothing is flushed below batch_size
+    for rec in ([1, 2], "text", None, {"type": "log", "habit": "Run", "period": "MORNING", "day": "2024-05-01"}):
+        await imp.add(rec)
+    assert imp.skipped == 3
+    assert imp.errors[0] == "record 1: record must be a JSON object"
+    assert len(imp._buf["log"]) == 1
+
+
+async def test_bad_notes_are_skipped():
+    imp = HistoryImporter(None, "user")
+    log = {"type": "log", "habit": "Run", "period": "MORNING", "day": "2024-05-01"}
+    for note in (123, {}, ["a"], "x" * (MAX_NOTE_CHARS + 1), "a\x00b", "fine", None):
+        await imp.add({**log, "note": note})
+    assert imp.skipped == 5
+    assert imp.errors[0] == "record 1: note must be a string"
+    assert [row[-1] for row in imp._buf["log"]] == ["fine", None]
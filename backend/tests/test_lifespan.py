@@ -0,0 +1,46 @@
+# tests/test_lifespan.py
+import pytest
+from fastapi import FastAPI
+
+from app import main
+
+pytestmark = pytest.mark.anyio
+
+
+class FakePool:
+    def __init__(self):
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+async def test_failed_startup_closes_pools(monkeypatch):
+    pools = []
+
+    async def create():
+        pools.append(FakePool())
+        return pools[-1]
+
+    async def no_replicas():
+        return {}
+
+    async def noop(*args):
+        pass
+
+    async def broken():
+        raise RuntimeError("LISTEN failed")
+
+    monkeypatch.setattr(main, "create_pool", create)
+    monkeypatch.setattr(main, "create_transfer_pool", create)
+    monkeypatch.setattr(main, "create_replica_pools", no_replicas)
+    monkeypatch.setattr(main, "_ensure_partitions", noop)
+    monkeypatch.setattr(main.google_keys, "start", noop)
+    monkeypatch.setattr(main.event_hub, "start", broken)
+
+    app = FastAPI()
+    with pytest.raises(RuntimeError):
+        async with main.lifespan(app):
+            pass
+    assert len(pools) == 2 and all(p.closed for p in pools)
+    assert app.state.ready is False
@@ -0,0 +1,181 @@
+# tests/test_reminders.py
+"""
+ReminderScheduler against an in-memory stand-in for its two queries and a MemorySink.
+"""
+import json
+from datetime import datetime, time, timezone
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from app.core import queries as q
+from app.core import reminders
+from app.core.reminders import CHANGES_CHANNEL, MemorySink, ReminderScheduler, next_fire
+
+pytestmark = pytest.mark.anyio
+
+NY = ZoneInfo("America/New_York")
+UTC = timezone.utc
+
+
+# ──────────────────────────
+# next_fire
+# ──────────────────────────
+def test_next_fire_follows_dst():
+    # 07:00 New York is 12:00Z in EST and 11:00Z once clocks spring forward (2024-03-10)
+    first = next_fire(time(7), NY, datetime(2024, 3, 9, 6, tzinfo=UTC))
+    assert first == datetime(2024, 3, 9, 12, tzinfo=UTC)
+    assert next_fire(time(7), NY, first) == datetime(2024, 3, 10, 11, tzinfo=UTC)
+
+
+def test_next_fire_spring_forward_gap():
+    # 02:30 does not exist on 2024-03-10: it fires at 03:30 EDT
+    fire = next_fire(time(2, 30), NY, datetime(2024, 3, 10, 5, tzinfo=UTC))
+    assert fire == datetime(2024, 3, 10, 7, 30, tzinfo=UTC)
+    assert fire.astimezone(NY).time() == time(3, 30)
+
+
+def test_next_fire_fall_back_fires_once():
+    # 01:30 happens twice on 2024-11-03: only the first (EDT) occurrence fires
+    first = next_fire(time(1, 30), NY, datetime(2024, 11, 3, 4, tzinfo=UTC))
+    assert first == datetime(2024, 11, 3, 5, 30, tzinfo=UTC)
+    assert next_fire(time(1, 30), NY, first) == datetime(2024, 11, 4, 6, 30, tzinfo=UTC)
+
+
+def test_next_fire_is_strictly_after():
+    at = datetime(2024, 6, 1, 11, tzinfo=UTC)  # 07:00 EDT
+    assert next_fire(time(7), NY, at) == datetime(2024, 6, 2, 11, tzinfo=UTC)
+
+
+# ──────────────────────────
+# Scheduler
+# ──────────────────────────
+class FakeDB:
+    """
+    REMINDER_SLOTS / REMINDER_COMPLETED over dicts, patched in for q.fetch.
+    """
+
+    def __init__(self):
+        self.slots = {}
+        self.completed = set()  # (slot_id, day)
+
+    def add(self, slot_id, habit_id, user_id, local_time, tz="America/New_York", name=None):
+        self.slots[slot_id] = {
+            "slot_id": slot_id, "habit_id": habit_id, "user_id": user_id,
+            "name": name or habit_id, "period": "MORNING", "local_time": local_time, "timezone": tz,
+        }
+
+    async def fetch(self, conn, query, *args):
+        if query is q.REMINDER_SLOTS:
+            everything, slots, habits, users = args
+            return [
+                r for r in self.slots.values()
+                if everything or r["slot_id"] in slots or r["habit_id"] in habits or r["user_id"] in users
+            ]
+        if query is q.REMINDER_COMPLETED:
+            slot_ids, days = args
+            return [{"slot_id": s} for s, d in zip(slot_ids, days) if (s, d) in self.completed]
+        raise AssertionError(f"unexpected query {query.name}")
+
+
+@pytest.fixture
+def db(monkeypatch):
+    fake = FakeDB()
+    monkeypatch.setattr(reminders.q, "fetch", fake.fetch)
+    return fake
+
+
+@pytest.fixture
+def scheduler():
+    return ReminderScheduler("postgresql://unused", MemorySink())
+
+
+def _heap_order(s: ReminderScheduler):
+    return [slot.slot_id for _, _, slot in sorted(e for e in s._heap if s._live(e[2]))]
+
+
+def _fire_time(s: ReminderScheduler, slot_id: str) -> float:
+    return min(t for t, _, slot in s._heap if s._live(slot) and slot.slot_id == slot_id)
+
+
+async def test_heap_orders_by_utc_fire_time(db, scheduler):
+    # Same wall-clock time in three zones, plus an earlier local time
+    db.add("tokyo", "h1", "u1", time(9), tz="Asia/Tokyo")
+    db.add("london", "h2", "u2", time(9), tz="Europe/London")
+    db.add("ny", "h3", "u3", time(9), tz="America/New_York")
+    db.add("ny-early", "h4", "u3", time(6), tz="America/New_York")
+    await scheduler._load_all(None)
+
+    order = _heap_order(scheduler)
+    times = [_fire_time(scheduler, sid) for sid in order]
+    assert times == sorted(times)
+    assert order.index("ny-early") < order.index("ny")
+    assert scheduler._peek() == times[0]
+
+
+async def test_fire_due_skips_completed(db, scheduler, monkeypatch):
+    db.add("s1", "h1", "u1", time(7))
+    db.add("s2", "h2", "u1", time(7))
+    await scheduler._load_all(None)
+    fire_at = _fire_time(scheduler, "s1")
+    day = datetime.fromtimestamp(fire_at, UTC).astimezone(NY).date()
+    db.completed.add(("s1", day))
+
+    monkeypatch.setattr(reminders._time, "time", lambda: fire_at + 1)
+    await scheduler._fire_due(None)
+
+    sent = scheduler.sink.sent
+    assert [(r.slot_id, r.day, r.local_time) for r in sent] == [("s2", day, time(7))]
+    assert sent[0].fire_at == datetime.fromtimestamp(fire_at, UTC)
+    assert (scheduler.sent, scheduler.skipped) == (1, 1)
+    # Both come back for the next day, completed or not
+    tomorrow = next_fire(time(7), NY, datetime.fromtimestamp(fire_at, UTC)).timestamp()
+    assert _fire_time(scheduler, "s1") == _fire_time(scheduler, "s2") == tomorrow
+
+
+async def test_fire_due_waits_for_due_entries(db, scheduler, monkeypatch):
+    db.add("s1", "h1", "u1", time(7))
+    await scheduler._load_all(None)
+    fire_at = _fire_time(scheduler, "s1")
+    monkeypatch.setattr(reminders._time, "time", lambda: fire_at - 1)
+    await scheduler._fire_due(None)
+    assert scheduler.sink.sent == []
+    assert _fire_time(scheduler, "s1") == fire_at
+
+
+async def test_reload_from_change_feed(db, scheduler):
+    db.add("s1", "h1", "u1", time(7))
+    db.add("s2", "h1", "u1", time(8))
+    db.add("s3", "h2", "u2", time(9))
+    await scheduler._load_all(None)
+    before = _fire_time(scheduler, "s3")
+
+    # local_time moved on s1; habit h1's other slot turned off; user u2 moved timezone
+    db.add("s1", "h1", "u1", time(5))
+    del db.slots["s2"]
+    db.add("s3", "h2", "u2", time(9), tz="Asia/Tokyo")
+    for payload in ({"slot": "s1"}, {"habit": "h1"}, {"user": "u2"}):
+        scheduler._on_change(None, 0, CHANGES_CHANNEL, json.dumps(payload))
+    scheduler._on_change(None, 0, CHANGES_CHANNEL, "not json")
+    scheduler._on_change(None, 0, CHANGES_CHANNEL, json.dumps({"table": "x"}))
+    assert scheduler._wake.is_set()
+    assert scheduler._dirty == {"slot": {"s1"}, "habit": {"h1"}, "user": {"u2"}}
+
+    await scheduler._reload_dirty(None)
+    assert not any(scheduler._dirty.values())
+    assert set(scheduler._slots) == {"s1", "s3"}
+    assert scheduler._slots["s1"].local_time == time(5)
+    assert scheduler._slots["s3"].tz == ZoneInfo("Asia/Tokyo")
+    assert _fire_time(scheduler, "s3") != before
+    assert set(_heap_order(scheduler)) == {"s1", "s3"}
+
+
+async def test_large_change_batch_reloads_everything(db, scheduler, monkeypatch):
+    db.add("s1", "h1", "u1", time(7))
+    await scheduler._load_all(None)
+    db.add("s2", "h2", "u2", time(8))
+    monkeypatch.setattr(reminders, "MAX_INCREMENTAL", 2)
+    for i in range(3):
+        scheduler._on_change(None, 0, CHANGES_CHANNEL, json.dumps({"slot": f"other{i}"}))
+    await scheduler._reload_dirty(None)
+    assert set(scheduler._slots) == {"s1", "s2"}
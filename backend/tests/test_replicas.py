@@ -0,0 +1,157 @@
+# tests/test_replicas.py
+"""
+Replica routing and the read-your-writes cookie, with stand-in pools.
+"""
+import pytest
+from fastapi import Depends, FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.core import db, replicas
+from app.core.config import settings
+from app.core.db import AdmissionPool, get_read_pool
+from app.core.replicas import Replica, ReadYourWritesMiddleware, ReplicaSet, parse_lsn
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeConn:
+    def __init__(self, lsn="0/0"):
+        self.lsn = lsn
+        self.wrote = False
+
+    async def fetchval(self, sql):
+        return self.lsn
+
+
+class FakePool:
+    """
+    Just enough of asyncpg.Pool for AdmissionPool and ReplicaSet polling.
+    """
+
+    def __init__(self, name, lsn=None, fail=False):
+        self.name = name
+        self.lsn = lsn
+        self.fail = fail
+        self.conn = FakeConn(lsn)
+
+    def get_max_size(self):
+        return 2
+
+    async def acquire(self, timeout=None):
+        return self.conn
+
+    async def release(self, conn):
+        pass
+
+    async def fetchval(self, sql):
+        if self.fail:
+            raise OSError("connection refused")
+        return self.lsn
+
+    async def close(self):
+        pass
+
+
+def test_parse_lsn():
+    assert parse_lsn("16/B374D848") == 0x16B374D848
+    assert parse_lsn("0/0") == 0
+    assert parse_lsn("0/16B3748") < parse_lsn("1/0")
+    for bad in (None, "", "16B374D848", "x/1", "1/zz"):
+        assert parse_lsn(bad) is None
+
+
+def _set(*replicas_):
+    rs = ReplicaSet()
+    rs.replicas = list(replicas_)
+    return rs
+
+
+def _replica(name, lsn, healthy=True):
+    r = Replica(name, FakePool(name))
+    r.replay_lsn, r.healthy = lsn, healthy
+    return r
+
+
+def test_choose_round_robin_and_read_your_writes():
+    a, b = _replica("a", 100), _replica("b", 200)
+    rs = _set(a, b)
+    assert {rs.choose(None).name for _ in range(4)} == {"a", "b"}
+    # Only b has replayed the client's write
+    assert {rs.choose(150).name for _ in range(4)} == {"b"}
+    # Nobody has: the primary
+    assert rs.choose(250) is None
+    assert rs.routed == {"replica": 8, "primary": 1}
+
+
+def test_choose_skips_unhealthy():
+    rs = _set(_replica("a", 500, healthy=False), _replica("b", None, healthy=True))
+    assert rs.choose(None).name == "b"
+    assert rs.choose(1) is None
+    assert _set().choose(None) is None
+
+
+async def test_poll_marks_health():
+    ok = Replica("ok", FakePool("ok", lsn="0/200"))
+    primary = Replica("not-a-standby", FakePool("p", lsn=None))
+    down = Replica("down", FakePool("down", fail=True))
+    down.healthy = True
+    rs = _set(ok, primary, down)
+    for r in rs.replicas:
+        await rs._poll_one(r)
+    assert (ok.healthy, ok.replay_lsn) == (True, 0x200)
+    assert primary.healthy is False
+    assert down.healthy is False
+
+
+# ──────────────────────────
+# Middleware + get_read_pool
+# ──────────────────────────
+@pytest.fixture
+def routed_app(monkeypatch):
+    primary_raw = FakePool("primary", lsn="0/300")
+    primary = AdmissionPool(primary_raw, max_waiters=4, acquire_timeout=1, write_reserve=0, track_writes=True)
+    rs = _set(_replica("lagging", 0x100), _replica("caught-up", 0x300))
+    monkeypatch.setattr(replicas, "replica_set", rs)
+    monkeypatch.setattr(db, "replica_set", rs)
+
+    app = FastAPI()
+    app.add_middleware(ReadYourWritesMiddleware)
+    app.state.pool = primary
+
+    @app.post("/write")
+    async def write():
+        async with primary.acquire() as conn:
+            conn.wrote = True  # what db.mark_write does on an AppConnection
+        return {}
+
+    @app.post("/no-write")
+    async def no_write():
+        async with primary.acquire():
+            pass
+        return {}
+
+    @app.get("/read")
+    async def read(request: Request, pool=Depends(get_read_pool)):
+        return {"pool": "primary" if pool is primary else pool.name}
+
+    return TestClient(app)
+
+
+def test_write_sets_lsn_cookie(routed_app):
+    resp = routed_app.post("/write")
+    # Quoted on the wire ("/" is not a plain cookie char); Starlette unquotes on read
+    assert resp.cookies.get(settings.REPLICA_LSN_COOKIE).strip('"') == "0/300"
+    assert settings.REPLICA_LSN_COOKIE not in routed_app.post("/no-write").cookies
+    # The client sends it back: the next read skips the replica that is behind
+    assert {routed_app.get("/read").json()["pool"] for _ in range(4)} == {"caught-up"}
+
+
+def test_read_with_cookie_avoids_lagging_replica(routed_app):
+    routed_app.cookies.set(settings.REPLICA_LSN_COOKIE, "0/300")
+    assert {routed_app.get("/read").json()["pool"] for _ in range(4)} == {"caught-up"}
+    routed_app.cookies.set(settings.REPLICA_LSN_COOKIE, "0/400")
+    assert routed_app.get("/read").json()["pool"] == "primary"
+
+
+def test_read_without_cookie_uses_any_replica(routed_app):
+    assert {routed_app.get("/read").json()["pool"] for _ in range(4)} == {"lagging", "caught-up"}
@@ -0,0 +1,340 @@
+# tests/test_storage.py
+"""
+Conformance tests every storage backend has to pass: memory and sqlite always,
+postgres when STORAGE_TEST_DSN is set (reported as skipped otherwise; CI runs
+it against a postgres service, .github/workflows/backend-tests.yml). THAT
+DATABASE'S public SCHEMA IS DROPPED and recreated from DB/schema.txt
+(+ DB/migrations) before each test.
+
+The last test runs the request handlers on the embedded backends.
+"""
+import asyncio
+import json
+import os
+from datetime import date, datetime, time, timedelta, timezone
+from uuid import uuid4
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core import profiles
+from app.core.config import settings
+from app.core.storage import Storage, open_storage
+from app.core.storage.base import USER_TIMEZONE, local_date, pack_days
+from app.routers.streaks import _fill_window
+
+pytestmark = pytest.mark.anyio
+
+PG_DSN = os.environ.get("STORAGE_TEST_DSN")
+BACKENDS = ["memory", "sqlite", "postgres"]
+
+DAY = date(2026, 3, 10)
+
+
+@pytest.fixture(params=BACKENDS)
+async def storage(request, tmp_path):
+    if request.param == "postgres":
+        if not PG_DSN:
+            pytest.skip("STORAGE_TEST_DSN is not set")
+        import asyncpg
+
+        from bench.seed import apply_schema
+
+        conn = await asyncpg.connect(PG_DSN)
+        try:
+            await apply_schema(conn)
+        finally:
+            await conn.close()
+        url = PG_DSN
+    else:
+        url = str(tmp_path / "habits.db")
+    s = await open_storage(request.param, url)
+    try:
+        yield s
+    finally:
+        await s.close()
+
+
+async def _user(storage: Storage, email: str = "a@example.com") -> str:
+    row = await storage.upsert_user(email, "A", None)
+    return str(row["id"])
+
+
+def test_storage_is_abstract():
+    with pytest.raises(TypeError):
+        Storage()
+
+
+async def test_users(storage):
+    first = await storage.upsert_user("a@example.com", "A", "https://img/a")
+    again = await storage.upsert_user("a@example.com", None, None)
+    assert again["id"] == first["id"]
+    # NULL name / image_url keep the stored values
+    assert (again["name"], again["image_url"]) == ("A", "https://img/a")
+    assert again["timezone"]
+
+    user = await storage.get_user(str(first["id"]))
+    assert user["email"] == "a@example.com"
+    assert await storage.get_user(str(uuid4())) is None
+    assert await storage.data_version(str(uuid4())) == 0
+
+
+async def test_checklist_order(storage):
+    uid = await _user(storage)
+    walk = await storage.create_habit(uid, "Walk", "MORNING", time(8, 0))
+    await storage.create_habit(uid, "Read", "MORNING", None)
+    await storage.create_habit(uid, "Stretch", "MORNING", time(8, 0))
+    await storage.create_habit(uid, "Floss", "NIGHT", time(21, 30))
+    await storage.add_slot(uid, walk, "NIGHT", None)
+    await storage.record_logs(uid, [(walk, "MORNING", DAY, True, None)])
+
+    def view(rows):
+        return [(r["name"], r["period"], r["local_time"], r["completed"]) for r in rows]
+
+    assert view(await storage.checklist(uid, DAY)) == [
+        ("Stretch", "MORNING", time(8, 0), False),
+        ("Walk", "MORNING", time(8, 0), True),
+        ("Read", "MORNING", None, False),
+        ("Floss", "NIGHT", time(21, 30), False),
+        ("Walk", "NIGHT", None, False),
+    ]
+    # Completion is per day
+    assert not any(r["completed"] for r in await storage.checklist(uid, DAY + timedelta(days=1)))
+
+
+async def test_ownership(storage):
+    uid = await _user(storage)
+    other = await _user(storage, "b@example.com")
+    mine = await storage.create_habit(uid, "Walk", "MORNING", None)
+    theirs = await storage.create_habit(other, "Run", "MORNING", None)
+
+    assert await storage.owned_habit_ids(uid, [mine, theirs, uuid4()]) == {mine}
+    assert await storage.owned_habit_ids(uid, []) == set()
+    with pytest.raises(KeyError):
+        await storage.add_slot(uid, theirs, "NIGHT", None)
+
+
+async def test_record_logs(storage):
+    uid = await _user(storage)
+    habit = await storage.create_habit(uid, "Walk", "MORNING", None)
+    v0 = await storage.data_version(uid)
+
+    [row], version = await storage.record_logs(uid, [(habit, "MORNING", DAY, True, "felt good")])
+    assert (row["habit_id"], row["period"], row["day"], row["completed"], row["note"]) == (
+        habit, "MORNING", DAY, True, "felt good",
+    )
+    assert row["created_at"] is not None
+    # The version the write bumped to comes back with it
+    v1 = await storage.data_version(uid)
+    assert v1 == version > v0
+
+    # Upsert on (habit, period, day); a NULL note keeps the stored one
+    [row], version = await storage.record_logs(uid, [(habit, "MORNING", DAY, False, None)])
+    assert (row["completed"], row["note"]) == (False, "felt good")
+    assert await storage.data_version(uid) == version > v1
+
+    # Several items at once
+    rows, version = await storage.record_logs(uid, [
+        (habit, "MORNING", DAY, True, None),
+        (habit, "MORNING", DAY + timedelta(days=1), True, "again"),
+    ])
+    assert [(r["day"], r["completed"], r["note"]) for r in rows] == [
+        (DAY, True, "felt good"), (DAY + timedelta(days=1), True, "again"),
+    ]
+    assert await storage.data_version(uid) == version
+
+    assert await storage.record_logs(uid, []) == ([], None)
+    assert await storage.data_version(uid) == version
+
+
+async def test_checklist_range(storage):
+    uid = await _user(storage)
+    habit = await storage.create_habit(uid, "Walk", "MORNING", None)
+    await storage.add_slot(uid, habit, "NIGHT", None)
+    days = [DAY - timedelta(days=d) for d in (0, 2, 5, 9)]
+    await storage.record_logs(uid, [(habit, "MORNING", d, True, None) for d in days])
+    await storage.record_logs(uid, [(habit, "NIGHT", DAY, False, None)])
+
+    rows = await storage.checklist_range(uid, DAY - timedelta(days=6), DAY)
+    assert [(r["period"], r["done_days"]) for r in rows] == [
+        ("MORNING", sorted(days[:3])),
+        ("NIGHT", []),
+    ]
+
+
+async def test_habit_logs_page(storage):
+    uid = await _user(storage)
+    habit = await storage.create_habit(uid, "Walk", "MORNING", None)
+    await storage.add_slot(uid, habit, "NIGHT", None)
+    items = [(habit, p, DAY - timedelta(days=d), d % 2 == 0, None) for d in range(5) for p in ("MORNING", "NIGHT")]
+    await storage.record_logs(uid, items)
+    keys = sorted((d, p) for _, p, d, _, _ in items)
+    start, end = DAY - timedelta(days=3), DAY - timedelta(days=1)
+    in_range = [k for k in keys if start <= k[0] <= end]
+
+    async def walk(descending):
+        after = (end + timedelta(days=1), "MORNING") if descending else (start - timedelta(days=1), "NIGHT")
+        seen = []
+        while True:
+            page = await storage.habit_logs_page(habit, start, end, after, 4, descending)
+            seen += [(r["day"], r["period"]) for r in page]
+            if len(page) < 4:
+                return seen
+            after = seen[-1]
+
+    assert await walk(False) == in_range
+    assert await walk(True) == in_range[::-1]
+
+
+async def test_daily_rollup(storage):
+    uid = await _user(storage)
+    walk = await storage.create_habit(uid, "Walk", "MORNING", None)
+    read = await storage.create_habit(uid, "Read", "NIGHT", None)
+    # The habits exist from the user's today: the log the day before counts nowhere
+    today = local_date(datetime.now(timezone.utc), USER_TIMEZONE)
+    await storage.record_logs(uid, [
+        (walk, "MORNING", today - timedelta(days=1), True, None),
+        (walk, "MORNING", today, True, None),
+        (read, "NIGHT", today, True, None),
+        (walk, "MORNING", today + timedelta(days=1), True, None),
+        (read, "NIGHT", today + timedelta(days=1), False, None),
+    ])
+
+    start = today - timedelta(days=2)
+    rows = await storage.daily_rollup(uid, start, today + timedelta(days=1))
+    window = _fill_window(rows, start, 4)
+    assert [(d["completed"], d["total"]) for d in window] == [(0, 0), (0, 0), (2, 2), (1, 2)]
+
+
+async def test_streak_inputs(storage):
+    uid = await _user(storage)
+    walk = await storage.create_habit(uid, "Walk", "MORNING", None)
+    await storage.add_slot(uid, walk, "NIGHT", None)
+    read = await storage.create_habit(uid, "Read", "NIGHT", None)
+    await storage.record_logs(uid, [
+        (walk, "MORNING", DAY, True, None),
+        (walk, "NIGHT", DAY, True, None),
+        (walk, "MORNING", DAY - timedelta(days=1), True, None),
+        (read, "NIGHT", DAY - timedelta(days=1), True, None),
+        (read, "NIGHT", DAY - timedelta(days=2), False, None),
+    ])
+
+    schedules = {r["habit_id"]: r for r in await storage.habit_schedules(uid)}
+    assert {h: r["n_slots"] for h, r in schedules.items()} == {walk: 2, read: 1}
+    assert all(r["cadence"] is None and r["created_on"] for r in schedules.values())
+
+    def counts(rows):
+        return sorted((r["habit_id"] == walk, r["day"], r["n_done"]) for r in rows)
+
+    assert counts(await storage.completed_slot_counts(uid)) == sorted([
+        (True, DAY, 2), (True, DAY - timedelta(days=1), 1), (False, DAY - timedelta(days=1), 1),
+    ])
+    assert counts(await storage.completed_slot_counts(uid, walk, DAY)) == [(True, DAY, 2)]
+
+
+async def test_heatmap(storage):
+    uid = await _user(storage)
+    walk = await storage.create_habit(uid, "Walk", "MORNING", None)
+    await storage.add_slot(uid, walk, "NIGHT", None)
+    await storage.create_habit(uid, "Floss", "NIGHT", None)
+    days = [date(2025, 1, 1), date(2025, 6, 30), date(2025, 12, 31)]
+    await storage.record_logs(uid, [(walk, "MORNING", d, True, None) for d in days])
+    await storage.record_logs(uid, [(walk, "NIGHT", date(2025, 2, 1), False, None)])
+    await storage.record_logs(uid, [(walk, "MORNING", date(2026, 1, 1), True, None)])
+
+    rows = await storage.heatmap(uid, 2025)
+    assert [(r["name"], r["period"], r["bits"]) for r in rows] == [
+        ("Floss", "NIGHT", None),
+        ("Walk", "MORNING", pack_days(days, 2025)),
+        ("Walk", "NIGHT", None),
+    ]
+    assert all(r["created_on"] for r in rows)
+
+
+async def test_session_and_events(storage):
+    uid = await _user(storage)
+    published = []
+    storage.events = lambda user_id, event: published.append((user_id, event))
+
+    async with storage.session() as s:
+        habit = await s.create_habit(uid, "Walk", "MORNING", None, event=lambda hid: {"type": "new", "id": str(hid)})
+        item = (habit, "MORNING", DAY, True, None)
+        await s.record_logs(uid, [item], event=lambda rows: {"type": "logs", "n": len(rows)})
+        await s.record_logs(uid, [], event=lambda rows: {"type": "never"})
+        assert [r["completed"] for r in await s.checklist(uid, DAY)] == [True]
+        await s.publish(uid, {"type": "resync"})
+
+    if storage.name == "postgres":
+        # Postgres goes through NOTIFY and the event hub's LISTEN connection instead
+        assert published == []
+        await _check_notify(storage, uid)
+    else:
+        assert published == [
+            (uid, {"type": "new", "id": str(habit)}),
+            (uid, {"type": "logs", "n": 1}),
+            (uid, {"type": "resync"}),
+        ]
+
+
+async def _check_notify(storage: Storage, uid: str) -> None:
+    import asyncpg
+
+    from app.core.events import CHANNEL
+
+    received: asyncio.Queue = asyncio.Queue()
+    listener = await asyncpg.connect(PG_DSN)
+    try:
+        await listener.add_listener(CHANNEL, lambda conn, pid, channel, payload: received.put_nowait(payload))
+        habit = (await storage.habit_schedules(uid))[0]["habit_id"]
+        # The NOTIFY is queued in the write's transaction and delivered on its commit
+        _, version = await storage.record_logs(
+            uid, [(habit, "MORNING", DAY + timedelta(days=1), True, None)], event=lambda rows: {"type": "logs", "n": len(rows)}
+        )
+        assert version == await storage.data_version(uid)
+        payload = await asyncio.wait_for(received.get(), 5)
+        assert json.loads(payload) == {"user": uid, "type": "logs", "n": 1}
+    finally:
+        await listener.close()
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_handlers_on_embedded_storage(backend, monkeypatch, tmp_path):
+    from app import main
+    from app.core.auth import create_jwt
+
+    async def noop():
+        pass
+
+    monkeypatch.setattr(settings, "STORAGE_BACKEND", backend)
+    monkeypatch.setattr(settings, "STORAGE_URL", str(tmp_path / "habits.db"))
+    monkeypatch.setattr(main.google_keys, "start", noop)
+    app = main.create_app()
+
+    with TestClient(app) as client:
+        storage = app.state.storage
+        user = client.portal.call(storage.upsert_user, "a@example.com", "A", None)
+        uid = str(user["id"])
+        client.cookies.set(settings.COOKIE_NAME, create_jwt(uid, "a@example.com"))
+        sub = main.event_hub.subscribe(uid)
+
+        resp = client.post("/api/habits", json={"name": "Walk", "period": "MORNING", "local_time": "07:30"})
+        assert resp.status_code == 201
+        habit_id = resp.json()["id"]
+
+        resp = client.post("/api/habit_log", json={
+            "habit_id": habit_id, "period": "MORNING", "day": DAY.isoformat(), "completed": True,
+        })
+        assert resp.status_code == 200
+
+        resp = client.get("/api/checklist/today", params={"day": DAY.isoformat()})
+        assert [(r["name"], r["local_time"], r["completed"]) for r in resp.json()] == [("Walk", "07:30", True)]
+
+        assert client.get("/api/stats/streaks").status_code == 200
+        assert client.get("/me").json()["user"]["email"] == "a@example.com"
+        # Import / export are Postgres-only
+        assert client.get("/api/export").status_code == 501
+
+        events = [client.portal.call(sub.get, 0.1) for _ in range(2)]
+        assert [e["type"] for e in events] == ["habit_created", "habit_log"]
+        sub.close()
+    profiles.profile_cache.invalidate(uid)
@@ -0,0 +1,56 @@
+# tests/test_transfer.py
+"""
+/api/export output read back by the /api/import parser.
+"""
+import gzip
+from datetime import date, datetime, time, timezone
+
+import pytest
+
+from app.core.importer import HistoryImporter, iter_lines, iter_records
+from app.routers.transfer import _export_stream, _export_value
+
+pytestmark = pytest.mark.anyio
+
+HABIT_ID = "6f1c2f6e-8d3a-4a53-9d55-0b8f4f3f2a10"
+EXPORTED = [
+    ("habit", {"ref": HABIT_ID, "name": 'Read, "slowly"', "archived": False,
+               "created_at": datetime(2024, 1, 2, 8, 30, tzinfo=timezone.utc)}),
+    ("slot", {"habit": HABIT_ID, "period": "MORNING", "local_time": time(7, 30), "notify": True}),
+    ("slot", {"habit": HABIT_ID, "period": "NIGHT", "local_time": None, "notify": False}),
+    ("log", {"habit": HABIT_ID, "period": "MORNING", "day": date(2024, 5, 1), "completed": True,
+             "note": "first line\nsecond line, with \"quotes\"\n\nlast"}),
+    ("log", {"habit": HABIT_ID, "period": "NIGHT", "day": date(2024, 5, 1), "completed": False, "note": None}),
+]
+
+
+async def _records():
+    for kind, row in EXPORTED:
+        yield kind, {k: _export_value(v) for k, v in row.items()}
+
+
+async def _collect(stream):
+    return b"".join([chunk async for chunk in stream])
+
+
+async def _chunks(body: bytes, size: int = 16):
+    for i in range(0, len(body), size):
+        yield body[i:i + size]
+
+
+def _parsed(recs):
+    imp = HistoryImporter(None, "user")
+    return [imp._parse(r) for r in recs]
+
+
+@pytest.mark.parametrize("fmt", ["csv", "ndjson"])
+@pytest.mark.parametrize("compress", [False, True])
+async def test_export_round_trips(fmt, compress):
+    body = await _collect(_export_stream(_records(), fmt, compress))
+    if compress:
+        body = gzip.decompress(body)
+    back = [r async for r in iter_records(iter_lines(_chunks(body)), fmt)]
+
+    original = [{"type": kind, **{k: _export_value(v) for k, v in row.items()}} for kind, row in EXPORTED]
+    assert _parsed(back) == _parsed(original)
+    assert back[3]["note"] == EXPORTED[3][1]["note"]
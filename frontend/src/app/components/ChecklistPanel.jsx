@@ -1,5 +1,5 @@
 // src/app/components/ChecklistPanel.jsx
-import React, { useCallback, useEffect, useMemo, useState, useMemo as useMemo2 } from "react";
+import React, { useCallback, useEffect, useMemo, useRef, useState, useMemo as useMemo2 } from "react";
 
 const PERIODS = [
   { key: "MORNING", label: "Morning", icon: "☀️" },
@@ -19,6 +19,21 @@ const parseISODateLocal = (s) => {
   return new Date(y || 1970, (m || 1) - 1, d || 1);
 };
 
+// --- Deltas (POST responses and /api/events) applied to the loaded day ---
+const applyLogs = (items, logs, day) => {
+  const done = new Map();
+  for (const l of logs) if (l.day === day) done.set(`${l.habit_id}|${l.period}`, l.completed);
+  if (done.size === 0) return items;
+  return items.map((it) => {
+    const k = `${it.habit_id}|${it.period}`;
+    return done.has(k) ? { ...it, completed: done.get(k) } : it;
+  });
+};
+const addHabit = (items, h) =>
+  items.some((it) => it.habit_id === h.id && it.period === h.period)
+    ? items
+    : [...items, { habit_id: h.id, name: h.name, period: h.period, local_time: h.local_time, completed: false }];
+
 export default function ChecklistPanel({
   userId,
   apiBase = "",
@@ -27,6 +42,7 @@ export default function ChecklistPanel({
   checklistPath = "/api/checklist/today",
   logPath = "/api/habit_log",
   habitsPath = "/api/habits",
+  eventsPath = "/api/events",
 }) {
   const todayISO = useMemo(() => toISODateLocal(new Date()), []);
   const [day, setDay] = useState(defaultDay || todayISO);
@@ -76,6 +92,31 @@ export default function ChecklistPanel({
     fetchChecklist();
   }, [fetchChecklist]);
 
+  // ---- Live updates from other tabs/devices (SSE) ----
+  // One connection for the panel's lifetime: handlers read the selected day and
+  // the current fetcher through refs, so changing the day doesn't reconnect.
+  const dayRef = useRef(day);
+  const fetchRef = useRef(fetchChecklist);
+  useEffect(() => {
+    dayRef.current = day;
+    fetchRef.current = fetchChecklist;
+  }, [day, fetchChecklist]);
+
+  useEffect(() => {
+    if (!userId || typeof EventSource === "undefined") return;
+    const es = new EventSource(apiBase + eventsPath, { withCredentials: true });
+    es.addEventListener("habit_log", (e) => {
+      const { logs = [] } = JSON.parse(e.data);
+      setItems((prev) => applyLogs(prev, logs, dayRef.current));
+    });
+    es.addEventListener("habit_created", (e) => {
+      const { habit } = JSON.parse(e.data);
+      if (habit) setItems((prev) => addHabit(prev, habit));
+    });
+    es.addEventListener("resync", () => fetchRef.current());
+    return () => es.close();
+  }, [userId, apiBase, eventsPath]);
+
   // ---- Mark done (NO optimistic toggle) ----
   const markDone = async (habit_id, period) => {
     setPostingId(habit_id);
@@ -93,8 +134,9 @@ export default function ChecklistPanel({
       });
       if (!res.ok) throw new Error((await res.text()) || `POST ${logPath} failed`);
 
-      // Pull fresh state for THIS day from the server
-      await fetchChecklist();
+      // Patch the row from the saved log instead of refetching the whole day
+      const log = await res.json();
+      setItems((prev) => applyLogs(prev, [log], day));
     } catch (e) {
       console.error(e);
       alert(e.message || "Failed to mark done");
@@ -131,11 +173,12 @@ export default function ChecklistPanel({
 
       if (!res.ok) throw new Error((await res.text()) || `POST ${habitsPath} failed`);
 
+      const habit = await res.json();
+      setItems((prev) => addHabit(prev, habit));
       setAddName("");
       setAddPeriod("MORNING");
       setAddTime("");
       setAddMsg("Habit created!");
-      await fetchChecklist();
     } catch (e) {
       setAddError(e.message || "Failed to create habit");
     } finally {
@@ -16,7 +16,6 @@ export default function StreaksPanel({
     setError(null);
     try {
       const url = new URL(apiBase + statsPath, window.location.origin);
-      url.searchParams.set("user_id", String(userId));
       url.searchParams.set("days", String(days));
 
       const r = await fetch(url.toString(), {